@@ -7,14 +7,15 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime
 from io import BytesIO
+import json
 import os
 
 from streamlit_shadcn_ui import metric_card
 
 import zipfile
 
-from scraper import DataGouvScraper, TRANCHES_PME
-from scraper_pappers import PappersScraper
+from scraper import TRANCHES_PME
+from sources import SourceRace, default_sources
 from enricher import SocieteEnricher
 from qualifier import AutoScorer, ProspectQualifier, format_excel_output
 from letter_generator import LetterGenerator
@@ -512,37 +513,21 @@ def run_pipeline(ca_min, ca_max, region_code, secteur_code, forme_code,
     status = st.empty()
 
     try:
-        # 1 - Scraping : data.gouv d'abord, fallback Pappers si bloqué
+        # 1 - Scraping : data.gouv, Pappers lancé en relais si rien n'arrive (sources.py)
         status.markdown("**Recherche sur data.gouv.fr...**")
         progress.progress(10)
 
-        companies = None
-        scraper = None
-        api_used = "data.gouv"
-
-        # Tentative data.gouv
-        try:
-            scraper = DataGouvScraper()
-            companies = scraper.search_companies(filtres)
-        except RuntimeError as e:
-            st.warning(f"data.gouv inaccessible : {e}")
-            companies = None
-
-        # Fallback Pappers si data.gouv a échoué ou 0 résultats
-        if not companies and config.PAPPERS_API_KEY:
-            status.markdown("**Fallback : recherche via API Pappers...**")
-            try:
-                scraper = PappersScraper(config.PAPPERS_API_KEY)
-                companies = scraper.search_companies(filtres)
-                api_used = "Pappers"
-            except RuntimeError as e:
-                st.error(f"Pappers aussi en erreur : {e}")
+        scraper = SourceRace(default_sources())
+        companies = scraper.search_companies(filtres)
+        api_used = {'datagouv': "data.gouv", 'pappers': "Pappers"}.get(scraper.winner, "data.gouv")
+        for name, info in scraper.search_summary.get('sources', {}).items():
+            if info['statut'] == 'erreur':
+                st.warning(f"{name} inaccessible (voir le diagnostic)")
 
         if not companies:
             st.error("Aucune entreprise trouvee avec ces criteres.")
             if scraper and scraper.diagnostics:
-                with st.expander("Diagnostic scraper (cliquer pour voir)"):
-                    st.code('\n'.join(scraper.diagnostics))
+                show_diagnostics(scraper, timestamp)
             return
 
         df = scraper.to_dataframe(companies)
@@ -551,6 +536,7 @@ def run_pipeline(ca_min, ca_max, region_code, secteur_code, forme_code,
         ca_filled = df['ca_euros'].notna().sum()
         age_filled = df['age_dirigeant'].notna().sum()
         st.success(f"{len(df)} entreprises trouvees via {api_used} (CA: {ca_filled}/{len(df)}, Age dirigeant: {age_filled}/{len(df)})")
+        show_diagnostics(scraper, timestamp)
 
         # 2 - Enrichissement API JSON (CA, dirigeant, site web)
         if not skip_enrichment:
@@ -558,7 +544,8 @@ def run_pipeline(ca_min, ca_max, region_code, secteur_code, forme_code,
             status.markdown(f"**Enrichissement API + recherche sites web ({n} entreprises)...**")
             progress.progress(30)
             enricher = SocieteEnricher()
-            df = enricher.enrich_dataframe(df, filter_ca=False)
+            df = enricher.enrich_dataframe(df, filter_ca=False,
+                                           raw_records=scraper.raw_records(companies))
             progress.progress(55)
             st.success(f"{len(df)} entreprises enrichies")
         else:
@@ -644,6 +631,20 @@ def run_pipeline(ca_min, ca_max, region_code, secteur_code, forme_code,
         st.code(traceback.format_exc())
 
 
+def show_diagnostics(scraper, timestamp):
+    """Expander diagnostics : resume des requetes, log texte, export JSON des evenements."""
+    with st.expander("Diagnostic scraper (cliquer pour voir)"):
+        st.code('\n'.join(scraper.request_log.format_summary()))
+        st.code('\n'.join(scraper.diagnostics))
+        st.download_button(
+            "Exporter les diagnostics (JSON)",
+            data=json.dumps(scraper.request_log.to_dict(scraper.diagnostics), ensure_ascii=False, indent=1),
+            file_name=f"diagnostics_{timestamp}.json",
+            mime="application/json",
+            key=f"diag_{timestamp}",
+        )
+
+
 def show_results(df, excel_bytes, filename, zip_bytes=None, zip_filename=None):
     """Affiche les resultats apres pipeline"""
     st.markdown("---")
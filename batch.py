@@ -0,0 +1,266 @@
+"""
+Mode batch : plusieurs jeux de filtres en un seul run (run_all.py --batch filtres.yaml).
+
+Fichier YAML (ou JSON) ; les clés d'un jeu sont celles de config.FILTRES
+(CA en euros), `defaults` est fusionné dans chaque jeu :
+
+    defaults:
+      region: '84'
+      limit: 200
+    filtres:
+      - name: conseil_5_10M
+        secteur_naf: '62'
+        ca_min: 5_000_000
+        ca_max: 10_000_000
+      - name: data_10_50M
+        secteur_naf: '63'
+        ca_min: 10_000_000
+        ca_max: 50_000_000
+
+Planification (plan_batch) : les jeux qui envoient la même requête à l'API
+hors CA (région, effectif, forme juridique, NAF au niveau compris par l'API :
+code complet ou section) forment un groupe, et leurs tranches de CA qui se
+chevauchent ou se touchent sont fusionnées. Chaque BatchGroup = une requête
+couvrante paginée une seule fois ; route() répartit les entreprises reçues
+entre les jeux du groupe selon leurs critères propres (tranche de CA,
+division NAF, âges), jusqu'à la limite de chacun.
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional
+
+from scraper import NAF_TO_SECTION, REGION_DEPARTEMENTS, TRANCHES_PME, PostFilter
+
+# Plafond de la requête couvrante : la pagination s'arrête dès que tous les
+# jeux du groupe ont atteint leur limite (plafond API = 400 pages de 25)
+SCAN_LIMIT = 10_000
+
+
+def _yaml():
+    try:
+        import yaml
+    except ImportError:
+        raise RuntimeError("PyYAML requis pour --batch : pip install pyyaml")
+    return yaml
+
+
+def load_batch(path: str) -> List[Dict]:
+    """Lit le fichier batch → [{'name', 'filtres'}] (ValueError si mal formé)."""
+    with open(path, encoding='utf-8') as f:
+        data = _yaml().safe_load(f) or {}
+    if isinstance(data, list):
+        data = {'filtres': data}
+    defaults = data.get('defaults') or {}
+    entries = data.get('filtres') or []
+    if not entries:
+        raise ValueError(f"{path} : aucun jeu de filtres (clé 'filtres')")
+
+    members, names = [], set()
+    for i, entry in enumerate(entries, 1):
+        if not isinstance(entry, dict):
+            raise ValueError(f"{path} : jeu n°{i} invalide ({entry!r})")
+        filtres = dict(defaults, **entry)
+        name = str(filtres.pop('name', '') or f"jeu_{i}")
+        if name in names:
+            raise ValueError(f"{path} : nom de jeu en double '{name}'")
+        names.add(name)
+        filtres.setdefault('tranches_effectif', TRANCHES_PME)
+        for key in ('region', 'secteur_naf'):
+            if filtres.get(key) is not None:
+                filtres[key] = str(filtres[key])
+        members.append({'name': name, 'filtres': filtres})
+    return members
+
+
+def slug(name: str) -> str:
+    """Nom de jeu → nom de dossier."""
+    return re.sub(r'[^\w.-]+', '_', name).strip('_') or 'jeu'
+
+
+def _ca_bounds(filtres: Dict) -> tuple:
+    """(min, max) en euros, max = inf si absent."""
+    ca_min = float(filtres.get('ca_min', 0) or 0)
+    ca_max = float(filtres.get('ca_max', 0) or 0)
+    return ca_min, ca_max if ca_max > 0 else float('inf')
+
+
+def _naf_query(secteur: Optional[str]) -> Optional[str]:
+    """Contrainte NAF réellement envoyée à l'API (code complet, section, ou rien)."""
+    if not secteur:
+        return None
+    if '.' in secteur:
+        return secteur
+    return NAF_TO_SECTION.get(secteur, secteur if secteur.isalpha() else None)
+
+
+def _query_key(filtres: Dict) -> tuple:
+    """Jeux de même clé = mêmes params API, au CA près."""
+    return (
+        filtres.get('region'),
+        tuple(sorted(filtres.get('tranches_effectif') or [])),
+        filtres.get('forme_juridique'),
+        _naf_query(filtres.get('secteur_naf')),
+        filtres.get('region_pushdown', True),
+        str(filtres.get('shard', 'auto')),
+    )
+
+
+def _lowest(values: List) -> float:
+    """Borne basse couvrante : 0 (pas de filtre) si un des jeux n'en a pas."""
+    values = [v or 0 for v in values]
+    return 0 if 0 in values else min(values)
+
+
+def _highest(values: List) -> float:
+    """Borne haute couvrante : 0 (pas de filtre) si un des jeux n'en a pas."""
+    values = [v or 0 for v in values]
+    return 0 if 0 in values else max(values)
+
+
+class BatchMember:
+    """Un jeu de filtres : critères propres + entreprises retenues."""
+
+    def __init__(self, name: str, filtres: Dict, age_dirigeant, ca_of):
+        self.name = name
+        self.filtres = filtres
+        self.limit = filtres.get('limit', 100) or 100
+        self.sirens: set = set()
+        self.companies: List[Dict] = []
+        region = filtres.get('region')
+        target_depts = REGION_DEPARTEMENTS.get(region, []) if region else []
+        # Dédup, siège, division NAF, âges : mêmes prédicats que le scraper
+        self.post = PostFilter(filtres, target_depts, self.sirens, age_dirigeant)
+        self.ca_min, self.ca_max = _ca_bounds(filtres)
+        self._ca_of = ca_of
+
+    @property
+    def done(self) -> bool:
+        return len(self.companies) >= self.limit
+
+    def _in_ca_band(self, company: Dict) -> bool:
+        # L'API ne renvoie que des CA connus quand ca_min/ca_max est envoyé
+        if self.ca_min <= 0 and self.ca_max == float('inf'):
+            return True
+        ca = self._ca_of(company)
+        return ca is not None and self.ca_min <= ca <= self.ca_max
+
+    def offer(self, companies: List[Dict]) -> int:
+        """Retient les entreprises acceptées, jusqu'à la limite ; retourne le nombre retenu."""
+        if self.done:
+            return 0
+        candidates = self.post.filter_cheap(companies)
+        in_band = [c for c in candidates if self._in_ca_band(c)]
+        if len(in_band) < len(candidates):
+            self.post.count_rejected('ca_hors_tranche', len(candidates) - len(in_band))
+        if in_band and self.post.needs_dirigeant:
+            in_band = self.post.filter_dirigeant(in_band)
+        added = in_band[:self.limit - len(self.companies)]
+        for company in added:
+            self.sirens.add(company['siren'])
+        self.companies.extend(added)
+        return len(added)
+
+
+class BatchGroup:
+    """Jeux servis par une même requête couvrante."""
+
+    def __init__(self, members: List[BatchMember]):
+        self.members = members
+        filtres_list = [m.filtres for m in members]
+        covering = dict(filtres_list[0])
+        secteurs = {f.get('secteur_naf') for f in filtres_list}
+        covering['secteur_naf'] = (secteurs.pop() if len(secteurs) == 1
+                                   else _naf_query(filtres_list[0].get('secteur_naf')))
+        bounds = [_ca_bounds(f) for f in filtres_list]
+        covering['ca_min'] = min(lo for lo, _ in bounds)
+        hi = max(hi for _, hi in bounds)
+        covering['ca_max'] = hi if hi != float('inf') else 0
+        # Critères locaux élargis au plus permissif des jeux
+        for key in ('age_min', 'age_dirigeant_min'):
+            covering[key] = _lowest([f.get(key) for f in filtres_list])
+        for key in ('age_dirigeant_max', 'max_pages', 'time_budget_s'):
+            covering[key] = _highest([f.get(key) for f in filtres_list])
+        covering['limit'] = SCAN_LIMIT
+        self.filtres = covering
+
+    @property
+    def done(self) -> bool:
+        return all(m.done for m in self.members)
+
+    def route(self, companies: List[Dict]) -> int:
+        """Répartit un lot entre les jeux ; retourne le nombre d'affectations."""
+        return sum(m.offer(companies) for m in self.members)
+
+    def collect(self, scraper, chunk: int = 25):
+        """Parcourt la requête couvrante jusqu'à ce que tous les jeux soient servis."""
+        iterator = scraper.iter_companies(self.filtres)
+        batch = []
+        try:
+            for company in iterator:
+                batch.append(company)
+                if len(batch) >= chunk:
+                    self.route(batch)
+                    batch = []
+                    if self.done:
+                        break
+            if batch:
+                self.route(batch)
+        finally:
+            iterator.close()
+
+    def label(self) -> str:
+        return ', '.join(m.name for m in self.members)
+
+
+def plan_batch(members: List[Dict], age_dirigeant, ca_of) -> List[BatchGroup]:
+    """
+    Regroupe les jeux (voir docstring du module). Dans un groupe, les tranches
+    de CA disjointes restent des requêtes séparées : les fusionner ferait
+    paginer l'intervalle qui les sépare pour rien.
+    """
+    by_key: Dict[tuple, List[BatchMember]] = {}
+    for entry in members:
+        member = BatchMember(entry['name'], entry['filtres'], age_dirigeant, ca_of)
+        by_key.setdefault(_query_key(member.filtres), []).append(member)
+
+    groups = []
+    for same_query in by_key.values():
+        same_query.sort(key=lambda m: (m.ca_min, m.ca_max))
+        current, current_max = [], None
+        for member in same_query:
+            if current and member.ca_min > current_max:
+                groups.append(BatchGroup(current))
+                current = []
+            current_max = member.ca_max if not current else max(current_max, member.ca_max)
+            current.append(member)
+        groups.append(BatchGroup(current))
+    return groups
+
+
+def overlap_report(members: Iterable[BatchMember]) -> Dict:
+    """SIREN retenus par jeu, propres à chaque jeu, et recouvrement par paire."""
+    members = list(members)
+    report = {'jeux': [], 'paires': []}
+    for member in members:
+        others = set().union(*(m.sirens for m in members if m is not member))
+        report['jeux'].append({
+            'name': member.name,
+            'limite': member.limit,
+            'retenues': len(member.companies),
+            'propres': len(member.sirens - others),
+            'rejets': dict(member.post.rejected),
+        })
+    for i, a in enumerate(members):
+        for b in members[i + 1:]:
+            common = len(a.sirens & b.sirens)
+            if common:
+                union = len(a.sirens | b.sirens)
+                report['paires'].append({'a': a.name, 'b': b.name, 'communes': common,
+                                         'jaccard': round(common / union, 3)})
+    union = set().union(*(m.sirens for m in members)) if members else set()
+    total = sum(len(m.companies) for m in members)
+    report['sirens_uniques'] = len(union)
+    report['lignes_cumulees'] = total
+    report['enrichissements_evites'] = total - len(union)
+    return report
+
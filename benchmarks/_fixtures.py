@@ -0,0 +1,143 @@
+"""
+Données synthétiques + session HTTP factice pour les benchmarks (sans réseau).
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEPARTEMENTS = ["75", "92", "69", "13", "2A", "45", "37", "33", "59", "35"]
+
+
+def make_company(i: int, holding: bool = False) -> dict:
+    """Enregistrement au format recherche-entreprises. holding=True → seul dirigeant = PM."""
+    siren = f"{100000000 + i}"
+    if holding:
+        dirigeants = [{
+            'type_dirigeant': 'personne morale',
+            'denomination': f"HOLDING {i % 50}",
+            'siren': f"{900000000 + i % 50}",
+            'qualite': 'Président',
+        }]
+    else:
+        dirigeants = [{
+            'type_dirigeant': 'personne physique',
+            'nom': f"NOM{i}",
+            'prenoms': 'Jean',
+            'qualite': 'Président',
+            'date_de_naissance': f"{1950 + i % 40}-01",
+        }]
+    dept = DEPARTEMENTS[i % len(DEPARTEMENTS)]
+    return {
+        'siren': siren,
+        'nom_complet': f"SOCIETE {i}",
+        'nature_juridique': '5710',
+        'activite_principale': ['62.01Z', '62.02A', '46.90Z', '70.22Z'][i % 4],
+        'date_creation': f"{1990 + i % 30}-05-01",
+        'tranche_effectif_salarie': ['12', '21', '22', '31'][i % 4],
+        'categorie_entreprise': 'PME',
+        'siege': {
+            'siret': f"{siren}00011",
+            'adresse': f"{i} RUE DE LA PAIX",
+            'code_postal': f"{dept.replace('A', '0')}000",
+            'libelle_commune': 'VILLE',
+            'departement': dept,
+            'region': '11',
+        },
+        'dirigeants': dirigeants,
+        'finances': {
+            '2022': {'ca': 5e6 + i * 1000, 'resultat_net': 1e5},
+            '2023': {'ca': 5.5e6 + i * 1000, 'resultat_net': 2e5},
+        },
+    }
+
+
+def make_companies(n: int, holding_ratio: float = 0.5) -> list:
+    step = int(1 / holding_ratio) if holding_ratio else 0
+    return [make_company(i, holding=bool(step) and i % step == 0) for i in range(n)]
+
+
+def make_pappers_company(i: int) -> dict:
+    """Enregistrement au format Pappers v2 /recherche."""
+    siren = f"{100000000 + i}"
+    dept = DEPARTEMENTS[i % len(DEPARTEMENTS)]
+    return {
+        'siren': siren,
+        'nom_entreprise': f"SOCIETE {i}",
+        'categorie_juridique': '5710',
+        'code_naf': ['62.01Z', '62.02A', '46.90Z', '70.22Z'][i % 4],
+        'date_creation': f"{1990 + i % 30}-05-01",
+        'tranche_effectif_salarie': ['12', '21', '22', '31'][i % 4],
+        'siege': {
+            'siret': f"{siren}00011",
+            'adresse_ligne_1': f"{i} RUE DE LA PAIX",
+            'code_postal': f"{dept.replace('A', '0')}000",
+            'ville': 'VILLE',
+            'departement': dept,
+            'region': '11',
+        },
+        'representants': [{
+            'nom': f"NOM{i}", 'prenom': 'Jean', 'qualite': 'Président',
+            'personne_morale': False, 'date_de_naissance': f"{1950 + i % 40}-01-01",
+        }],
+        'chiffre_affaires': 5e6 + i * 1000,
+        'resultat': 1e5,
+        'site_internet': f"https://societe{i}.fr",
+    }
+
+
+class FakeResponse:
+    def __init__(self, data: dict, status_code: int = 200):
+        self.status_code = status_code
+        self.headers = {'content-type': 'application/json'}
+        self.content = json.dumps(data).encode()
+        self.text = self.content.decode()
+        self._data = data
+
+    def json(self):
+        return self._data
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+class FakeSession:
+    """Répond comme /search, compte les appels, simule une latence fixe."""
+
+    def __init__(self, companies: list, latency: float = 0.0):
+        self.companies = companies
+        self.latency = latency
+        self.calls = 0
+        self.headers = {}
+        self._lock = threading.Lock()
+
+    def mount(self, *args, **kwargs):
+        pass
+
+    def get(self, url, params=None, timeout=None, **kwargs):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        params = params or {}
+        if 'q' in params:
+            q = str(params['q'])
+            if q.startswith('9'):
+                return FakeResponse({'total_results': 1, 'results': [{
+                    'siren': q,
+                    'dirigeants': [{
+                        'type_dirigeant': 'personne physique', 'nom': 'DURAND',
+                        'prenoms': 'Paul', 'qualite': 'Gérant', 'date_de_naissance': '1961-03',
+                    }],
+                }]})
+            found = [c for c in self.companies if c['siren'] == q]
+            return FakeResponse({'total_results': len(found), 'results': found[:1]})
+        per_page = int(params.get('per_page', 25))
+        page = int(params.get('page', 1))
+        chunk = self.companies[(page - 1) * per_page:page * per_page]
+        return FakeResponse({'total_results': len(self.companies), 'results': chunk})
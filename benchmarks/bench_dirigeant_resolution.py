@@ -0,0 +1,74 @@
+"""
+Benchmark : résolution du dirigeant une seule fois par entreprise.
+
+Compare le chemin historique (chaque extracteur + le filtre âge relancent
+_get_best_pp, donc le deep lookup PM HTTP) au chemin mémorisé par SIREN.
+
+Usage: python benchmarks/bench_dirigeant_resolution.py [--rows 1000] [--latency 0.002]
+"""
+
+import argparse
+import time
+
+from _fixtures import FakeSession, make_companies
+from http_cache import ResponseCache
+from pm_cache import PMLookupCache
+from scraper import DataGouvScraper
+
+
+class NoPMCache(PMLookupCache):
+    def get(self, siren):
+        return False, None
+
+
+class UncachedScraper(DataGouvScraper):
+    """Reproduit l'ancien comportement : aucune mémorisation du dirigeant."""
+
+    def __init__(self, **kwargs):
+        super().__init__(pm_cache=NoPMCache(), **kwargs)
+
+    def _prefetch_pm(self, companies, window=4):
+        pass
+
+    def _resolve_dirigeant(self, company):
+        pp, pm_name, via_pm = self._get_best_pp(company)
+        return {'pp': pp, 'pm_name': pm_name, 'via_pm': via_pm}
+
+
+def run(scraper_cls, companies, latency):
+    # Cache PM en mémoire uniquement : pas d'effet d'un run précédent
+    no_http_cache = ResponseCache(':memory:', enabled=False)
+    if scraper_cls is UncachedScraper:
+        scraper = scraper_cls(http_cache=no_http_cache)
+    else:
+        scraper = scraper_cls(pm_cache=PMLookupCache(), http_cache=no_http_cache)
+    scraper.throttle.set_rate(0)  # pas de throttle : on mesure le travail, pas la cadence
+    scraper.session = FakeSession(companies, latency=latency)
+    start = time.perf_counter()
+    # Le filtre âge dirigeant de search_companies résout chaque ligne une fois...
+    for company in companies:
+        scraper._extract_age_dirigeant(company)
+    # ...puis to_dataframe lit 4 colonnes dirigeant_*
+    scraper.to_dataframe(companies)
+    return scraper.session.calls, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=0.002,
+                        help="latence simulée par requête HTTP (s)")
+    args = parser.parse_args()
+
+    companies = make_companies(args.rows, holding_ratio=0.5)
+    per_k = 1000 / args.rows
+
+    print(f"{args.rows} lignes, 50% avec dirigeant PM uniquement, latence {args.latency * 1000:.0f} ms")
+    for label, cls in (("avant (sans cache)", UncachedScraper), ("après (mémo + cache PM)", DataGouvScraper)):
+        calls, elapsed = run(cls, companies, args.latency)
+        print(f"  {label:24s} {calls * per_k:7.0f} requêtes HTTP / 1000 lignes, "
+              f"{elapsed * per_k:6.2f} s / 1000 lignes")
+
+
+if __name__ == '__main__':
+    main()
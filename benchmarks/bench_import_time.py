@@ -0,0 +1,118 @@
+"""
+Benchmark : temps de démarrage (python -X importtime).
+
+Pour chaque cible, lance un interpréteur neuf et mesure :
+- le temps total du process (meilleur de --repeat)
+- le cumul des imports rapporté par -X importtime, et les modules de
+  premier niveau les plus coûteux
+Cibles : `run_all.py --help` puis `import <module>` pour les modules du
+pipeline. Un module dont une dépendance manque ici est signalé, pas mesuré.
+
+Mesure aussi le premier accès à NAF_LABELS (index chargé paresseusement) :
+JSON source (cache vide) puis copie pickle (cache chaud).
+
+Usage: python benchmarks/bench_import_time.py [--repeat 5] [--top 5]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODULES = ('config', 'scraper', 'scraper_pappers', 'enricher', 'qualifier',
+           'letter_generator', 'run_all', 'api_server')
+
+
+def run(args, cwd=ROOT):
+    """Lance python -X importtime <args> ; retourne (durée s, code retour, stderr)."""
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, '-X', 'importtime', *args], cwd=cwd, env=env,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    return time.perf_counter() - start, proc.returncode, proc.stderr
+
+
+def parse_importtime(stderr):
+    """Lignes 'import time: self | cumulative | name' → (total µs, [(cumul µs, module de 1er niveau)])."""
+    total, top_level = 0, []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # en-tête
+        self_us, cumulative, name = int(parts[0]), int(parts[1]), parts[2]
+        total += self_us
+        # Un espace avant les modules de 1er niveau, deux de plus par niveau
+        if len(name) - len(name.lstrip()) == 1:
+            top_level.append((cumulative, name.strip()))
+    return total, top_level
+
+
+def measure(label, args, repeat, top):
+    best, stderr = None, ''
+    for _ in range(repeat):
+        elapsed, code, err = run(args)
+        if code != 0:
+            missing = [l for l in err.splitlines() if 'Error' in l]
+            print(f"  {label:28s} indisponible ({missing[-1] if missing else f'code {code}'})")
+            return
+        if best is None or elapsed < best:
+            best, stderr = elapsed, err
+    total, top_level = parse_importtime(stderr)
+    heaviest = sorted(top_level, reverse=True)[:top]
+    print(f"  {label:28s} process {best * 1000:6.0f} ms, imports {total / 1000:6.0f} ms")
+    print("      " + ', '.join(f"{name} {cumul / 1000:.0f} ms" for cumul, name in heaviest))
+
+
+def naf_first_access(repeat):
+    """Premier accès à NAF_LABELS : JSON (cache vide) puis pickle (cache chaud)."""
+    code = ("import time, scraper; t = time.perf_counter(); scraper.NAF_LABELS.get('62.01Z'); "
+            "print(time.perf_counter() - t)")
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    with tempfile.TemporaryDirectory() as tmp:  # .cache relatif au répertoire courant
+        results = []
+        for _ in range(repeat):
+            cold = warm = None
+            for state in ('cold', 'warm'):
+                if state == 'cold':
+                    cache = os.path.join(tmp, '.cache', 'naf_labels.pickle')
+                    if os.path.exists(cache):
+                        os.remove(cache)
+                out = subprocess.run([sys.executable, '-c', code], cwd=tmp, env=env,
+                                     capture_output=True, text=True)
+                if out.returncode != 0:
+                    print(f"  NAF_LABELS : indisponible ({out.stderr.strip().splitlines()[-1]})")
+                    return
+                value = float(out.stdout.strip().splitlines()[-1])
+                if state == 'cold':
+                    cold = value
+                else:
+                    warm = value
+            results.append((cold, warm))
+    cold = min(r[0] for r in results)
+    warm = min(r[1] for r in results)
+    print(f"  NAF_LABELS 1er accès : JSON {cold * 1000:.1f} ms, pickle {warm * 1000:.1f} ms "
+          f"(0 ms à l'import)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"Démarrage (meilleur de {args.repeat}, python {sys.version.split()[0]})")
+    measure("python -c pass", ['-c', 'pass'], args.repeat, args.top)
+    measure("run_all.py --help", ['run_all.py', '--help'], args.repeat, args.top)
+    for module in MODULES:
+        measure(f"import {module}", ['-c', f'import {module}'], args.repeat, args.top)
+    naf_first_access(args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark bout en bout contre le serveur local mock_server.py (sans réseau).
+
+Pour chaque scénario de fautes (latence, 429, pages Cloudflare, 202 DDG),
+lance sur les mêmes données :
+- la recherche data.gouv (DataGouvScraper, fenêtre de pages --window)
+- la recherche Pappers (PappersScraper)
+- l'enrichissement des --enrich premières lignes : finances et dirigeants
+  repris des enregistrements data.gouv (--enrich-api : rappel de l'API
+  comme avant), puis DuckDuckGo
+et affiche durée, requêtes, retries, attente throttle et réponses du serveur.
+Les contrôleurs de débit sont ceux de config.THROTTLE_CONFIG (hosts de
+production), remis à zéro entre les scénarios ; cache HTTP désactivé.
+
+Usage: python benchmarks/bench_mock_pipeline.py [--companies 5000] [--limit 200]
+       [--window 4] [--enrich 20] [--rps 6] [--enrich-api]
+"""
+
+import argparse
+import contextlib
+import io
+import time
+
+import _fixtures  # noqa: F401  (racine du dépôt dans sys.path)
+import config
+import throttle
+from enricher import CompanyEnricher
+from http_cache import ResponseCache
+from mock_server import MockServer
+from pm_cache import PMLookupCache
+from scraper import DataGouvScraper
+from scraper_pappers import PappersScraper
+
+SCENARIOS = {
+    'nominal': {},
+    'latence 80±40 ms': {s: {'latency_ms': 80, 'jitter_ms': 40} for s in ('datagouv', 'pappers', 'ddg')},
+    '429 5% + Cloudflare 2%': {s: {'latency_ms': 30, 'p429': 0.05, 'p_block': 0.02}
+                               for s in ('datagouv', 'pappers', 'ddg')},
+}
+
+
+def quiet(fn, *args, **kwargs):
+    """Appelle fn sans ses print ni barres tqdm (logs scraper / enrichisseur)."""
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+def stage(label, fn):
+    start = time.perf_counter()
+    try:
+        result, log = fn()
+        error = ''
+    except RuntimeError as e:
+        result, log, error = None, None, f" ÉCHEC ({str(e)[:60]})"
+    elapsed = time.perf_counter() - start
+    line = f"    {label:12s} {elapsed:6.2f} s"
+    if log is not None:
+        s = log.summary()
+        line += (f", {s['requests']:4d} requêtes ({s['retries']} retries), "
+                 f"attente {s['sleep_s']:.1f} s, p95 {(s['latency_p95_s'] or 0) * 1000:.0f} ms")
+    print(line + error)
+    return result
+
+
+def run_scenario(name, faults, args):
+    throttle.reset_host_throttles()
+    with MockServer(companies=args.companies, faults=faults) as server:
+        config.ENDPOINTS.update(server.endpoints)
+        print(f"\n  {name}")
+        no_cache = ResponseCache(':memory:', enabled=False)
+        filtres = {'limit': args.limit, 'fetch_window': args.window, 'ca_min': 1_000_000}
+        if args.rps:
+            filtres['requests_per_second'] = args.rps
+
+        scraper = DataGouvScraper(pm_cache=PMLookupCache(), http_cache=no_cache)
+        companies = stage("data.gouv", lambda: (quiet(scraper.search_companies, filtres),
+                                                 scraper.request_log))
+
+        pappers = PappersScraper('mock-token')
+        stage("Pappers", lambda: (quiet(pappers.search_companies, filtres), pappers.request_log))
+
+        if companies:
+            df = quiet(scraper.to_dataframe, companies[:args.enrich])
+            enricher = CompanyEnricher()
+            enricher.http_cache = no_cache
+            raw_records = None if args.enrich_api else {c['siren']: c for c in companies}
+            before = sum(server.counts['datagouv'].values())
+            enriched = stage("enrichissement", lambda: (quiet(enricher.enrich_dataframe, df,
+                                                               filter_ca=False,
+                                                               raw_records=raw_records), None))
+            sites = (enriched['site_web'].astype(bool).sum()
+                     if enriched is not None and 'site_web' in enriched else 0)
+            print(f"    {'':12s} {sites}/{len(df)} sites trouvés, "
+                  f"{sum(server.counts['datagouv'].values()) - before} requêtes data.gouv")
+
+        served = ', '.join(f"{service} {dict(sorted(counts.items()))}"
+                           for service, counts in server.counts.items() if counts)
+        print(f"    serveur : {served}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--companies', type=int, default=5000)
+    parser.add_argument('--limit', type=int, default=200)
+    parser.add_argument('--window', type=int, default=4, help="pages data.gouv en vol")
+    parser.add_argument('--enrich', type=int, default=20, help="lignes enrichies")
+    parser.add_argument('--enrich-api', action='store_true',
+                        help="enrichissement sans les enregistrements du scraping (rappel API)")
+    parser.add_argument('--rps', type=float, default=0,
+                        help="débit data.gouv (défaut : config.THROTTLE_CONFIG)")
+    args = parser.parse_args()
+
+    config.WEBSITE_CONFIG['guess_domains'] = False  # HEAD vers de vrais domaines
+    print(f"Mock : {args.companies} entreprises, limite {args.limit}, fenêtre {args.window}")
+    for name, faults in SCENARIOS.items():
+        run_scenario(name, faults, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark : extraction Pappers profonde contre mock_server.py.
+
+Même recherche (--limit lignes) en pagination page=1..N, par curseur, puis
+par curseur avec sous-requêtes par département ; le mock ralentit les pages
+profondes (deep_page_ms par tranche de 1 000 résultats sautés). Affiche durée,
+requêtes, jetons et pic mémoire (tracemalloc, consommateur qui ne garde pas
+les lignes). Puis reprise : run coupé au tiers, relancé avec le même
+checkpoint, lignes et jetons comparés à un run d'une traite.
+
+Usage: python benchmarks/bench_pappers_pagination.py [--limit 10000] [--deep-page-ms 20]
+"""
+
+import argparse
+import contextlib
+import io
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import _fixtures  # noqa: F401  (racine du dépôt dans sys.path)
+import config
+import throttle
+from checkpoint import ScrapeCheckpoint
+from mock_server import MockServer
+from scraper_pappers import PappersScraper
+
+SCENARIOS = (
+    ('pages', 'page', False),
+    ('curseur', 'cursor', False),
+    ('curseur + shards', 'cursor', 'departement'),
+)
+
+
+def run(pagination, shard, args, checkpoint=None, stop_after=None):
+    """Parcourt la recherche en streaming ; retourne (SIREN vus, jetons, requêtes, durée, pic)."""
+    throttle.reset_host_throttles()
+    config.PAPPERS_CONFIG['pagination'] = pagination
+    scraper = PappersScraper('mock-token')
+    sirens = set()
+    tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        companies = scraper.iter_companies({'limit': args.limit, 'shard': shard},
+                                           checkpoint=checkpoint)
+        try:
+            for company in companies:
+                sirens.add(company['siren'])
+                if stop_after and len(sirens) >= stop_after:
+                    break
+        finally:
+            companies.close()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return (sirens, scraper.search_summary['credits_used'],
+            scraper.request_log.summary()['requests'], elapsed, peak)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--limit', type=int, default=10_000)
+    parser.add_argument('--deep-page-ms', type=float, default=20)
+    parser.add_argument('--latency', type=float, default=20)
+    args = parser.parse_args()
+
+    config.THROTTLE_CONFIG['api.pappers.fr'] = {'rate': 0}
+    faults = {'pappers': {'latency_ms': args.latency, 'deep_page_ms': args.deep_page_ms}}
+    with MockServer(companies=int(args.limit * 1.2), faults=faults) as server:
+        config.ENDPOINTS.update(server.endpoints)
+        print(f"Mock : {len(server.dataset.companies)} entreprises, limite {args.limit}, "
+              f"latence {args.latency:g} ms + {args.deep_page_ms:g} ms / 1 000 résultats sautés")
+        for label, pagination, shard in SCENARIOS:
+            sirens, credits, requests, elapsed, peak = run(pagination, shard, args)
+            print(f"  {label:17s} {len(sirens):6d} lignes en {elapsed:6.1f} s, {requests:4d} requêtes, "
+                  f"{credits:7.0f} jetons, pic mémoire {peak / 1e6:5.1f} Mo")
+
+        print("\n  Reprise (curseur + shards, coupure au tiers)")
+        directory = tempfile.mkdtemp()
+        try:
+            first = run('cursor', 'departement', args, ScrapeCheckpoint('bench', directory),
+                        stop_after=args.limit // 3)
+            second = run('cursor', 'departement', args, ScrapeCheckpoint.load('bench', directory))
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        print(f"    1er run  : {len(first[0]):6d} lignes, {first[1]:7.0f} jetons")
+        print(f"    reprise  : {len(second[0]):6d} lignes, {second[1]:7.0f} jetons "
+              f"(lignes du 1er run toutes reprises : {first[0] <= second[0]})")
+        print(f"    total    : {first[1] + second[1]:7.0f} jetons pour {len(second[0])} lignes")
+
+
+if __name__ == '__main__':
+    main()
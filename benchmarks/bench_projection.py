@@ -0,0 +1,108 @@
+"""
+Benchmark : projection des champs (scraper.FIELD_MANIFEST) contre mock_server.py.
+
+Pour data.gouv puis Pappers, même recherche avec et sans projection
+(SCRAPING_CONFIG / PAPPERS_CONFIG['field_projection']) et affiche :
+- octets par page (réponses 200) et total reçu
+- temps de décodage JSON des pages reçues
+- temps de to_dataframe et taille mémoire des enregistrements retenus
+Les réponses du mock ont la même forme que celles des APIs (blocs
+complements / matching_etablissements, champs Pappers non lus). Pappers
+renvoie toujours la fiche complète : seule la réduction à la réception
+(taille des enregistrements retenus) y est mesurée, pas d'octets économisés.
+
+Usage: python benchmarks/bench_projection.py [--companies 3000] [--limit 500]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import sys
+import time
+
+import _fixtures  # noqa: F401  (racine du dépôt dans sys.path)
+import config
+import throttle
+from http_cache import ResponseCache
+from mock_server import MockServer
+from pm_cache import PMLookupCache
+from scraper import DataGouvScraper
+from scraper_pappers import PappersScraper
+
+
+def quiet(fn, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+def deep_size(obj) -> int:
+    """Taille approximative (octets) d'une structure JSON décodée."""
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(deep_size(k) + deep_size(v) for k, v in obj.items())
+    if isinstance(obj, list):
+        return sys.getsizeof(obj) + sum(deep_size(v) for v in obj)
+    return sys.getsizeof(obj)
+
+
+def run(source, projected, args):
+    throttle.reset_host_throttles()
+    config.SCRAPING_CONFIG['field_projection'] = projected
+    config.PAPPERS_CONFIG['field_projection'] = projected
+    filtres = {'limit': args.limit, 'requests_per_second': 0}
+    if source == 'data.gouv':
+        scraper = DataGouvScraper(pm_cache=PMLookupCache(),
+                                  http_cache=ResponseCache(':memory:', enabled=False))
+    else:
+        scraper = PappersScraper('mock-token')
+    # Corps bruts des réponses, pour mesurer le décodage seul
+    bodies = []
+    get = scraper.session.get
+
+    def recording_get(*a, **kw):
+        response = get(*a, **kw)
+        if response.status_code == 200:
+            bodies.append(response.content)
+        return response
+
+    scraper.session.get = recording_get
+    companies = quiet(scraper.search_companies, filtres)
+
+    start = time.perf_counter()
+    for body in bodies:
+        json.loads(body)
+    decode = time.perf_counter() - start
+    start = time.perf_counter()
+    df = quiet(scraper.to_dataframe, companies)
+    convert = time.perf_counter() - start
+
+    s = scraper.request_log.summary()
+    print(f"    {'avec' if projected else 'sans':4s} projection : "
+          f"{(s['bytes_per_page'] or 0) / 1024:6.1f} Ko/page, {s['bytes'] / 1024:7.0f} Ko reçus, "
+          f"décodage {decode * 1000:5.0f} ms, to_dataframe {convert * 1000:5.0f} ms, "
+          f"enregistrements {deep_size(companies) / 1024:6.0f} Ko ({len(df)} lignes)")
+    return s['bytes_per_page'] or 0, deep_size(companies)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--companies', type=int, default=3000)
+    parser.add_argument('--limit', type=int, default=500)
+    args = parser.parse_args()
+
+    config.THROTTLE_CONFIG['api.pappers.fr'] = {'rate': 0}
+    with MockServer(companies=args.companies, faults={'datagouv': {'max_rps': 0}}) as server:
+        config.ENDPOINTS.update(server.endpoints)
+        print(f"Mock : {args.companies} entreprises, limite {args.limit}")
+        for source in ('data.gouv', 'Pappers'):
+            print(f"\n  {source}")
+            before, kept_before = run(source, False, args)
+            after, kept_after = run(source, True, args)
+            if before and source == 'data.gouv':
+                print(f"    octets par page : -{1 - after / before:.0%}")
+            if kept_before:
+                print(f"    enregistrements retenus : -{1 - kept_after / kept_before:.0%}")
+
+
+if __name__ == '__main__':
+    main()
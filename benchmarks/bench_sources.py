@@ -0,0 +1,80 @@
+"""
+Benchmark : temps jusqu'au premier résultat selon le mode de sources.py,
+contre mock_server.py (data.gouv puis Pappers, cache HTTP désactivé).
+
+Scénarios : data.gouv nominal, data.gouv bloqué (pages Cloudflare), data.gouv
+lent (latence par page). Pour chaque mode (sequential, hedged, race) :
+1er résultat, durée totale, source gagnante, requêtes servies par source.
+
+Usage: python benchmarks/bench_sources.py [--limit 100] [--hedge-after 2]
+"""
+
+import argparse
+import contextlib
+import io
+import sys
+import time
+
+import _fixtures  # noqa: F401  (racine du dépôt dans sys.path)
+import config
+import throttle
+from http_cache import ResponseCache
+from mock_server import MockServer
+from pm_cache import PMLookupCache
+from scraper import DataGouvScraper
+from scraper_pappers import PappersScraper
+from sources import MODES, Source, SourceRace
+
+SCENARIOS = {
+    'data.gouv nominal': {},
+    'data.gouv bloqué': {'datagouv': {'p_block': 1.0}},
+    'data.gouv lent (3 s/page)': {'datagouv': {'latency_ms': 3000}},
+}
+
+
+def report(line):
+    """Résultats sur la vraie sortie : les logs des sources (threads perdants compris) sont masqués."""
+    print(line, file=sys.__stdout__, flush=True)
+
+
+def make_sources():
+    no_cache = ResponseCache(':memory:', enabled=False)
+    return [Source('datagouv', lambda: DataGouvScraper(pm_cache=PMLookupCache(), http_cache=no_cache)),
+            Source('pappers', lambda: PappersScraper('mock-token'))]
+
+
+def run(mode, faults, args):
+    throttle.reset_host_throttles()
+    with MockServer(companies=args.companies, faults=faults) as server:
+        config.ENDPOINTS.update(server.endpoints)
+        race = SourceRace(make_sources(), mode=mode, latency_budget_s=args.hedge_after)
+        start = time.perf_counter()
+        first = None
+        count = 0
+        for _ in race.iter_companies({'limit': args.limit, 'ca_min': 1_000_000}):
+            if first is None:
+                first = time.perf_counter() - start
+            count += 1
+        total = time.perf_counter() - start
+        served = ', '.join(f"{service} {sum(c.values())}" for service, c in server.counts.items() if c)
+        report(f"    {mode:10s} 1er résultat {first if first is not None else float('nan'):6.2f} s, "
+               f"total {total:6.2f} s, {count} lignes, gagnante {race.winner or '-':8s} ({served})")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--companies', type=int, default=3000)
+    parser.add_argument('--limit', type=int, default=100)
+    parser.add_argument('--hedge-after', type=float, default=2)
+    args = parser.parse_args()
+
+    report(f"Mock : {args.companies} entreprises, limite {args.limit}, relais après {args.hedge_after:g} s")
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        for name, faults in SCENARIOS.items():
+            report(f"\n  {name}")
+            for mode in MODES:
+                run(mode, faults, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark : construction du DataFrame des scrapers.
+
+Compare l'ancien chemin (un dict par entreprise puis pd.DataFrame(list_of_dicts),
+soit pd.DataFrame(list(to_records(...)))) à to_dataframe (colonnes typées,
+catégories pour region / departement / tranche_effectif / forme_juridique /
+code_naf). Mesure le temps et le pic mémoire (tracemalloc), plus la mémoire
+du DataFrame obtenu.
+
+Usage: python benchmarks/bench_to_dataframe.py [--rows 20000]
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import pandas as pd
+
+from _fixtures import make_companies, make_pappers_company
+from http_cache import ResponseCache
+from pm_cache import PMLookupCache
+from scraper import NUMERIC_COLUMNS, DataGouvScraper
+from scraper_pappers import PappersScraper
+
+
+def measure(build):
+    tracemalloc.start()
+    start = time.perf_counter()
+    df = build()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return df, elapsed, peak
+
+
+def compare(label, scraper, companies):
+    # Ligne dirigeant déjà résolue : on mesure la construction, pas le deep lookup
+    scraper.to_dataframe(companies[:1])
+    print(f"{label} — {len(companies)} lignes")
+    results = {}
+    for name, build in (
+        ("avant (list of dicts)", lambda: pd.DataFrame(list(scraper.to_records(companies)))),
+        ("après (colonnes)", lambda: scraper.to_dataframe(companies)),
+    ):
+        df, elapsed, peak = measure(build)
+        size = df.memory_usage(deep=True).sum()
+        results[name] = df
+        print(f"  {name:22s} {elapsed:6.2f} s, pic {peak / 2**20:7.1f} Mo, "
+              f"DataFrame {size / 2**20:6.1f} Mo")
+    # Mêmes valeurs, aux dtypes près (numériques toujours en float64 désormais)
+    before, after = (df.astype({c: 'float64' for c in NUMERIC_COLUMNS}).astype(str)
+                     for df in results.values())
+    same = before.equals(after)
+    print(f"  mêmes valeurs: {'oui' if same else 'NON'}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=20000)
+    args = parser.parse_args()
+
+    datagouv = DataGouvScraper(pm_cache=PMLookupCache(),
+                               http_cache=ResponseCache(':memory:', enabled=False))
+    companies = make_companies(args.rows, holding_ratio=0)
+    for company in companies:
+        datagouv._resolve_dirigeant(company)
+    compare("data.gouv", datagouv, companies)
+
+    pappers = PappersScraper("benchmark")
+    compare("Pappers", pappers, [make_pappers_company(i) for i in range(args.rows)])
+
+
+if __name__ == '__main__':
+    main()
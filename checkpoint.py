@@ -0,0 +1,173 @@
+"""
+Checkpoint des longs runs de scraping (reprise avec run_all.py --resume <run-id>).
+
+Un run = un dossier outputs/checkpoints/<run-id>/ :
+- state.json : options du run (source, --delta : reprises telles quelles),
+  filtres, plan des sous-requêtes, curseur de page par sous-requête
+  (dernière page terminée, et curseur API de la suivante en pagination
+  par curseur), sous-requêtes épuisées
+- rows.jsonl : entreprises retenues (JSON brut API), une par ligne
+
+Le set de dédup SIREN est reconstruit depuis rows.jsonl (ce sont exactement
+les SIREN retenus). state.json est réécrit atomiquement APRÈS l'ajout des
+lignes d'une page : en cas de coupure entre les deux, les lignes en trop
+sont ignorées à la reprise (state.json fait foi via row_count).
+
+Une autre source du même run (Pappers) a son propre checkpoint dans un
+sous-dossier (child), supprimé avec le run.
+"""
+
+import json
+import os
+import shutil
+import threading
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+import config
+
+
+class ScrapeCheckpoint:
+    """Curseur de pagination + lignes retenues d'un run, persistés sur disque."""
+
+    def __init__(self, run_id: str, directory: Optional[str] = None):
+        self.run_id = run_id
+        base = directory or os.path.join(config.OUTPUT_CONFIG['dir'], 'checkpoints')
+        self.dir = os.path.join(base, run_id)
+        self._state_path = os.path.join(self.dir, 'state.json')
+        self._rows_path = os.path.join(self.dir, 'rows.jsonl')
+        self._lock = threading.Lock()
+        self.state: Dict = {
+            'run_id': run_id,
+            'options': {},
+            'filtres': None,
+            'plan': None,
+            'cursors': {},
+            'next_cursors': {},
+            'done': [],
+            'row_count': 0,
+        }
+        if os.path.exists(self._state_path):
+            with open(self._state_path, encoding='utf-8') as f:
+                self.state.update(json.load(f))
+            self._truncate_rows()
+
+    @staticmethod
+    def new_run_id() -> str:
+        return datetime.now().strftime("%Y%m%d_%H%M%S")
+
+    @classmethod
+    def load(cls, run_id: str, directory: Optional[str] = None) -> 'ScrapeCheckpoint':
+        """Ouvre un checkpoint existant (FileNotFoundError sinon)."""
+        checkpoint = cls(run_id, directory)
+        if not os.path.exists(checkpoint._state_path):
+            raise FileNotFoundError(f"Aucun checkpoint pour le run {run_id} ({checkpoint.dir})")
+        return checkpoint
+
+    # ──────────────────────────────────────────
+    # Lecture
+    # ──────────────────────────────────────────
+
+    @property
+    def filtres(self) -> Optional[Dict]:
+        return self.state.get('filtres')
+
+    @property
+    def options(self) -> Dict:
+        """Options de ligne de commande du run (source, delta), à restaurer à la reprise."""
+        return self.state.get('options') or {}
+
+    @property
+    def plan(self) -> Optional[List[Dict]]:
+        return self.state.get('plan')
+
+    def next_page(self, index: int) -> int:
+        """Première page à télécharger pour la sous-requête `index`."""
+        return self.state['cursors'].get(str(index), 0) + 1
+
+    def next_cursor(self, index: int) -> Optional[str]:
+        """Curseur API de la prochaine page (pagination par curseur), None au départ."""
+        return self.state['next_cursors'].get(str(index))
+
+    def is_done(self, index: int) -> bool:
+        return index in self.state['done']
+
+    def rows(self) -> Iterator[Dict]:
+        """Entreprises retenues lors des runs précédents (dans l'ordre d'acceptation)."""
+        if not os.path.exists(self._rows_path):
+            return
+        with open(self._rows_path, encoding='utf-8') as f:
+            for i, line in enumerate(f):
+                if i >= self.state['row_count']:
+                    break
+                yield json.loads(line)
+
+    # ──────────────────────────────────────────
+    # Écriture
+    # ──────────────────────────────────────────
+
+    def set_options(self, **options):
+        """Enregistre les options du run (ex: source='datagouv', delta=True) dès sa création."""
+        with self._lock:
+            self.state['options'] = options
+            self._write_state()
+
+    def start(self, filtres: Dict, plan: List[Dict]):
+        """Enregistre les filtres et le plan de sous-requêtes d'un nouveau run."""
+        with self._lock:
+            self.state['filtres'] = filtres
+            self.state['plan'] = plan
+            self._write_state()
+
+    def record_page(self, index: int, page: int, companies: List[Dict],
+                    cursor: Optional[str] = None):
+        """
+        Page `page` de la sous-requête `index` terminée, `companies` retenues ;
+        `cursor` : curseur API de la page suivante (pagination par curseur).
+        """
+        with self._lock:
+            if companies:
+                with open(self._rows_path, 'a', encoding='utf-8') as f:
+                    for company in companies:
+                        f.write(json.dumps(company, ensure_ascii=False) + '\n')
+                    f.flush()
+                    os.fsync(f.fileno())
+                self.state['row_count'] += len(companies)
+            self.state['cursors'][str(index)] = page
+            if cursor is not None:
+                self.state['next_cursors'][str(index)] = cursor
+            self._write_state()
+
+    def mark_done(self, index: int):
+        """Sous-requête épuisée : ne sera plus paginée à la reprise."""
+        with self._lock:
+            if index not in self.state['done']:
+                self.state['done'].append(index)
+                self._write_state()
+
+    def child(self, name: str) -> 'ScrapeCheckpoint':
+        """Checkpoint d'une autre source du même run (sous-dossier `name`)."""
+        child = ScrapeCheckpoint(name, directory=self.dir)
+        child.run_id = self.run_id
+        return child
+
+    def remove(self):
+        """Supprime le checkpoint (run terminé avec succès)."""
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def _write_state(self):
+        os.makedirs(self.dir, exist_ok=True)
+        tmp = f"{self._state_path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False, default=str)
+        os.replace(tmp, self._state_path)
+
+    def _truncate_rows(self):
+        """Retire les lignes écrites après le dernier state.json valide."""
+        if not os.path.exists(self._rows_path):
+            return
+        with open(self._rows_path, encoding='utf-8') as f:
+            lines = f.readlines()
+        if len(lines) > self.state['row_count']:
+            with open(self._rows_path, 'w', encoding='utf-8') as f:
+                f.writelines(lines[:self.state['row_count']])
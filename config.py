@@ -102,8 +102,6 @@ def get_anthropic_key():
         return _LOCAL_API_KEY
     return ''
 
-ANTHROPIC_API_KEY = get_anthropic_key()
-
 
 def get_pappers_key():
     """Récupère la clé API Pappers: env var > streamlit secrets"""
@@ -119,7 +117,21 @@ def get_pappers_key():
     return ''
 
 
-PAPPERS_API_KEY = get_pappers_key()
+# Clés résolues au premier accès (config.ANTHROPIC_API_KEY...) : importer la
+# config ne charge pas streamlit
+_LAZY_KEYS = {
+    'ANTHROPIC_API_KEY': get_anthropic_key,
+    'PAPPERS_API_KEY': get_pappers_key,
+}
+
+
+def __getattr__(name):
+    getter = _LAZY_KEYS.get(name)
+    if getter is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getter()
+    globals()[name] = value
+    return value
 
 # ============================================
 # PARAMÈTRES DE SCRAPING
@@ -130,6 +142,104 @@ SCRAPING_CONFIG = {
     "request_timeout": 10,
     "max_retries": 3,
     "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
+    # recherche-entreprises.api.gouv.fr : quota officiel de 7 requêtes/seconde.
+    # Marge sous le quota : la gigue réseau suffit à déclencher des 429 à 7,
+    # et chaque 429 divise le débit par deux et rapproche le disjoncteur
+    "requests_per_second": 6,
+    # Pages data.gouv téléchargées en parallèle (1 = séquentiel)
+    "fetch_window": 4,
+    # Sous-requêtes (shards) exécutées en parallèle au-delà de 10 000 résultats
+    "shard_workers": 4,
+    # Backend asyncio (scraper_async.py) : requêtes HTTP en vol max
+    "async_max_in_flight": 50,
+    # Budgets d'arrêt anticipé du scraping data.gouv (0 = illimité)
+    "max_pages": 0,
+    "time_budget_s": 0,
+    # Projection "pages restantes" loguée toutes les N pages lues
+    "projection_every": 10,
+    # Ne demander que les blocs lus (minimal=true&include=..., scraper.FIELD_MANIFEST)
+    "field_projection": True,
+}
+
+# API Pappers (fallback payant) : chaque requête consomme des jetons du plan,
+# que les lignes passent nos filtres ou non. Coûts indicatifs, à ajuster au plan.
+PAPPERS_CONFIG = {
+    "credits_per_request": 0,
+    "credits_per_result": 1,      # recherche : ~1 jeton par entreprise renvoyée
+    "credits_per_lookup": 1,      # fiche /v2/entreprise (gap_fill.py) : 1 jeton
+    # Jetons max d'une recherche (0 = illimité) ; l'envoi d'une page réserve
+    # son coût maximal (par_page résultats) pour ne jamais dépasser le budget
+    "credit_budget": 0,
+    # Pages demandées en parallèle (le débit reste celui de THROTTLE_CONFIG)
+    "fetch_window": 3,
+    # 'cursor' : curseur=* puis curseur_suivant (pas de pages profondes, lentes
+    # et plafonnées) ; 'page' : page=1..N par pages de 20
+    "pagination": "cursor",
+    "per_cursor": 100,            # résultats par requête en mode curseur
+    "cursor_param": "curseur",
+    "cursor_size_param": "par_curseur",
+    "cursor_next_key": "curseur_suivant",
+    # Sous-requêtes par département / NAF ('auto' : si la limite dépasse
+    # shard_above), paginées en parallèle (surchargeable par filtres['shard'])
+    "shard": "auto",
+    "shard_above": 2000,
+    "shard_workers": 3,
+    # Résultats réduits à la réception aux champs de scraper.FIELD_MANIFEST.
+    # L'API v2 ne documente pas de paramètre de sélection de champs : la liste
+    # n'est envoyée que si fields_param nomme un paramètre réellement supporté
+    "field_projection": True,
+    "fields_param": None,
+}
+
+# Sources de recherche (sources.py) : ordre data.gouv (ou miroir SIRENE) → Pappers
+SOURCES_CONFIG = {
+    # 'sequential' : source suivante si la précédente échoue ou ne trouve rien
+    # 'hedged'     : source suivante lancée si rien reçu après latency_budget_s
+    # 'race'       : toutes les sources en même temps
+    # hedged / race lancent Pappers (payant) sans attendre un échec de data.gouv :
+    # à activer explicitement (run_all.py --sources / --hedge-after)
+    "mode": "sequential",
+    "latency_budget_s": 10,
+    # Jetons max d'une source lancée en relais anticipé ou en course (0 = pas
+    # de plafond propre) ; le repli séquentiel garde le budget de la recherche
+    "hedge_credit_budget": 200,
+}
+
+# Complément Pappers des lignes data.gouv (gap_fill.py) : fiches /v2/entreprise
+# demandées seulement pour les SIREN dont une de ces colonnes reste vide après
+# l'enrichissement gratuit (sites web, DDG)
+GAP_FILL_CONFIG = {
+    "columns": ["site_web", "telephone", "email", "ca_euros"],
+    # Jetons max par run (0 = étape désactivée)
+    "credit_budget": 0,
+}
+
+# Endpoints des APIs (surchargeables par variable d'environnement, ex: serveur
+# local mock_server.py pour les benchmarks hors ligne). Le contrôleur de débit
+# reste celui du host de production (THROTTLE_CONFIG).
+ENDPOINTS = {
+    "datagouv": os.environ.get("MIRASCRAP_DATAGOUV_URL",
+                               "https://recherche-entreprises.api.gouv.fr/search"),
+    "pappers": os.environ.get("MIRASCRAP_PAPPERS_URL", "https://api.pappers.fr/v2/recherche"),
+    "pappers_entreprise": os.environ.get("MIRASCRAP_PAPPERS_ENTREPRISE_URL",
+                                         "https://api.pappers.fr/v2/entreprise"),
+    "ddg": os.environ.get("MIRASCRAP_DDG_URL", "https://html.duckduckgo.com/html/"),
+}
+
+# Contrôleur par host partagé (throttle.get_host_throttle) : débit adaptatif,
+# pause commune sur 429 / Retry-After / blocage HTML, disjoncteur
+THROTTLE_CONFIG = {
+    "default": {
+        "rate": 5,                  # requêtes/seconde
+        "failure_threshold": 5,     # blocages consécutifs avant ouverture du circuit
+        "open_seconds": 60,         # durée d'ouverture du circuit
+        "base_backoff": 2,          # pause après le 1er blocage (doublée ensuite)
+        "max_backoff": 60,
+        "probe_timeout": 30,        # requête de test sans résultat : une autre la remplace
+    },
+    "recherche-entreprises.api.gouv.fr": {"rate": SCRAPING_CONFIG["requests_per_second"]},
+    "api.pappers.fr": {"rate": 2},
+    "html.duckduckgo.com": {"rate": 1, "failure_threshold": 3, "open_seconds": 300},
 }
 
 # ============================================
@@ -140,6 +250,8 @@ WEBSITE_CONFIG = {
     "timeout": 5,
     "delay_between_requests": 1,
     "max_content_length": 500_000,
+    # Dernier recours de find_website : HEAD sur www.<nom>.fr/.com/.org
+    "guess_domains": True,
 }
 
 
@@ -166,3 +278,37 @@ QUALIFIER_CONFIG = {
 OUTPUT_CONFIG = {
     "dir": "outputs",
 }
+
+# ============================================
+# CACHE LOCAL (partagé entre les runs)
+# ============================================
+
+CACHE_CONFIG = {
+    "dir": ".cache",
+    # Holdings → dirigeant PP (deep lookup PM)
+    "pm_ttl_days": 30,
+    "pm_negative_ttl_days": 7,  # holdings sans dirigeant PP
+    # Réponses HTTP recherche-entreprises (SQLite, LRU)
+    "http_enabled": True,
+    "http_refresh": False,
+    "http_max_mb": 200,
+    "http_ttl": {  # secondes, par endpoint
+        "recherche-entreprises.api.gouv.fr/search": 24 * 3600,
+    },
+}
+
+# ============================================
+# MIROIR SIRENE LOCAL (sirene_local.py)
+# ============================================
+
+SIRENE_CONFIG = {
+    # Parquet partitionné par département du siège (python sirene_local.py import ...)
+    "dir": "data/sirene",
+    # Colonnes du CSV finances (ratios financiers INPI/BCE data.gouv)
+    "finances_columns": {
+        "siren": "siren",
+        "date_cloture": "date_cloture_exercice",
+        "ca": "chiffre_d_affaires",
+        "resultat_net": "resultat_net",
+    },
+}
@@ -1,23 +1,29 @@
 """
 Enrichisseur via API JSON recherche-entreprises.api.gouv.fr
 + Recherche site web multi-methodes (DDG, domain guessing)
+
+Finances et dirigeants viennent de l'enregistrement déjà téléchargé par le
+scraper quand il est fourni (enrich(company=...), enrich_dataframe(raw_records=...)) :
+l'API n'est rappelée que pour les SIREN sans enregistrement.
 """
 
 import requests
 import pandas as pd
-import time
 import re
-from typing import Dict
+from typing import Dict, Mapping, Optional
 from urllib.parse import urlparse, unquote, quote, parse_qs
 from datetime import datetime
 from tqdm import tqdm
 import config
+from http_cache import get_shared_response_cache
+from throttle import CircuitOpenError, get_host_throttle, parse_retry_after
 
 
 class CompanyEnricher:
     """Enrichit les entreprises via API JSON officielle + recherche site web"""
 
     API_URL = "https://recherche-entreprises.api.gouv.fr/search"
+    DDG_URL = "https://html.duckduckgo.com/html/"
 
     SKIP_DOMAINS = [
         'societe.com', 'pappers.fr', 'infogreffe.fr', 'data.gouv.fr',
@@ -29,7 +35,10 @@ class CompanyEnricher:
         'indeed.com', 'glassdoor', 'welcometothejungle', 'inpi.fr',
     ]
 
-    def __init__(self):
+    def __init__(self, api_url: Optional[str] = None, ddg_url: Optional[str] = None):
+        # Endpoints interrogés (config.ENDPOINTS, ex: mock_server.py)
+        self.api_url = api_url or config.ENDPOINTS['datagouv']
+        self.ddg_url = ddg_url or config.ENDPOINTS['ddg']
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': config.SCRAPING_CONFIG['user_agent'],
@@ -42,9 +51,21 @@ class CompanyEnricher:
             'Accept': 'text/html,application/xhtml+xml',
             'Accept-Language': 'fr-FR,fr;q=0.9',
         })
-
-    def enrich(self, siren: str, nom: str = "", ville: str = "") -> Dict:
-        """Enrichit une entreprise via API JSON + recherche site web."""
+        # Même cache disque que le scraper (même endpoint /search)
+        self.http_cache = get_shared_response_cache()
+        # Mêmes contrôleurs de host que les scrapers : un blocage vu par l'un
+        # met en pause (ou coupe) tous les autres (hosts de production, même
+        # si les endpoints sont surchargés)
+        self.api_throttle = get_host_throttle(self.API_URL)
+        self.ddg_throttle = get_host_throttle(self.DDG_URL)
+
+    def enrich(self, siren: str, nom: str = "", ville: str = "",
+               company: Optional[Dict] = None) -> Dict:
+        """
+        Enrichit une entreprise via API JSON + recherche site web.
+        company : enregistrement recherche-entreprises déjà téléchargé
+        (finances, dirigeants) ; l'API n'est appelée que s'il manque.
+        """
 
         result = {
             'ca_euros': None,
@@ -56,62 +77,13 @@ class CompanyEnricher:
             'logo_url': '',
         }
 
-        # --- Appel API JSON ---
-        try:
-            r = self.session.get(
-                self.API_URL,
-                params={'q': siren, 'per_page': 1},
-                timeout=10,
-            )
-            r.raise_for_status()
-            results = r.json().get('results', [])
-
-            if results and results[0].get('siren') == siren:
-                company = results[0]
-
-                # Finances
-                finances = company.get('finances', {})
-                if finances:
-                    years = sorted(finances.keys(), reverse=True)
-                    latest = finances[years[0]]
-                    ca = latest.get('ca')
-                    rn = latest.get('resultat_net')
-                    if ca is not None:
-                        result['ca_euros'] = ca
-                    if rn is not None:
-                        result['resultat_euros'] = rn
-
-                    if len(years) >= 2:
-                        ca_prev = finances[years[1]].get('ca')
-                        if ca and ca_prev and ca_prev > 0:
-                            evo = ((ca - ca_prev) / ca_prev) * 100
-                            if evo > 10:
-                                trend = "Croissance"
-                            elif evo < -10:
-                                trend = "Decroissance"
-                            else:
-                                trend = "Stable"
-                            result['evolution_ca'] = f"{trend} ({evo:+.0f}%)"
-
-                # Dirigeant (par priorité : gérant > DG > président)
-                best = self._pick_best_dirigeant(company.get('dirigeants', []))
-                if best:
-                    prenoms = best.get('prenoms', '')
-                    nom_d = best.get('nom') or best.get('denomination', '')
-                    qualite = best.get('qualite', '') or 'Dirigeant'
-                    if nom_d:
-                        result['dirigeant_enrichi'] = f"{prenoms} {nom_d} ({qualite})".strip()
-                    ddn = best.get('date_de_naissance', '')
-                    if ddn and len(ddn) >= 4:
-                        try:
-                            age = datetime.now().year - int(ddn[:4])
-                            if 20 <= age <= 95:
-                                result['age_dirigeant'] = age
-                        except ValueError:
-                            pass
-
-        except Exception as e:
-            print(f"  ! API {siren}: {str(e)[:60]}")
+        if company is None:
+            company = self._fetch_company(siren)
+        if company is not None:
+            try:
+                self._apply_company(company, result)
+            except Exception as e:
+                print(f"  ! Données {siren}: {str(e)[:60]}")
 
         # --- Recherche site web (multi-methodes) ---
         if nom:
@@ -119,6 +91,72 @@ class CompanyEnricher:
 
         return result
 
+    def _fetch_company(self, siren: str) -> Optional[Dict]:
+        """Enregistrement recherche-entreprises du SIREN (cache HTTP, puis API)."""
+        try:
+            params = {'q': siren, 'per_page': 1}
+            data = self.http_cache.get(self.api_url, params)
+            if data is None:
+                with self.api_throttle.slot():
+                    r = self.session.get(self.api_url, params=params, timeout=10)
+                    if r.status_code == 429 or r.status_code >= 500:
+                        self.api_throttle.record_throttled(
+                            parse_retry_after(r.headers.get('retry-after')),
+                            reason=f"HTTP {r.status_code}")
+                    r.raise_for_status()
+                    data = r.json()
+                    self.api_throttle.record_success()
+                self.http_cache.put(self.api_url, params, data)
+            results = data.get('results', [])
+            if results and results[0].get('siren') == siren:
+                return results[0]
+        except Exception as e:
+            print(f"  ! API {siren}: {str(e)[:60]}")
+        return None
+
+    def _apply_company(self, company: Dict, result: Dict):
+        """Finances (CA, résultat, évolution) et dirigeant d'un enregistrement → result."""
+        # Finances
+        finances = company.get('finances') or {}
+        if finances:
+            years = sorted(finances.keys(), reverse=True)
+            latest = finances[years[0]]
+            ca = latest.get('ca')
+            rn = latest.get('resultat_net')
+            if ca is not None:
+                result['ca_euros'] = ca
+            if rn is not None:
+                result['resultat_euros'] = rn
+
+            if len(years) >= 2:
+                ca_prev = finances[years[1]].get('ca')
+                if ca and ca_prev and ca_prev > 0:
+                    evo = ((ca - ca_prev) / ca_prev) * 100
+                    if evo > 10:
+                        trend = "Croissance"
+                    elif evo < -10:
+                        trend = "Decroissance"
+                    else:
+                        trend = "Stable"
+                    result['evolution_ca'] = f"{trend} ({evo:+.0f}%)"
+
+        # Dirigeant (par priorité : gérant > DG > président)
+        best = self._pick_best_dirigeant(company.get('dirigeants') or [])
+        if best:
+            prenoms = best.get('prenoms', '')
+            nom_d = best.get('nom') or best.get('denomination', '')
+            qualite = best.get('qualite', '') or 'Dirigeant'
+            if nom_d:
+                result['dirigeant_enrichi'] = f"{prenoms} {nom_d} ({qualite})".strip()
+            ddn = best.get('date_de_naissance', '')
+            if ddn and len(ddn) >= 4:
+                try:
+                    age = datetime.now().year - int(ddn[:4])
+                    if 20 <= age <= 95:
+                        result['age_dirigeant'] = age
+                except ValueError:
+                    pass
+
     # Priorité des fonctions dirigeant (gérant/DG avant président)
     _QUALITE_PRIORITE = [
         'gérant', 'co-gérant',
@@ -188,8 +226,6 @@ class CompanyEnricher:
             print(f"[SITE] TROUVE via DDG nom: {site}")
             return site
 
-        time.sleep(1)
-
         # Methode 2 : DDG avec sigle si present (ex: SNSM, CCF)
         for sigle in sigles:
             if sigle != nom_court:
@@ -197,7 +233,6 @@ class CompanyEnricher:
                 if site:
                     print(f"[SITE] TROUVE via DDG sigle '{sigle}': {site}")
                     return site
-                time.sleep(1)
 
         # Methode 3 : DDG avec nom + ville
         if ville:
@@ -205,9 +240,11 @@ class CompanyEnricher:
             if site:
                 print(f"[SITE] TROUVE via DDG nom+ville: {site}")
                 return site
-            time.sleep(1)
 
         # Methode 4 : Deviner le domaine
+        if not config.WEBSITE_CONFIG.get('guess_domains', True):
+            print(f"[SITE] ECHEC: aucun site pour {nom_court}")
+            return ""
         for sigle in sigles:
             site = self._guess_domain(sigle)
             if site:
@@ -249,19 +286,28 @@ class CompanyEnricher:
         return sigles[0] if sigles else ""
 
     def _search_ddg(self, query: str) -> str:
-        """Recherche DuckDuckGo HTML, retourne le premier resultat pertinent."""
+        """
+        Recherche DuckDuckGo HTML, retourne le premier resultat pertinent.
+        Rythmee par self.ddg_throttle : un 202 (anti-bot) met DDG en pause pour
+        tout le process ; circuit ouvert → "" (on passe au domain guessing).
+        """
         try:
-            url = f"https://html.duckduckgo.com/html/?q={quote(query)}"
+            url = f"{self.ddg_url}?q={quote(query)}"
             print(f"  [DDG] query='{query}'")
 
             for attempt in range(2):
-                resp = self._web_session.get(url, timeout=8)
-                print(f"  [DDG] status={resp.status_code} len={len(resp.text)} attempt={attempt}")
-                if resp.status_code == 200:
-                    break
-                if resp.status_code == 202 and attempt == 0:
-                    time.sleep(5)
-                    continue
+                with self.ddg_throttle.slot():
+                    resp = self._web_session.get(url, timeout=8)
+                    print(f"  [DDG] status={resp.status_code} len={len(resp.text)} attempt={attempt}")
+                    if resp.status_code == 200:
+                        self.ddg_throttle.record_success()
+                        break
+                    if resp.status_code in (202, 429) or resp.status_code >= 500:
+                        self.ddg_throttle.record_throttled(
+                            parse_retry_after(resp.headers.get('retry-after')),
+                            reason=f"HTTP {resp.status_code}")
+                        if attempt == 0:
+                            continue
                 return ""
 
             if resp.status_code != 200:
@@ -279,6 +325,9 @@ class CompanyEnricher:
                 else:
                     print(f"  [DDG] skip (exclu): {href[:60]}")
 
+            return ""
+        except CircuitOpenError as e:
+            print(f"  [DDG] {e}")
             return ""
         except Exception as e:
             print(f"  [DDG] EXCEPTION: {e}")
@@ -337,9 +386,15 @@ class CompanyEnricher:
     # ================================================================
 
     def enrich_dataframe(self, df: pd.DataFrame, filter_ca: bool = True,
-                         target_limit: int = None) -> pd.DataFrame:
-        """Enrichit un DataFrame via API JSON + recherche site web."""
+                         target_limit: int = None,
+                         raw_records: Optional[Mapping[str, Dict]] = None) -> pd.DataFrame:
+        """
+        Enrichit un DataFrame via API JSON + recherche site web.
+        raw_records : SIREN → enregistrement recherche-entreprises du scraping
+        (ex: SourceRace.raw_records) ; l'API n'est appelée que pour les autres.
+        """
         print("\n[Enrichissement] API JSON + recherche site web...")
+        raw_records = raw_records or {}
 
         if filter_ca and 'ca_euros' in df.columns:
             ca_min = config.FILTRES.get('ca_min', 0)
@@ -359,14 +414,18 @@ class CompanyEnricher:
 
         enriched_data = []
         errors = 0
+        reused = 0
 
         for idx, (_, row) in enumerate(tqdm(df.iterrows(), total=len(df), desc="Enrichissement")):
             siren = str(row['siren'])
             nom = row.get('nom_entreprise', '')
             ville = row.get('ville', '')
 
+            company = raw_records.get(siren)
+            if company is not None:
+                reused += 1
             try:
-                api_data = self.enrich(siren, nom, ville)
+                api_data = self.enrich(siren, nom, ville, company=company)
             except Exception as e:
                 print(f"  ! Enrichissement {siren} ({nom[:30]}): {e}")
                 errors += 1
@@ -385,8 +444,10 @@ class CompanyEnricher:
                     enriched_row[key] = val
 
             enriched_data.append(enriched_row)
-            time.sleep(0.2)
 
+        if raw_records:
+            print(f"  Finances/dirigeants repris du scraping: {reused}/{len(df)} "
+                  f"({len(df) - reused} appels API)")
         if errors:
             print(f"  {errors} erreurs d'enrichissement (entreprises conservees sans enrichissement)")
 
@@ -0,0 +1,126 @@
+"""
+Complément Pappers des lignes data.gouv : Pappers ne sert qu'à remplir les
+cellules restées vides (site web, téléphone, email, CA par défaut).
+
+Les SIREN dont au moins une colonne de config.GAP_FILL_CONFIG['columns'] est
+vide sont demandés un par un à /v2/entreprise (PappersScraper.lookup_companies),
+les lignes aux trous les plus nombreux d'abord : un budget de jetons trop
+court sert en priorité les lignes qui y gagnent le plus. Seules les cellules
+vides sont écrites ; une valeur data.gouv ou de l'enrichissement gratuit
+n'est jamais remplacée.
+
+Usage :
+    df, report = fill_gaps(df, PappersScraper(config.PAPPERS_API_KEY), credit_budget=50)
+    for line in format_fill_report(report):
+        print(line)
+"""
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+import config
+
+DEFAULT_COLUMNS = ('site_web', 'telephone', 'email', 'ca_euros')
+
+
+def _missing(series: pd.Series) -> pd.Series:
+    """Cellules vides : NaN / None ou chaîne blanche."""
+    if series.dtype == object or pd.api.types.is_string_dtype(series):
+        return series.isna() | (series.astype(str).str.strip() == '')
+    return series.isna()
+
+
+def _column_rates(df: pd.DataFrame, columns: Iterable[str]) -> Dict[str, int]:
+    return {col: int((~_missing(df[col])).sum()) for col in columns}
+
+
+def fill_gaps(df: pd.DataFrame, pappers, columns: Optional[Iterable[str]] = None,
+              credit_budget: Optional[float] = None,
+              exclude: Iterable[str] = ()) -> Tuple[pd.DataFrame, Dict]:
+    """
+    Remplit les cellules vides de `columns` via les fiches Pappers.
+
+    pappers : PappersScraper (lookup_companies, to_records)
+    credit_budget : jetons max (None = config.GAP_FILL_CONFIG, 0 = illimité)
+    exclude : SIREN à ne pas demander (lignes déjà issues de Pappers)
+
+    Retourne (df complété, rapport par colonne : remplies avant / après).
+    """
+    columns = list(columns or config.GAP_FILL_CONFIG.get('columns') or DEFAULT_COLUMNS)
+    if credit_budget is None:
+        credit_budget = config.GAP_FILL_CONFIG.get('credit_budget', 0)
+    df = df.copy()
+    for col in columns:
+        if col not in df.columns:
+            df[col] = None if col != 'ca_euros' else float('nan')
+
+    gaps = pd.DataFrame({col: _missing(df[col]) for col in columns}, index=df.index)
+    before = _column_rates(df, columns)
+    excluded = {str(s) for s in exclude}
+    sirens = df['siren'].astype(str)
+    candidates = gaps.sum(axis=1)
+    candidates = candidates[(candidates > 0) & ~sirens.isin(excluded)]
+    # Lignes aux trous les plus nombreux d'abord (ordre d'origine à égalité)
+    order = candidates.sort_values(ascending=False, kind='stable').index
+    wanted = list(dict.fromkeys(sirens[order]))
+
+    rows_by_siren: Dict[str, List] = {}
+    for idx, siren in sirens.items():
+        rows_by_siren.setdefault(siren, []).append(idx)
+
+    if wanted:
+        records = pappers.to_records(pappers.lookup_companies(
+            wanted, columns=columns, credit_budget=credit_budget))
+        for record in records:
+            for idx in rows_by_siren.get(str(record.get('siren')), ()):
+                for col in columns:
+                    value = record.get(col)
+                    if not gaps.at[idx, col] or value is None or pd.isna(value) or value == '':
+                        continue
+                    df.at[idx, col] = value
+                    gaps.at[idx, col] = False
+    summary = getattr(pappers, 'lookup_summary', {}) if wanted else {}
+
+    after = _column_rates(df, columns)
+    rows = len(df)
+    filled = sum(after[col] - before[col] for col in columns)
+    credits = summary.get('credits_used', 0)
+    report = {
+        'rows': rows,
+        'rows_with_gaps': int(len(candidates)),
+        'excluded': int(sirens.isin(excluded).sum()),
+        'requested': summary.get('requested', 0),
+        'found': summary.get('found', 0),
+        'credits_used': credits,
+        'credit_budget': credit_budget,
+        'budget_hit': summary.get('budget_hit', False),
+        'cells_filled': filled,
+        'cells_per_credit': round(filled / credits, 2) if credits else None,
+        'columns': {
+            col: {
+                'before': before[col],
+                'after': after[col],
+                'filled': after[col] - before[col],
+                'rate_before': round(before[col] / rows, 3) if rows else None,
+                'rate_after': round(after[col] / rows, 3) if rows else None,
+            }
+            for col in columns
+        },
+    }
+    return df, report
+
+
+def format_fill_report(report: Dict) -> List[str]:
+    """Lignes du rapport de complément (taux de remplissage par colonne)."""
+    budget = f" / {report['credit_budget']:g}" if report['credit_budget'] else ""
+    lines = [f"Complément Pappers : {report['found']}/{report['requested']} fiches, "
+             f"{report['credits_used']:g}{budget} jetons, {report['cells_filled']} cellules remplies"
+             + (f" ({report['cells_per_credit']:g} par jeton)" if report['cells_per_credit'] else "")]
+    if report['budget_hit']:
+        lines.append("  Budget atteint : lignes restantes non complétées")
+    for col, stats in report['columns'].items():
+        if report['rows']:
+            lines.append(f"  {col:12s} {stats['rate_before']:6.0%} -> {stats['rate_after']:6.0%} "
+                         f"(+{stats['filled']})")
+    return lines
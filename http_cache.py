@@ -0,0 +1,187 @@
+"""
+Cache disque (SQLite) des réponses JSON de recherche-entreprises.api.gouv.fr.
+
+Le scraper, le deep lookup PM et l'enrichisseur interrogent le même endpoint
+/search : relancer un jeu de filtres dans la journée ne retélécharge rien.
+- clé = URL normalisée + paramètres triés (les tokens d'API sont exclus)
+- TTL par endpoint (config.CACHE_CONFIG['http_ttl'])
+- taille bornée, éviction LRU (dernier accès)
+- compteurs hits / misses
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import config
+import pm_cache
+
+# Paramètres jamais inclus dans la clé (secrets)
+_SECRET_PARAMS = {'api_token', 'token', 'api_key'}
+
+
+class ResponseCache:
+    """Cache LRU des réponses JSON, persisté dans un fichier SQLite."""
+
+    def __init__(self, path: str, max_mb: float = 200,
+                 ttl_by_endpoint: Optional[Dict[str, float]] = None,
+                 default_ttl: float = 86400,
+                 enabled: bool = True, refresh: bool = False):
+        self.path = path
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.ttl_by_endpoint = ttl_by_endpoint or {}
+        self.default_ttl = default_ttl
+        self.enabled = enabled
+        self.refresh = refresh  # True : ignore les lectures, réécrit les réponses
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._size = 0
+
+    # ──────────────────────────────────────────
+    # Stockage
+    # ──────────────────────────────────────────
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " key TEXT PRIMARY KEY,"
+                " endpoint TEXT NOT NULL,"
+                " body BLOB NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " created REAL NOT NULL,"
+                " accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON responses(accessed)")
+            self._size = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def endpoint(url: str) -> str:
+        """'https://Host/path/' → 'host/path'"""
+        parts = urlsplit(url)
+        return f"{parts.netloc.lower()}{parts.path.rstrip('/')}"
+
+    @classmethod
+    def make_key(cls, url: str, params: Optional[Dict] = None) -> str:
+        """Clé stable : endpoint + paramètres triés, valeurs normalisées en texte."""
+        items = []
+        for k, v in sorted((params or {}).items()):
+            if v is None or k in _SECRET_PARAMS:
+                continue
+            if isinstance(v, (list, tuple)):
+                v = ','.join(str(x) for x in v)
+            items.append(f"{k}={str(v).strip()}")
+        return f"{cls.endpoint(url)}?{'&'.join(items)}"
+
+    def _ttl(self, endpoint: str) -> float:
+        return self.ttl_by_endpoint.get(endpoint, self.default_ttl)
+
+    # ──────────────────────────────────────────
+    # API publique
+    # ──────────────────────────────────────────
+
+    def get(self, url: str, params: Optional[Dict] = None) -> Optional[Dict]:
+        """Retourne le JSON en cache (non expiré), sinon None."""
+        if not self.enabled or self.refresh:
+            return None
+        key = self.make_key(url, params)
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT body, created, endpoint FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self._ttl(row[2]):
+                self.misses += 1
+                return None
+            conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            conn.commit()
+            self.hits += 1
+        return json.loads(zlib.decompress(row[0]))
+
+    def put(self, url: str, params: Optional[Dict], data: Dict):
+        """Stocke une réponse JSON valide puis évince les entrées les moins récentes."""
+        if not self.enabled:
+            return
+        key = self.make_key(url, params)
+        body = zlib.compress(json.dumps(data, ensure_ascii=False).encode('utf-8'))
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            old = conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, endpoint, body, size, created, accessed)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (key, self.endpoint(url), body, len(body), now, now),
+            )
+            self._size += len(body) - (old[0] if old else 0)
+            if self._size > self.max_bytes:
+                self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection):
+        """Supprime les entrées par ordre de dernier accès jusqu'à 90% de la taille max."""
+        target = int(self.max_bytes * 0.9)
+        rows = conn.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall()
+        doomed = []
+        for key, size in rows:
+            if self._size <= target:
+                break
+            doomed.append((key,))
+            self._size -= size
+        conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'size_mb': self._size / (1024 * 1024),
+        }
+
+
+_shared_cache: Optional[ResponseCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_response_cache() -> ResponseCache:
+    """Instance unique du cache HTTP pour tout le process."""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            cache_cfg = config.CACHE_CONFIG
+            _shared_cache = ResponseCache(
+                path=os.path.join(cache_cfg['dir'], 'http_responses.sqlite'),
+                max_mb=cache_cfg.get('http_max_mb', 200),
+                ttl_by_endpoint=cache_cfg.get('http_ttl', {}),
+                enabled=cache_cfg.get('http_enabled', True),
+                refresh=cache_cfg.get('http_refresh', False),
+            )
+        return _shared_cache
+
+
+def configure(enabled: bool = True, refresh: bool = False):
+    """
+    Active/désactive le cache (--no-cache) ou force le rafraîchissement
+    (--refresh). S'applique aussi au cache des holdings (pm_cache.configure) :
+    un --refresh redemande aussi les dirigeants derrière les holdings.
+    """
+    config.CACHE_CONFIG['http_enabled'] = enabled
+    config.CACHE_CONFIG['http_refresh'] = refresh
+    if _shared_cache is not None:
+        _shared_cache.enabled = enabled
+        _shared_cache.refresh = refresh
+    pm_cache.configure(enabled=enabled, refresh=refresh)
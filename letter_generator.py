@@ -11,10 +11,6 @@ from io import BytesIO
 from datetime import datetime
 from urllib.parse import urlparse
 
-from docx import Document
-from docx.shared import Inches
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-
 
 MOIS_FR = {
     'January': 'janvier', 'February': 'février', 'March': 'mars',
@@ -360,6 +356,7 @@ class LetterGenerator:
         - Intro (P11) : nom entreprise, anciennete, secteur d'activite
         Retourne un BytesIO contenant le .docx.
         """
+        from docx import Document  # python-docx chargé à la première lettre
         doc = Document(self.template_path)
 
         # Extraire et nettoyer les donnees
@@ -484,6 +481,7 @@ class LetterGenerator:
         Extrait le texte brut d'un buffer .docx deja genere.
         Rembobine le buffer avant et apres lecture.
         """
+        from docx import Document
         buf.seek(0)
         doc = Document(buf)
         buf.seek(0)
@@ -0,0 +1,579 @@
+"""
+Serveur local qui remplace les APIs externes (benchmarks et tests de charge
+hors ligne), sur un seul port :
+- /search        ≈ recherche-entreprises.api.gouv.fr/search (pages, q=SIREN)
+- /v2/recherche  ≈ api.pappers.fr/v2/recherche
+- /v2/entreprise ≈ api.pappers.fr/v2/entreprise (fiche par siren=, 404 si inconnu)
+- /html/         ≈ html.duckduckgo.com/html (liens uddg=)
+
+Données : entreprises synthétiques déterministes (--companies, --seed), avec
+holdings (dirigeant personne morale → deep lookup) et établissements
+secondaires (le filtre département porte sur TOUT établissement, comme l'API).
+Projection comme les APIs : minimal=true&include=... pour /search ; Pappers
+renvoie toujours la fiche complète (pas de sélection de champs documentée). /v2/recherche pagine par page=/par_page ou par curseur
+(curseur=* puis curseur_suivant, par_curseur résultats).
+Avec --replay, une requête déjà présente dans un cache HTTP enregistré
+(.cache/http_responses.sqlite, voir http_cache.py) est rejouée telle quelle.
+
+Fautes injectées par service (FAULTS, options de la ligne de commande) :
+- latency_ms / jitter_ms : latence de chaque réponse
+- max_rps : au-delà, 429 + Retry-After (202 anti-bot pour DDG)
+- p429 : proportion de 429 aléatoires
+- p_block : proportion de pages HTML Cloudflare (202 anti-bot pour DDG)
+- deep_page_ms (Pappers) : latence ajoutée par tranche de 1 000 résultats
+  sautés en pagination page= (pages profondes plus lentes)
+
+Usage :
+    python mock_server.py --port 8765 --latency 80 --jitter 40 --p-block 0.02
+puis exporter les variables affichées (MIRASCRAP_*_URL, lues par
+config.ENDPOINTS). Dans un script :
+    with MockServer(companies=5000) as server:
+        config.ENDPOINTS.update(server.endpoints)
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, quote, urlsplit
+
+import config
+from scraper import (DataGouvScraper, FORME_TO_NATURE, NAF_DIVISION_TO_SECTION, NAF_LABELS,
+                     REGION_DEPARTEMENTS, TRANCHES_PME)
+from scraper_pappers import PappersScraper
+
+# Fautes par défaut : débits max proches des limites réelles
+FAULTS = {
+    'datagouv': {'latency_ms': 0, 'jitter_ms': 0, 'max_rps': 7, 'p429': 0.0, 'p_block': 0.0},
+    'pappers': {'latency_ms': 0, 'jitter_ms': 0, 'max_rps': 0, 'p429': 0.0, 'p_block': 0.0,
+                'deep_page_ms': 0},
+    'ddg': {'latency_ms': 0, 'jitter_ms': 0, 'max_rps': 1, 'p429': 0.0, 'p_block': 0.0},
+}
+RETRY_AFTER_S = 1
+
+_PATHS = {'/search': 'datagouv', '/v2/recherche': 'pappers', '/v2/entreprise': 'pappers',
+          '/html': 'ddg'}
+
+_CLOUDFLARE_HTML = (
+    "<!DOCTYPE html><html><head><title>Just a moment...</title></head>"
+    "<body><div id=\"cf-wrapper\">Checking your browser before accessing the site."
+    "</div></body></html>"
+)
+
+_WORDS = ['ATELIERS', 'CONSEIL', 'TECHNOLOGIES', 'INDUSTRIES', 'SERVICES', 'DISTRIBUTION',
+          'LOGISTIQUE', 'INGENIERIE', 'NUMERIQUE', 'CONSTRUCTIONS', 'TRANSPORTS', 'MECANIQUE']
+_SURNAMES = ['MARTIN', 'BERNARD', 'DUBOIS', 'THOMAS', 'ROBERT', 'RICHARD', 'PETIT', 'DURAND',
+             'LEROY', 'MOREAU', 'SIMON', 'LAURENT', 'LEFEBVRE', 'MICHEL', 'GARCIA', 'DAVID']
+_FIRSTNAMES = ['Jean', 'Marie', 'Pierre', 'Nathalie', 'Philippe', 'Isabelle', 'Michel',
+               'Sophie', 'Alain', 'Catherine', 'Eric', 'Sandrine']
+_QUALITES = ['Président', 'Gérant', 'Directeur général', 'Président de SAS']
+_COMPLEMENTS = ('collectivite_territoriale', 'convention_collective_renseignee', 'egapro_renseignee',
+                'est_achats_responsables', 'est_bio', 'est_entrepreneur_individuel',
+                'est_entrepreneur_spectacle', 'est_ess', 'est_finess', 'est_organisme_formation',
+                'est_qualiopi', 'est_rge', 'est_service_public', 'est_societe_mission',
+                'est_uai', 'identifiant_association', 'statut_entrepreneur_spectacle')
+# recherche-entreprises : blocs renvoyés seulement via include= quand minimal=true
+_DATAGOUV_BLOCKS = ('siege', 'dirigeants', 'finances', 'complements',
+                    'matching_etablissements', 'score')
+
+
+class MockDataset:
+    """Entreprises synthétiques au format data.gouv (converties pour Pappers)."""
+
+    def __init__(self, companies: int = 2000, seed: int = 0, holdings_share: float = 0.15,
+                 site_share: float = 0.6):
+        rng = random.Random(seed)
+        dept_region = {d: r for r, depts in REGION_DEPARTEMENTS.items() for d in depts}
+        depts = sorted(dept_region)
+        naf_codes = sorted(NAF_LABELS)
+        natures = sorted({n for codes in FORME_TO_NATURE.values() for n in codes})
+        year = datetime.now().year
+
+        self.companies: List[Dict] = []
+        self.by_siren: Dict[str, Dict] = {}
+        self.sites: Dict[str, str] = {}
+        # Établissements hors siège (filtre API "tout établissement")
+        self._etab_depts: Dict[str, set] = {}
+        names = set()
+
+        def add(company: Dict, extra_depts=()):
+            self.companies.append(company)
+            self.by_siren[company['siren']] = company
+            self._etab_depts[company['siren']] = {company['siege']['departement'], *extra_depts}
+
+        def person() -> Dict:
+            return {'type_dirigeant': 'personne physique', 'nom': rng.choice(_SURNAMES),
+                    'prenoms': rng.choice(_FIRSTNAMES), 'qualite': rng.choice(_QUALITES),
+                    'date_de_naissance': f"{year - rng.randint(28, 75)}-{rng.randint(1, 12):02d}"}
+
+        def record(siren: str, name: str, naf: str, tranche: str, dirigeants: List[Dict]) -> Dict:
+            dept = rng.choice(depts)
+            created = f"{rng.randint(1960, year - 1)}-{rng.randint(1, 12):02d}-01"
+            finances = {}
+            if rng.random() < 0.9:
+                ca = rng.lognormvariate(15.5, 1.2)
+                for back in range(rng.randint(1, 3)):
+                    finances[str(year - 1 - back)] = {
+                        'ca': round(ca * (1 - 0.08 * back)),
+                        'resultat_net': round(ca * rng.uniform(-0.05, 0.12)),
+                    }
+            return {
+                'siren': siren,
+                'nom_complet': name,
+                'nom_raison_sociale': name,
+                'nature_juridique': rng.choice(natures),
+                'activite_principale': naf,
+                'section_activite_principale': NAF_DIVISION_TO_SECTION.get(naf[:2], ''),
+                'date_creation': created,
+                'tranche_effectif_salarie': tranche,
+                'categorie_entreprise': 'PME',
+                'etat_administratif': 'A',
+                'siege': {
+                    'siret': f"{siren}00012",
+                    'adresse': f"{rng.randint(1, 120)} RUE {rng.choice(_SURNAMES)}",
+                    'code_postal': f"{'20' if dept in ('2A', '2B') else dept[:2]}"
+                                   f"{rng.randint(0, 999):03d}",
+                    'libelle_commune': f"COMMUNE {dept}",
+                    'departement': dept,
+                    'region': dept_region[dept],
+                },
+                'dirigeants': dirigeants,
+                'finances': finances,
+                # Blocs que le pipeline ne lit pas (omis avec minimal=true)
+                'complements': dict.fromkeys(_COMPLEMENTS, False),
+                'matching_etablissements': [{
+                    'siret': f"{siren}00012", 'adresse': f"COMMUNE {dept}",
+                    'activite_principale': naf, 'date_creation': created,
+                    'etat_administratif': 'A', 'est_siege': True,
+                    'latitude': f"{rng.uniform(42, 51):.6f}",
+                    'longitude': f"{rng.uniform(-4, 8):.6f}",
+                    'liste_enseignes': None, 'liste_finess': None, 'liste_idcc': ['1486'],
+                }],
+                'nombre_etablissements': 1,
+                'nombre_etablissements_ouverts': 1,
+                'score': round(rng.random(), 4),
+            }
+
+        holdings = []
+        for i in range(max(1, int(companies * holdings_share / 4))):
+            siren = f"{900000000 + i}"
+            holding = record(siren, f"HOLDING {rng.choice(_SURNAMES)} {i}", '70.10Z', '00',
+                             [person()])
+            holdings.append(holding)
+            add(holding)
+
+        for i in range(companies):
+            siren = f"{300000000 + i * 7}"
+            name = f"{rng.choice(_WORDS)} {rng.choice(_SURNAMES)}"
+            while name in names:
+                name = f"{name} {rng.randint(2, 99)}"
+            names.add(name)
+            if rng.random() < holdings_share:
+                holding = rng.choice(holdings)
+                dirigeants = [{'type_dirigeant': 'personne morale', 'siren': holding['siren'],
+                               'denomination': holding['nom_complet'], 'qualite': 'Président'}]
+            else:
+                dirigeants = [person()]
+            tranche = rng.choice(TRANCHES_PME + ['11', '32'])
+            company = record(siren, name, rng.choice(naf_codes), tranche, dirigeants)
+            extra = [rng.choice(depts)] if rng.random() < 0.2 else []
+            add(company, extra)
+            if rng.random() < site_share:
+                slug = ''.join(ch for ch in name.lower() if ch.isalnum())
+                self.sites[name] = f"https://www.{slug}.fr"
+
+    # ──────────────────────────────────────────
+    # recherche-entreprises /search
+    # ──────────────────────────────────────────
+
+    def search(self, params: Dict[str, str]) -> Dict:
+        per_page = min(25, int(params.get('per_page', 10) or 10))
+        page = max(1, int(params.get('page', 1) or 1))
+        q = (params.get('q') or '').strip()
+        if q:
+            if q.isdigit():
+                hits = [self.by_siren[q]] if q in self.by_siren else []
+            else:
+                needle = q.upper()
+                hits = [c for c in self.companies if needle in c['nom_complet']]
+        else:
+            hits = [c for c in self.companies if self._match_search(c, params)]
+        start = (page - 1) * per_page
+        results = hits[start:start + per_page]
+        if params.get('minimal') == 'true':
+            dropped = set(_DATAGOUV_BLOCKS) - set((params.get('include') or '').split(','))
+            results = [{k: v for k, v in c.items() if k not in dropped} for c in results]
+        return {
+            'results': results,
+            'total_results': len(hits),
+            'page': page,
+            'per_page': per_page,
+            'total_pages': -(-len(hits) // per_page),
+        }
+
+    def _match_search(self, c: Dict, params: Dict[str, str]) -> bool:
+        def values(key):
+            return params[key].split(',') if params.get(key) else None
+
+        for key, field in (('tranche_effectif_salarie', 'tranche_effectif_salarie'),
+                           ('activite_principale', 'activite_principale'),
+                           ('section_activite_principale', 'section_activite_principale'),
+                           ('nature_juridique', 'nature_juridique')):
+            wanted = values(key)
+            if wanted and c[field] not in wanted:
+                return False
+        depts = values('departement')
+        if depts and not self._etab_depts[c['siren']] & set(depts):
+            return False
+        if params.get('ca_min') or params.get('ca_max'):
+            ca = _latest_ca(c)
+            if ca is None:
+                return False
+            if params.get('ca_min') and ca < float(params['ca_min']):
+                return False
+            if params.get('ca_max') and ca > float(params['ca_max']):
+                return False
+        return True
+
+    # ──────────────────────────────────────────
+    # Pappers /v2/recherche
+    # ──────────────────────────────────────────
+
+    def pappers(self, params: Dict[str, str]) -> Dict:
+        cfg = config.PAPPERS_CONFIG
+        hits = [c for c in self.companies if self._match_pappers(c, params)]
+        cursor = params.get(cfg.get('cursor_param', 'curseur'))
+        if cursor:
+            # Curseur opaque côté client : position encodée
+            per_page = min(1000, int(params.get(cfg.get('cursor_size_param', 'par_curseur'), 100) or 100))
+            start = 0 if cursor == '*' else int(cursor.lstrip('c'))
+        else:
+            per_page = min(100, int(params.get('par_page', 10) or 10))
+            start = (max(1, int(params.get('page', 1) or 1)) - 1) * per_page
+        results = [self._to_pappers(c) for c in hits[start:start + per_page]]
+        data = {'resultats': results, 'total': len(hits)}
+        if cursor:
+            end = start + per_page
+            data[cfg.get('cursor_next_key', 'curseur_suivant')] = f"c{end}" if end < len(hits) else None
+        else:
+            data['page'] = start // per_page + 1
+        return data
+
+    def pappers_entreprise(self, params: Dict[str, str]) -> Optional[Dict]:
+        """Fiche /v2/entreprise ; None si le SIREN est inconnu (404)."""
+        c = self.by_siren.get((params.get('siren') or '').strip())
+        return self._to_pappers(c) if c else None
+
+    def _match_pappers(self, c: Dict, params: Dict[str, str]) -> bool:
+        if params.get('departement') and c['siege']['departement'] not in params['departement'].split(','):
+            return False
+        if params.get('code_naf') and not c['activite_principale'].startswith(
+                tuple(params['code_naf'].split(','))):
+            return False
+        if params.get('categorie_juridique') and c['nature_juridique'] not in params['categorie_juridique'].split(','):
+            return False
+        if params.get('date_creation_max') and c['date_creation'] > params['date_creation_max']:
+            return False
+        if params.get('chiffre_affaires_min') or params.get('chiffre_affaires_max'):
+            ca = _latest_ca(c)
+            if ca is None:
+                return False
+            if params.get('chiffre_affaires_min') and ca < float(params['chiffre_affaires_min']):
+                return False
+            if params.get('chiffre_affaires_max') and ca > float(params['chiffre_affaires_max']):
+                return False
+        if params.get('age_dirigeant_min') or params.get('age_dirigeant_max'):
+            age = _age_dirigeant(c)
+            if age is None:
+                return False
+            if params.get('age_dirigeant_min') and age < int(params['age_dirigeant_min']):
+                return False
+            if params.get('age_dirigeant_max') and age > int(params['age_dirigeant_max']):
+                return False
+        return True
+
+    def _to_pappers(self, c: Dict) -> Dict:
+        siege = c['siege']
+        years = sorted(c['finances'], reverse=True)
+        representants = []
+        for d in c['dirigeants']:
+            if d['type_dirigeant'] == 'personne morale':
+                representants.append({'type': 'personne morale', 'denomination': d['denomination'],
+                                      'siren': d['siren'], 'qualite': d['qualite']})
+            else:
+                representants.append({'type': 'personne physique', 'nom': d['nom'],
+                                      'prenom': d['prenoms'], 'qualite': d['qualite'],
+                                      'date_de_naissance': d['date_de_naissance']})
+        return {
+            'siren': c['siren'],
+            'nom_entreprise': c['nom_complet'],
+            'siege': {'siret': siege['siret'], 'adresse_ligne_1': siege['adresse'],
+                      'code_postal': siege['code_postal'], 'ville': siege['libelle_commune'],
+                      'departement': siege['departement'], 'region': siege['region']},
+            'code_naf': c['activite_principale'],
+            'libelle_code_naf': NAF_LABELS.get(c['activite_principale'], ''),
+            'categorie_juridique': c['nature_juridique'],
+            'date_creation': c['date_creation'],
+            'tranche_effectif_salarie': c['tranche_effectif_salarie'],
+            'finances': [{'annee': int(y), 'chiffre_affaires': c['finances'][y]['ca'],
+                          'resultat': c['finances'][y]['resultat_net']} for y in years],
+            'representants': representants,
+            'site_internet': self.sites.get(c['nom_complet'], ''),
+            'telephone': f"01{c['siren'][-8:]}" if int(c['siren']) % 3 else '',
+            'email': '',
+            # Champs que le pipeline ne lit pas (omis si la liste de champs est envoyée)
+            'forme_juridique': 'Société par actions simplifiée',
+            'capital': 10000 + int(c['siren']) % 90000,
+            'statut_rcs': 'Inscrit',
+            'date_immatriculation_rcs': c['date_creation'],
+            'greffe': f"COMMUNE {siege['departement']}",
+            'objet_social': ("Le conseil, l'ingénierie, la conception, la réalisation et la "
+                             "commercialisation de tous produits et services se rapportant "
+                             "directement ou indirectement à l'objet ci-dessus."),
+            'conventions_collectives': [{'nom': 'Bureaux d\'études techniques', 'idcc': 1486,
+                                         'confirmee': True}],
+            'nombre_etablissements': 1,
+            'nombre_etablissements_ouverts': 1,
+            'domaine_activite': NAF_LABELS.get(c['activite_principale'], ''),
+            'entreprise_cessee': False,
+        }
+
+    # ──────────────────────────────────────────
+    # DuckDuckGo /html
+    # ──────────────────────────────────────────
+
+    def ddg(self, params: Dict[str, str]) -> str:
+        q = (params.get('q') or '').replace('"', '').replace('site officiel', '').strip().upper()
+        links = [f"https://www.societe.com/societe/{quote(q.lower())}.html",
+                 f"https://www.pappers.fr/recherche?q={quote(q.lower())}"]
+        site = self.sites.get(q)
+        if site is None:
+            # nom + ville : le nom est en tête de requête
+            site = next((url for name, url in self.sites.items() if q.startswith(name + ' ')), None)
+        if site:
+            links.insert(1, site)
+        items = ''.join(
+            f'<div class="result"><a class="result__a" rel="nofollow" '
+            f'href="//duckduckgo.com/l/?uddg={quote(url, safe="")}&amp;rut=mock">{url}</a></div>'
+            for url in links)
+        return f"<html><body><div id=\"links\">{items}</div></body></html>"
+
+
+def _latest_ca(c: Dict) -> Optional[float]:
+    finances = c.get('finances') or {}
+    if not finances:
+        return None
+    return finances[max(finances)].get('ca')
+
+
+def _age_dirigeant(c: Dict) -> Optional[int]:
+    for d in c.get('dirigeants') or []:
+        if d.get('date_de_naissance'):
+            return datetime.now().year - int(d['date_de_naissance'][:4])
+    return None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.mock.handle(self)
+
+    def log_message(self, format, *args):
+        if self.server.mock.verbose:
+            super().log_message(format, *args)
+
+
+class MockServer:
+    """Serveur HTTP (thread de fond) : dataset + fautes injectées + compteurs."""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, companies: int = 2000,
+                 seed: int = 0, faults: Optional[Dict[str, Dict]] = None,
+                 replay: Optional[str] = None, verbose: bool = False):
+        self.dataset = MockDataset(companies, seed)
+        self.faults = {service: dict(settings) for service, settings in FAULTS.items()}
+        for service, settings in (faults or {}).items():
+            self.faults[service].update(settings)
+        self.verbose = verbose
+        self._replay = None
+        if replay:
+            from http_cache import ResponseCache
+            self._replay = ResponseCache(replay, default_ttl=float('inf'))
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._recent = {service: deque() for service in FAULTS}
+        self.counts: Dict[str, Dict[str, int]] = {service: {} for service in FAULTS}
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.mock = self
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def endpoints(self) -> Dict[str, str]:
+        """Même forme que config.ENDPOINTS."""
+        return {'datagouv': f"{self.url}/search", 'pappers': f"{self.url}/v2/recherche",
+                'pappers_entreprise': f"{self.url}/v2/entreprise", 'ddg': f"{self.url}/html/"}
+
+    def start(self) -> 'MockServer':
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def serve_forever(self):
+        """Bloquant (ligne de commande), jusqu'à Ctrl+C."""
+        try:
+            self._httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._httpd.server_close()
+
+    def __enter__(self) -> 'MockServer':
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ──────────────────────────────────────────
+    # Traitement d'une requête
+    # ──────────────────────────────────────────
+
+    def _fault(self, service: str) -> Optional[str]:
+        """'rate' / '429' / 'block' à injecter, None pour une réponse normale."""
+        settings = self.faults[service]
+        now = time.monotonic()
+        with self._lock:
+            recent = self._recent[service]
+            while recent and now - recent[0] > 1.0:
+                recent.popleft()
+            recent.append(now)
+            over_rate = settings['max_rps'] and len(recent) > settings['max_rps']
+            draw = self._rng.random()
+        if over_rate:
+            return 'rate'
+        if draw < settings['p429']:
+            return '429'
+        if draw < settings['p429'] + settings['p_block']:
+            return 'block'
+        return None
+
+    def handle(self, request: BaseHTTPRequestHandler):
+        parts = urlsplit(request.path)
+        service = _PATHS.get(parts.path.rstrip('/'))
+        if service is None:
+            return self._send(request, 'inconnu', 404, 'application/json',
+                              json.dumps({'erreur': f"chemin inconnu {parts.path}"}))
+        params = {k: v[0] for k, v in parse_qs(parts.query).items()}
+
+        settings = self.faults[service]
+        delay = settings['latency_ms'] + self._rng.uniform(0, settings['jitter_ms'])
+        if settings.get('deep_page_ms') and params.get('page'):
+            skipped = (int(params['page']) - 1) * int(params.get('par_page', 10) or 10)
+            delay += settings['deep_page_ms'] * skipped / 1000
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+        fault = self._fault(service)
+        if fault and service == 'ddg':
+            # DDG répond 202 (page anti-bot vide) quand il bloque
+            return self._send(request, service, 202, 'text/html', '<html><body></body></html>')
+        if fault in ('rate', '429'):
+            return self._send(request, service, 429, 'application/json',
+                              json.dumps({'erreur': 'Trop de requêtes'}),
+                              {'Retry-After': str(RETRY_AFTER_S)})
+        if fault == 'block':
+            return self._send(request, service, 200, 'text/html; charset=UTF-8', _CLOUDFLARE_HTML)
+
+        if service == 'ddg':
+            return self._send(request, service, 200, 'text/html', self.dataset.ddg(params))
+        if service == 'pappers' and not params.get('api_token'):
+            return self._send(request, service, 401, 'application/json',
+                              json.dumps({'error': 'api_token manquant'}))
+
+        if parts.path.rstrip('/') == '/v2/entreprise':
+            data = self.dataset.pappers_entreprise(params)
+            if data is None:
+                return self._send(request, service, 404, 'application/json',
+                                  json.dumps({'error': 'Entreprise non trouvée'}))
+            return self._send(request, service, 200, 'application/json',
+                              json.dumps(data, ensure_ascii=False))
+
+        data = None
+        if self._replay is not None:
+            production = DataGouvScraper.BASE_URL if service == 'datagouv' else PappersScraper.BASE_URL
+            data = self._replay.get(production, params)
+        if data is None:
+            data = self.dataset.search(params) if service == 'datagouv' else self.dataset.pappers(params)
+        return self._send(request, service, 200, 'application/json',
+                          json.dumps(data, ensure_ascii=False))
+
+    def _send(self, request: BaseHTTPRequestHandler, service: str, status: int,
+              content_type: str, body: str, headers: Optional[Dict[str, str]] = None):
+        payload = body.encode('utf-8')
+        with self._lock:
+            counts = self.counts.setdefault(service, {})
+            counts[str(status)] = counts.get(str(status), 0) + 1
+        request.send_response(status)
+        request.send_header('Content-Type', content_type)
+        request.send_header('Content-Length', str(len(payload)))
+        for key, value in (headers or {}).items():
+            request.send_header(key, value)
+        request.end_headers()
+        request.wfile.write(payload)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serveur mock data.gouv / Pappers / DuckDuckGo")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--companies', type=int, default=2000, help='Entreprises synthétiques')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--replay', metavar='SQLITE',
+                        help='Cache HTTP enregistré à rejouer (.cache/http_responses.sqlite)')
+    parser.add_argument('--latency', type=float, help='Latence (ms), tous services')
+    parser.add_argument('--jitter', type=float, help='Gigue max (ms), tous services')
+    parser.add_argument('--p429', type=float, help='Proportion de 429 aléatoires')
+    parser.add_argument('--p-block', type=float,
+                        help='Proportion de blocages (HTML Cloudflare, 202 pour DDG)')
+    parser.add_argument('--max-rps', type=float, help='Débit max data.gouv (429 au-delà)')
+    parser.add_argument('--ddg-max-rps', type=float, help='Débit max DDG (202 au-delà)')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Log de chaque requête')
+    args = parser.parse_args()
+
+    faults = {service: {} for service in FAULTS}
+    for option, key in (('latency', 'latency_ms'), ('jitter', 'jitter_ms'),
+                        ('p429', 'p429'), ('p_block', 'p_block')):
+        value = getattr(args, option)
+        if value is not None:
+            for settings in faults.values():
+                settings[key] = value
+    if args.max_rps is not None:
+        faults['datagouv']['max_rps'] = args.max_rps
+    if args.ddg_max_rps is not None:
+        faults['ddg']['max_rps'] = args.ddg_max_rps
+
+    server = MockServer(args.host, args.port, args.companies, args.seed, faults,
+                        args.replay, args.verbose)
+    print(f"Mock sur {server.url} ({len(server.dataset.companies)} entreprises)")
+    for service, url in server.endpoints.items():
+        print(f"  export MIRASCRAP_{service.upper()}_URL={url}")
+    server.serve_forever()
+    print(json.dumps(server.counts, indent=1))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Cache des holdings (personnes morales dirigeantes) → dirigeant personne physique.
+
+Dans les recherches PME, les mêmes holdings reviennent sur de nombreuses filiales.
+Le cache évite de relancer le deep lookup HTTP pour un SIREN déjà résolu :
+- partagé par tous les scrapers du process (get_shared_pm_cache)
+- persisté en JSON entre les runs (config.CACHE_CONFIG['dir'])
+- cache négatif : une holding sans dirigeant PP est mémorisée (pp = None)
+  avec un TTL plus court, pour ne pas la redemander à chaque filiale.
+- mêmes interrupteurs que le cache HTTP (run_all.py --no-cache / --refresh,
+  voir configure) : les entrées des runs précédents sont ignorées ; les
+  holdings résolues pendant le run restent partagées entre filiales.
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import config
+
+
+class PMLookupCache:
+    """SIREN de holding → dict du dirigeant PP (ou None si la holding n'en a pas)."""
+
+    def __init__(self, path: Optional[str] = None,
+                 ttl_days: float = 30, negative_ttl_days: float = 7,
+                 enabled: bool = True, refresh: bool = False):
+        self.path = path
+        self.ttl = ttl_days * 86400
+        self.negative_ttl = negative_ttl_days * 86400
+        self.enabled = enabled  # False : ni lecture des runs précédents ni écriture disque
+        self.refresh = refresh  # True : ignore les runs précédents, écrit les nouvelles entrées
+        self._started = time.time()
+        self._entries: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                self._entries = json.load(f)
+        except (OSError, ValueError):
+            self._entries = {}
+
+    def _expired(self, entry: Dict) -> bool:
+        ttl = self.ttl if entry.get('pp') else self.negative_ttl
+        return time.time() - entry.get('ts', 0) > ttl
+
+    def _stale(self, entry: Dict) -> bool:
+        """Entrée écartée : expirée, ou d'un run précédent en --no-cache / --refresh."""
+        if (not self.enabled or self.refresh) and entry.get('ts', 0) < self._started:
+            return True
+        return self._expired(entry)
+
+    def get(self, siren: str) -> Tuple[bool, Optional[Dict]]:
+        """Retourne (trouvé, pp). trouvé=True avec pp=None → cache négatif."""
+        with self._lock:
+            entry = self._entries.get(siren)
+            if entry is None or self._stale(entry):
+                self.misses += 1
+                return False, None
+            self.hits += 1
+            return True, entry.get('pp')
+
+    def put(self, siren: str, pp: Optional[Dict]):
+        with self._lock:
+            self._entries[siren] = {'pp': pp, 'ts': time.time()}
+            self._dirty = True
+
+    def save(self):
+        """Écrit le cache sur disque (no-op si rien n'a changé, pas de fichier ou désactivé)."""
+        if not self.path or not self.enabled:
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            entries = {k: v for k, v in self._entries.items() if not self._expired(v)}
+            self._dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            tmp = f"{self.path}.tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(entries, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            print(f"  Cache PM non sauvegardé: {e}")
+
+
+_shared_cache: Optional[PMLookupCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_pm_cache() -> PMLookupCache:
+    """Instance unique du cache PM pour tout le process."""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            cache_cfg = config.CACHE_CONFIG
+            _shared_cache = PMLookupCache(
+                path=os.path.join(cache_cfg['dir'], 'pm_dirigeants.json'),
+                ttl_days=cache_cfg.get('pm_ttl_days', 30),
+                negative_ttl_days=cache_cfg.get('pm_negative_ttl_days', 7),
+                enabled=cache_cfg.get('http_enabled', True),
+                refresh=cache_cfg.get('http_refresh', False),
+            )
+        return _shared_cache
+
+
+def configure(enabled: bool = True, refresh: bool = False):
+    """
+    --no-cache / --refresh pour le cache PM (appelé par http_cache.configure) :
+    les holdings des runs précédents sont ignorées, résolues à nouveau.
+    """
+    with _shared_lock:
+        if _shared_cache is not None:
+            _shared_cache.enabled = enabled
+            _shared_cache.refresh = refresh
+            _shared_cache._started = time.time()
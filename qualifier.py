@@ -4,7 +4,6 @@ Qualification des prospects :
 - ProspectQualifier : scoring IA avec Claude (optionnel, plus riche)
 """
 
-import anthropic
 import pandas as pd
 from io import BytesIO
 from typing import Dict
@@ -147,6 +146,8 @@ class ProspectQualifier:
     """Qualifie les prospects avec l'IA Claude (sans web search = rapide)"""
 
     def __init__(self, api_key: str):
+        import anthropic  # importé seulement si la qualification IA est utilisée
+        self._anthropic = anthropic
         self.client = anthropic.Anthropic(api_key=api_key)
         self.model = "claude-sonnet-4-20250514"
 
@@ -235,7 +236,7 @@ Réponds UNIQUEMENT en JSON :
 
             return result
 
-        except anthropic.RateLimitError:
+        except self._anthropic.RateLimitError:
             print(f"  Rate limit, attente 10s...")
             time.sleep(10)
             try:
@@ -352,6 +353,11 @@ def format_excel_output(df: pd.DataFrame, output_file: str = None) -> bytes:
         'Fiche Annuaire Data.gouv': siren_col.apply(_datagouv_url) if 'siren' in df_export.columns else '',
     })
 
+    # Relance delta (run_all.py --delta) : signale les prospects apparus depuis le dernier run
+    if 'statut_delta' in df_export.columns:
+        df_final['Nouveau'] = df_export['statut_delta'].map(
+            {'nouveau': 'Nouveau', 'modifie': 'Mis a jour'}).fillna('').values
+
     buffer = BytesIO()
     target = output_file if output_file else buffer
 
@@ -404,6 +410,8 @@ def format_excel_output(df: pd.DataFrame, output_file: str = None) -> bytes:
         ws.set_column(5, 5, 20)   # Ville
         ws.set_column(6, 6, 60)   # Fiche Pappers
         ws.set_column(7, 7, 60)   # Fiche Annuaire Data.gouv
+        if 'Nouveau' in df_final.columns:
+            ws.set_column(8, 8, 14)
 
         ws.freeze_panes(1, 0)
         ws.autofilter(0, 0, len(df_final), len(df_final.columns) - 1)
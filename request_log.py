@@ -0,0 +1,160 @@
+"""
+Diagnostics structurés des scrapers : un événement par requête HTTP et par
+page traitée, en plus des messages texte (self.diagnostics).
+
+Événements (dicts, t = secondes depuis le début de la recherche) :
+- kind='request' : source, page, attempt, status (None si erreur réseau),
+  latency_s (réseau seul), bytes, sleep_s (throttle avant la requête), error,
+  credits (jetons facturés par l'API, sources payantes)
+- kind='cache'   : page servie par le cache HTTP (aucune requête)
+- kind='page'    : page post-filtrée, received / accepted
+
+summary() agrège : latences p50/p95, temps réseau vs temps d'attente,
+statuts HTTP, octets (total et par réponse 200), jetons consommés, taux
+d'acceptation. to_dict() / export_json() pour run_all.py et app.py.
+"""
+
+import json
+import math
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    """Percentile par rang le plus proche (values triées)."""
+    if not values:
+        return None
+    rank = max(1, math.ceil(q / 100 * len(values)))
+    return values[rank - 1]
+
+
+class RequestLog:
+    """Journal thread-safe des requêtes et pages d'une recherche."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._events: List[Dict] = []
+        self._started = time.monotonic()
+
+    def reset(self):
+        with self._lock:
+            self._events = []
+            self._started = time.monotonic()
+
+    def _add(self, event: Dict):
+        event['t'] = round(time.monotonic() - self._started, 4)
+        with self._lock:
+            self._events.append(event)
+
+    # ──────────────────────────────────────────
+    # Enregistrement
+    # ──────────────────────────────────────────
+
+    def request(self, source: str, page: Optional[int] = None, attempt: int = 1,
+                status: Optional[int] = None, latency_s: float = 0.0, size: int = 0,
+                sleep_s: float = 0.0, error: Optional[str] = None, credits: float = 0):
+        """Une tentative HTTP (réussie ou non)."""
+        self._add({
+            'kind': 'request', 'source': source, 'page': page, 'attempt': attempt,
+            'status': status, 'latency_s': round(latency_s, 4), 'bytes': size,
+            'sleep_s': round(sleep_s, 4), 'error': error, 'credits': credits,
+        })
+
+    def cached(self, source: str, page: Optional[int] = None):
+        """Réponse servie par le cache HTTP."""
+        self._add({'kind': 'cache', 'source': source, 'page': page})
+
+    def page(self, source: str, page: int, received: int, accepted: int, label: str = ''):
+        """Page post-filtrée : résultats reçus de l'API / entreprises retenues."""
+        self._add({'kind': 'page', 'source': source, 'page': page, 'label': label,
+                   'received': received, 'accepted': accepted})
+
+    def absorb(self, other: 'RequestLog'):
+        """Ajoute les événements d'un autre journal (t recalé sur le début de celui-ci)."""
+        offset = other._started - self._started
+        moved = [dict(e, t=round(e['t'] + offset, 4)) for e in other.events]
+        with self._lock:
+            self._events.extend(moved)
+            self._events.sort(key=lambda e: e['t'])
+
+    # ──────────────────────────────────────────
+    # Lecture
+    # ──────────────────────────────────────────
+
+    @property
+    def events(self) -> List[Dict]:
+        with self._lock:
+            return list(self._events)
+
+    def summary(self) -> Dict:
+        """Agrégats de la recherche (voir docstring du module)."""
+        events = self.events
+        requests_ = [e for e in events if e['kind'] == 'request']
+        pages = [e for e in events if e['kind'] == 'page']
+        latencies = sorted(e['latency_s'] for e in requests_ if e['status'] is not None)
+        by_status: Dict[str, int] = {}
+        for e in requests_:
+            key = str(e['status']) if e['status'] is not None else (e['error'] or 'erreur')
+            by_status[key] = by_status.get(key, 0) + 1
+        answered = [e for e in requests_ if e['status'] == 200]
+        received = sum(e['received'] for e in pages)
+        accepted = sum(e['accepted'] for e in pages)
+        return {
+            'requests': len(requests_),
+            'retries': sum(1 for e in requests_ if e['attempt'] > 1),
+            'cache_hits': sum(1 for e in events if e['kind'] == 'cache'),
+            'by_status': by_status,
+            'latency_p50_s': _percentile(latencies, 50),
+            'latency_p95_s': _percentile(latencies, 95),
+            'network_s': round(sum(e['latency_s'] for e in requests_), 3),
+            'sleep_s': round(sum(e['sleep_s'] for e in requests_), 3),
+            'bytes': sum(e['bytes'] for e in requests_),
+            'bytes_per_page': (round(sum(e['bytes'] for e in answered) / len(answered))
+                               if answered else None),
+            'credits': sum(e.get('credits', 0) for e in requests_),
+            'pages': len(pages),
+            'received': received,
+            'accepted': accepted,
+            'acceptance_rate': accepted / received if received else None,
+            'elapsed_s': round(events[-1]['t'], 3) if events else 0.0,
+        }
+
+    def format_summary(self) -> List[str]:
+        """Résumé lisible (une ligne par agrégat) pour print / Streamlit."""
+        s = self.summary()
+        if not s['requests'] and not s['cache_hits']:
+            return ["Aucune requête HTTP"]
+
+        def ms(value):
+            return f"{value * 1000:.0f} ms" if value is not None else "-"
+
+        statuts = ', '.join(f"{k}: {v}" for k, v in sorted(s['by_status'].items()))
+        lines = [
+            f"Requêtes: {s['requests']} ({s['retries']} retries, {s['cache_hits']} depuis le cache)"
+            + (f" — {statuts}" if statuts else ""),
+            f"Latence: p50 {ms(s['latency_p50_s'])}, p95 {ms(s['latency_p95_s'])}",
+            f"Temps réseau {s['network_s']:.1f} s, en attente (throttle) {s['sleep_s']:.1f} s, "
+            f"{s['bytes'] / 1024:.0f} Ko reçus"
+            + (f" ({s['bytes_per_page'] / 1024:.1f} Ko par réponse 200)" if s['bytes_per_page'] else ""),
+        ]
+        if s['received']:
+            lines.append(f"Acceptation: {s['accepted']}/{s['received']} "
+                         f"({s['acceptance_rate']:.0%}) sur {s['pages']} pages")
+        if s['credits']:
+            per = f", {s['credits'] / s['accepted']:.1f} par ligne retenue" if s['accepted'] else ""
+            lines.append(f"Jetons API: {s['credits']:g}{per}")
+        return lines
+
+    def to_dict(self, messages: Optional[List[str]] = None) -> Dict:
+        data = {'summary': self.summary(), 'events': self.events}
+        if messages is not None:
+            data['messages'] = list(messages)
+        return data
+
+    def export_json(self, path: str, messages: Optional[List[str]] = None):
+        """Écrit {summary, events, messages} en JSON."""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(messages), f, ensure_ascii=False, indent=1)
@@ -3,6 +3,14 @@ MiraScrap - Pipeline local complet (sans limite de temps)
 
 Usage interactif :  python run_all.py
 Usage direct :      python run_all.py --limit 500 --ca-min 5 --ca-max 50 --region 11
+Caches :            --no-cache (désactive) / --refresh (ignore le cache, le réécrit) : réponses HTTP et holdings (PM)
+Reprise :           python run_all.py --resume <run-id>  (run interrompu, sans refetch ; --delta repris du run,
+                    pas de reprise avec --sirene)
+Miroir SIRENE :     --sirene  (recherche hors ligne, voir sirene_local.py)
+Relance delta :     --delta  (ne retraite que les SIREN nouveaux/modifiés depuis le dernier run)
+Mode batch :        python run_all.py --batch filtres.yaml  (plusieurs jeux de filtres, voir batch.py)
+Sources :           --sources hedged|race|sequential, --hedge-after 10  (data.gouv / Pappers, voir sources.py)
+Complément Pappers : --fill-gaps 50  (jetons pour remplir site/tél/email/CA vides, voir gap_fill.py)
 """
 
 import os
@@ -21,23 +29,31 @@ if _env_path.exists():
             key, val = line.split('=', 1)
             os.environ.setdefault(key.strip(), val.strip())
 
-from scraper import DataGouvScraper, TRANCHES_PME
-from scraper_pappers import PappersScraper
-from enricher import SocieteEnricher
-from qualifier import AutoScorer, ProspectQualifier, format_excel_output
-from letter_generator import LetterGenerator
 import config
 
+# Les modules des étapes (pandas, scrapers, docx, anthropic...) sont importés
+# par l'étape qui les utilise : --help et le démarrage d'api_server restent rapides.
 
-def run_pipeline(custom_filtres=None):
+
+def run_pipeline(custom_filtres=None, checkpoint=None, delta=False, sirene=False):
     """
     Execute le pipeline complet :
-    1. Scraping API data.gouv (CA + dirigeant + age inclus)
-    2. Enrichissement API JSON + recherche site web (DDG)
+    1. Scraping API data.gouv (CA + dirigeant + age inclus), Pappers en relais
+    2. Enrichissement API JSON + recherche site web (DDG), puis
+       complément Pappers des cellules restées vides (gap_fill_credits)
     3. Scoring auto ou IA
     4. Deduplication + generation lettres
     5. Export Excel + ZIP
+
+    checkpoint : ScrapeCheckpoint du run (scraping data.gouv et Pappers reprenable)
+    delta : compare au snapshot du dernier run avec les mêmes filtres ;
+            seuls les SIREN nouveaux/modifiés passent par les étapes 1b-3,
+            les autres reprennent enrichissement et score du snapshot
+    sirene : recherche dans le miroir SIRENE local au lieu de l'API data.gouv
     """
+    from snapshot import DeltaSnapshot
+    from sources import SourceRace, default_sources
+
     filtres = custom_filtres if custom_filtres else config.FILTRES
 
     print("\n" + "="*60)
@@ -48,99 +64,268 @@ def run_pipeline(custom_filtres=None):
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 
     # ================================================
-    # ETAPE 1 : SCRAPING (data.gouv -> fallback Pappers)
+    # ETAPE 1 : SCRAPING (data.gouv, Pappers en relais / en course)
     # ================================================
     print("\n ETAPE 1/5 : Scraping data.gouv.fr (CA, dirigeants, finances)")
     print("-" * 60)
 
-    try:
-        scraper = DataGouvScraper()
-        companies = scraper.search_companies(filtres)
-    except RuntimeError as e:
-        print(f"\n data.gouv inaccessible: {e}")
-        companies = None
-
-    if not companies and config.PAPPERS_API_KEY:
-        print("\n Fallback Pappers...")
-        try:
-            scraper = PappersScraper(config.PAPPERS_API_KEY)
-            companies = scraper.search_companies(filtres)
-        except RuntimeError as e:
-            print(f"\n Pappers aussi en erreur: {e}")
+    # Sources en course (sources.py) : la 1re qui livre des résultats gagne
+    scraper = SourceRace(default_sources(sirene=sirene, checkpoint=checkpoint))
+    companies = scraper.search_companies(filtres)
+
+    # Diagnostics structurés du scraping (latences, attente throttle, acceptation)
+    for line in scraper.request_log.format_summary():
+        print(f"  {line}")
+    diag_path = f"outputs/diagnostics_{timestamp}.json"
+    scraper.request_log.export_json(diag_path, messages=scraper.diagnostics)
+    print(f"  Diagnostics : {diag_path}")
 
     if not companies:
         print("\n ERREUR : Aucune entreprise trouvee")
         return None
 
-    try:
-        df = scraper.to_dataframe(companies)
+    snapshot = None
+    if delta:
+        snapshot = DeltaSnapshot(filtres)
+        companies = snapshot.split(companies)
+        counts = snapshot.counts()
+        since = f" (snapshot du {snapshot.updated})" if snapshot.updated else " (premier run)"
+        print(f"\n Delta{since} : {counts['nouveau']} nouveaux, {counts['modifie']} modifies, "
+              f"{counts['inchange']} inchanges repris, {counts['sortis']} sortis")
+
+    df = None
+    if companies:
+        try:
+            df = scraper.to_dataframe(companies)
 
-        ca_filled = df['ca_euros'].notna().sum()
-        age_filled = df['age_dirigeant'].notna().sum()
-        print(f"\n {len(df)} entreprises (CA: {ca_filled}/{len(df)}, Age: {age_filled}/{len(df)})")
+            ca_filled = df['ca_euros'].notna().sum()
+            age_filled = df['age_dirigeant'].notna().sum()
+            print(f"\n {len(df)} entreprises (CA: {ca_filled}/{len(df)}, Age: {age_filled}/{len(df)})")
 
-    except Exception as e:
-        print(f"\n ERREUR scraping : {e}")
-        return None
+        except Exception as e:
+            print(f"\n ERREUR scraping : {e}")
+            return None
+
+    if df is None:
+        print("\n Aucune entreprise nouvelle ou modifiee : enrichissement et scoring repris")
+        df = snapshot.merge(None)
+    else:
+        df = _enrich_and_score(df, timestamp, _gap_fill_credits(filtres),
+                               exclude=[s for s, o in scraper.origins.items() if o == 'pappers'],
+                               raw_records=scraper.raw_records(companies))
+        if snapshot is not None:
+            df = snapshot.merge(df)
+
+    if snapshot is not None:
+        snapshot.save(df)
+        print(f"  Snapshot : {snapshot.path}")
 
     # ================================================
-    # ETAPE 2 : ENRICHISSEMENT API JSON + SITE WEB
+    # ETAPE 4 : DEDUPLICATION + GENERATION LETTRES
     # ================================================
-    print("\n ETAPE 2/5 : Enrichissement API JSON + recherche site web")
+    print("\n ETAPE 4/5 : Deduplication + Generation lettres")
     print("-" * 60)
 
-    try:
-        enricher = SocieteEnricher()
-        df = enricher.enrich_dataframe(df, filter_ca=False)
-
-        file_enriched = f"outputs/enriched_{timestamp}.xlsx"
-        df.to_excel(file_enriched, index=False)
-        print(f" Sauvegarde : {file_enriched}")
+    # Deduplication par SIREN
+    if 'siren' in df.columns:
+        before = len(df)
+        df = df.drop_duplicates(subset=['siren'], keep='first')
+        if len(df) < before:
+            print(f"  Dedup: {before} -> {len(df)} ({before - len(df)} doublons supprimes)")
 
-    except Exception as e:
-        print(f"\n Enrichissement partiel ({e})")
+    lettres_dir = f"outputs/lettres_{timestamp}"
+    letter_files = list(_generate_letters(df, lettres_dir).values())
 
     # ================================================
-    # ETAPE 3 : SCORING
+    # ETAPE 5 : EXPORT EXCEL + ZIP
     # ================================================
-    print("\n ETAPE 3/5 : Scoring")
+    print("\n ETAPE 5/5 : Export Excel + ZIP")
     print("-" * 60)
 
-    has_api_key = config.ANTHROPIC_API_KEY and config.ANTHROPIC_API_KEY != "sk-ant-xxxxx"
+    file_final = f"outputs/prospects_{timestamp}.xlsx"
+    zip_path = f"outputs/MiraScrap_{timestamp}.zip"
+    _export(df, letter_files, file_final, zip_path)
 
-    if has_api_key:
-        print("  Qualification IA (Claude)...")
+    # Resume
+    print("\n" + "="*60)
+    print("PIPELINE TERMINE")
+    print("="*60)
+
+    print(f"\n {len(df)} entreprises analysees")
+
+    if 'score' in df.columns:
+        print("\nScores :")
+        score_counts = df['score'].value_counts().sort_index()
+        for score, count in score_counts.items():
+            label = config.SCORING_CATEGORIES.get(score, '')
+            print(f"   {score} - {label} : {count}")
+
+    _print_http_stats()
+
+    print(f"\n Excel  : {file_final}")
+    print(f"   Lettres : {lettres_dir}/")
+    print(f"   ZIP     : {zip_path}")
+    print("="*60 + "\n")
+
+    return file_final
+
+
+def run_batch(batch_path, sirene=False, overrides=None):
+    """
+    Mode batch (voir batch.py) : une requête couvrante par groupe de jeux de
+    filtres, puis enrichissement, scoring et lettres une seule fois par SIREN.
+    Chaque jeu a son Excel + ZIP dans outputs/batch_<timestamp>/<jeu>/ ;
+    recouvrement.json détaille les SIREN partagés entre jeux.
+
+    overrides : clés ajoutées à chaque jeu (budgets --max-pages / --time-budget,
+                jetons du complément Pappers --fill-gaps)
+    """
+    import json
+    import batch
+    from scraper import DataGouvScraper
+    from sirene_local import SireneLocalScraper
+
+    members = batch.load_batch(batch_path)
+    for member in members:
+        member['filtres'].update(overrides or {})
+
+    print("\n" + "="*60)
+    print("MIRASCRAP - PIPELINE PROSPECTS B2B (BATCH)")
+    print("="*60)
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    base_dir = f"outputs/batch_{timestamp}"
+    os.makedirs(base_dir, exist_ok=True)
+
+    scraper = SireneLocalScraper() if sirene else DataGouvScraper()
+    groups = batch.plan_batch(members, scraper._extract_age_dirigeant,
+                              lambda company: scraper._extract_finances(company)[0])
+    print(f"\n {len(members)} jeux de filtres -> {len(groups)} requete(s) couvrante(s)")
+
+    # ================================================
+    # ETAPE 1 : SCRAPING (une requête par groupe)
+    # ================================================
+    print("\n ETAPE 1/5 : Scraping (requetes couvrantes)")
+    print("-" * 60)
+
+    diagnostics = []
+    for i, group in enumerate(groups, 1):
+        print(f"\n Requete {i}/{len(groups)} : {group.label()}")
         try:
-            qualifier = ProspectQualifier(config.ANTHROPIC_API_KEY)
-            df = qualifier.qualify_dataframe(df)
-        except Exception as e:
-            print(f"  Erreur IA: {e} -> scoring automatique")
-            scorer = AutoScorer()
-            df = scorer.score_dataframe(df)
-    else:
-        print("  Scoring automatique (pas de cle API)")
-        scorer = AutoScorer()
-        df = scorer.score_dataframe(df)
+            group.collect(scraper)
+        except RuntimeError as e:
+            print(f"\n {'Miroir SIRENE' if sirene else 'data.gouv'} inaccessible: {e}")
+        for line in scraper.request_log.format_summary():
+            print(f"  {line}")
+        for member in group.members:
+            print(f"  {member.name} : {len(member.companies)}/{member.limit}")
+        diagnostics.append(dict(scraper.request_log.to_dict(scraper.diagnostics),
+                                jeux=[m.name for m in group.members], filtres=group.filtres))
+    diag_path = f"{base_dir}/diagnostics.json"
+    with open(diag_path, 'w', encoding='utf-8') as f:
+        json.dump(diagnostics, f, ensure_ascii=False, indent=1, default=str)
+    print(f"\n  Diagnostics : {diag_path}")
+
+    by_name = {m.name: m for group in groups for m in group.members}
+    ordered = [by_name[entry['name']] for entry in members]
+    unique = {}
+    for member in ordered:
+        for company in member.companies:
+            unique.setdefault(company['siren'], company)
+    if not unique:
+        print("\n ERREUR : Aucune entreprise trouvee")
+        return None
+
+    report = batch.overlap_report(ordered)
+    print(f"\n {report['sirens_uniques']} SIREN uniques pour {report['lignes_cumulees']} lignes "
+          f"({report['enrichissements_evites']} enrichissements evites)")
+
+    try:
+        df = scraper.to_dataframe(unique.values())
+    except Exception as e:
+        print(f"\n ERREUR scraping : {e}")
+        return None
+
+    # Enregistrements data.gouv réutilisés par l'enrichissement (le miroir
+    # SIRENE n'a pas les dirigeants : API dans ce cas)
+    raw_records = None if sirene else unique
+    df = _enrich_and_score(df, timestamp, _gap_fill_credits(overrides or {}),
+                           raw_records=raw_records)
+    df = df.drop_duplicates(subset=['siren'], keep='first')
 
     # ================================================
-    # ETAPE 4 : DEDUPLICATION + GENERATION LETTRES
+    # ETAPE 4 : GENERATION LETTRES (une par SIREN)
     # ================================================
-    print("\n ETAPE 4/5 : Deduplication + Generation lettres")
+    print("\n ETAPE 4/5 : Generation lettres")
     print("-" * 60)
+    letters = _generate_letters(df, f"{base_dir}/lettres")
 
-    # Deduplication par SIREN
-    if 'siren' in df.columns:
-        before = len(df)
-        df = df.drop_duplicates(subset=['siren'], keep='first')
-        if len(df) < before:
-            print(f"  Dedup: {before} -> {len(df)} ({before - len(df)} doublons supprimes)")
+    # ================================================
+    # ETAPE 5 : EXPORT EXCEL + ZIP PAR JEU
+    # ================================================
+    print("\n ETAPE 5/5 : Export Excel + ZIP par jeu de filtres")
+    print("-" * 60)
 
-    lettres_dir = f"outputs/lettres_{timestamp}"
+    sirens = df['siren'].astype(str)
+    for member in ordered:
+        subset = df[sirens.isin(member.sirens)].reset_index(drop=True)
+        if subset.empty:
+            print(f"  {member.name} : aucune entreprise, pas d'export")
+            continue
+        out_dir = os.path.join(base_dir, batch.slug(member.name))
+        os.makedirs(out_dir, exist_ok=True)
+        print(f"  {member.name} : {len(subset)} entreprises")
+        _export(subset, [letters[s] for s in subset['siren'].astype(str) if s in letters],
+                os.path.join(out_dir, "prospects.xlsx"),
+                os.path.join(out_dir, f"MiraScrap_{batch.slug(member.name)}.zip"))
+
+    report_path = f"{base_dir}/recouvrement.json"
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=1)
+
+    # Resume
+    print("\n" + "="*60)
+    print("BATCH TERMINE")
+    print("="*60)
+    print(f"\n {'Jeu':30s} {'Retenues':>9s} {'Propres':>8s}")
+    for row in report['jeux']:
+        print(f" {row['name'][:30]:30s} {row['retenues']:>5d}/{row['limite']:<3d} {row['propres']:>8d}")
+    for pair in report['paires']:
+        print(f"   {pair['a']} & {pair['b']} : {pair['communes']} SIREN communs "
+              f"(Jaccard {pair['jaccard']:.0%})")
+
+    _print_http_stats()
+    print(f"\n Dossier : {base_dir}/")
+    print(f"   Recouvrement : {report_path}")
+    print("="*60 + "\n")
+
+    return base_dir
+
+
+def _print_http_stats():
+    """Bilan cache HTTP + blocages par host, en fin de run."""
+    import http_cache
+    import throttle
+
+    cache_stats = http_cache.get_shared_response_cache().stats()
+    print(f"\n Cache HTTP : {cache_stats['hits']} hits / {cache_stats['misses']} misses "
+          f"({cache_stats['hit_rate']:.0%})")
+    for host, st in throttle.throttle_status().items():
+        if st['throttled'] or st['errors']:
+            print(f" Throttle {host} : {st['throttled']} blocages, {st['errors']} erreurs, "
+                  f"{st['opened']} circuit(s) ouvert(s), {st['paused_s']:.0f}s de pause")
+
+
+def _generate_letters(df, lettres_dir):
+    """Etape 4 : une lettre Word par entreprise → {siren: chemin}."""
+    from letter_generator import LetterGenerator
+
+    has_api_key = config.ANTHROPIC_API_KEY and config.ANTHROPIC_API_KEY != "sk-ant-xxxxx"
     letter_api_key = config.ANTHROPIC_API_KEY if has_api_key else ""
     gen = LetterGenerator(output_dir=lettres_dir, api_key=letter_api_key)
 
     # Generer lettres Word
-    letter_files = []
+    letter_files = {}
     total = len(df)
     for i, (_, row) in enumerate(df.iterrows()):
         prospect = row.to_dict()
@@ -150,24 +335,22 @@ def run_pipeline(custom_filtres=None):
             filepath = os.path.join(lettres_dir, filename)
             with open(filepath, 'wb') as f:
                 f.write(buf.getvalue())
-            letter_files.append(filepath)
+            letter_files[str(prospect.get('siren', filepath))] = filepath
         except Exception as e:
             print(f"  Erreur lettre pour {prospect.get('nom_entreprise', '?')}: {e}")
         if total > 50 and (i + 1) % 50 == 0:
             print(f"  Lettres : {i+1}/{total}...")
     print(f"  {len(letter_files)} lettres generees dans {lettres_dir}/")
+    return letter_files
 
-    # ================================================
-    # ETAPE 5 : EXPORT EXCEL + ZIP
-    # ================================================
-    print("\n ETAPE 5/5 : Export Excel + ZIP")
-    print("-" * 60)
 
-    file_final = f"outputs/prospects_{timestamp}.xlsx"
-    excel_bytes = format_excel_output(df, file_final)
+def _export(df, letter_files, file_final, zip_path):
+    """Etape 5 : Excel formaté + ZIP (Excel et lettres)."""
+    from qualifier import format_excel_output
+
+    format_excel_output(df, file_final)
 
     # ZIP
-    zip_path = f"outputs/MiraScrap_{timestamp}.zip"
     with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zf:
         zf.write(file_final, "prospects.xlsx")
         for letter_path in letter_files:
@@ -176,30 +359,87 @@ def run_pipeline(custom_filtres=None):
 
     print(f"  ZIP : {zip_path}")
 
-    # Resume
-    print("\n" + "="*60)
-    print("PIPELINE TERMINE")
-    print("="*60)
 
-    print(f"\n {len(df)} entreprises analysees")
+def _gap_fill_credits(filtres):
+    """Jetons du complément Pappers (filtres['gap_fill_credits'] > config), 0 = désactivé."""
+    credits = filtres.get('gap_fill_credits')
+    if credits is None:
+        credits = config.GAP_FILL_CONFIG.get('credit_budget', 0)
+    return float(credits or 0)
 
-    if 'score' in df.columns:
-        print("\nScores :")
-        score_counts = df['score'].value_counts().sort_index()
-        for score, count in score_counts.items():
-            label = config.SCORING_CATEGORIES.get(score, '')
-            print(f"   {score} - {label} : {count}")
 
-    print(f"\n Excel  : {file_final}")
-    print(f"   Lettres : {lettres_dir}/")
-    print(f"   ZIP     : {zip_path}")
-    print("="*60 + "\n")
+def _enrich_and_score(df, timestamp, fill_credits=0, exclude=(), raw_records=None):
+    """
+    Etapes 2 et 3 : enrichissement API + site web, complément Pappers des
+    cellules encore vides (fill_credits jetons, SIREN de exclude ignorés),
+    puis scoring auto ou IA. raw_records : SIREN → enregistrement data.gouv
+    du scraping (finances et dirigeants sans rappeler l'API).
+    """
+    from enricher import SocieteEnricher
+    from qualifier import AutoScorer, ProspectQualifier
 
-    return file_final
+    # ================================================
+    # ETAPE 2 : ENRICHISSEMENT API JSON + SITE WEB
+    # ================================================
+    print("\n ETAPE 2/5 : Enrichissement API JSON + recherche site web")
+    print("-" * 60)
+
+    try:
+        enricher = SocieteEnricher()
+        df = enricher.enrich_dataframe(df, filter_ca=False, raw_records=raw_records)
+
+        file_enriched = f"outputs/enriched_{timestamp}.xlsx"
+        df.to_excel(file_enriched, index=False)
+        print(f" Sauvegarde : {file_enriched}")
+
+    except Exception as e:
+        print(f"\n Enrichissement partiel ({e})")
+
+    # Complément payant après l'enrichissement gratuit : les jetons ne vont
+    # qu'aux cellules que data.gouv et la recherche web n'ont pas remplies
+    if fill_credits and config.PAPPERS_API_KEY:
+        from gap_fill import fill_gaps, format_fill_report
+        from scraper_pappers import PappersScraper
+
+        try:
+            df, report = fill_gaps(df, PappersScraper(config.PAPPERS_API_KEY),
+                                   credit_budget=fill_credits, exclude=exclude)
+            for line in format_fill_report(report):
+                print(f"  {line}")
+        except RuntimeError as e:
+            print(f"  Complement Pappers interrompu ({e})")
+    elif fill_credits:
+        print("  Complement Pappers ignore (pas de cle PAPPERS_API_KEY)")
+
+    # ================================================
+    # ETAPE 3 : SCORING
+    # ================================================
+    print("\n ETAPE 3/5 : Scoring")
+    print("-" * 60)
+
+    has_api_key = config.ANTHROPIC_API_KEY and config.ANTHROPIC_API_KEY != "sk-ant-xxxxx"
+
+    if has_api_key:
+        print("  Qualification IA (Claude)...")
+        try:
+            qualifier = ProspectQualifier(config.ANTHROPIC_API_KEY)
+            df = qualifier.qualify_dataframe(df)
+        except Exception as e:
+            print(f"  Erreur IA: {e} -> scoring automatique")
+            scorer = AutoScorer()
+            df = scorer.score_dataframe(df)
+    else:
+        print("  Scoring automatique (pas de cle API)")
+        scorer = AutoScorer()
+        df = scorer.score_dataframe(df)
+
+    return df
 
 
 def interactive_setup():
     """Configuration interactive des filtres."""
+    from scraper import TRANCHES_PME
+
     print("\n" + "="*60)
     print("MIRASCRAP - Configuration")
     print("="*60)
@@ -261,10 +501,82 @@ def main():
     parser.add_argument('--region', type=str, help='Code region INSEE')
     parser.add_argument('--secteur', type=str, help='Code secteur NAF')
     parser.add_argument('--forme', type=str, help='Forme juridique (SAS/SARL/SA)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Desactive les caches disque (reponses API, dirigeants des holdings)')
+    parser.add_argument('--refresh', action='store_true',
+                        help='Ignore les caches existants (reponses API, holdings) et les remplace')
+    parser.add_argument('--resume', type=str, metavar='RUN_ID',
+                        help='Reprend un run interrompu depuis son checkpoint')
+    parser.add_argument('--max-pages', type=int,
+                        help='Budget de pages API data.gouv (arret anticipe)')
+    parser.add_argument('--time-budget', type=float, metavar='SECONDES',
+                        help='Budget de temps du scraping data.gouv (arret anticipe)')
+    parser.add_argument('--pappers-credits', type=float, metavar='JETONS',
+                        help='Budget de jetons du fallback Pappers (arret de la pagination)')
+    parser.add_argument('--fill-gaps', type=float, metavar='JETONS',
+                        help='Jetons Pappers pour remplir site/tel/email/CA restes vides (0 = desactive)')
+    parser.add_argument('--sources', choices=('sequential', 'hedged', 'race'),
+                        help='Enchainement data.gouv / Pappers (defaut : config.SOURCES_CONFIG)')
+    parser.add_argument('--hedge-after', type=float, metavar='SECONDES',
+                        help='Active le mode hedged : delai sans resultat avant de lancer Pappers')
+    parser.add_argument('--sirene', action='store_true',
+                        help='Recherche dans le miroir SIRENE local (python sirene_local.py import ...)')
+    parser.add_argument('--delta', action='store_true',
+                        help='Ne retraite que les entreprises nouvelles/modifiees depuis '
+                             'le dernier run avec les memes filtres')
+    parser.add_argument('--batch', type=str, metavar='FICHIER',
+                        help='Plusieurs jeux de filtres (YAML) en un run, requetes mutualisees')
     args = parser.parse_args()
-
+    if args.batch and (args.resume or args.delta):
+        parser.error("--batch n'est pas compatible avec --resume / --delta")
+
+    import http_cache
+    from checkpoint import ScrapeCheckpoint
+    from scraper import TRANCHES_PME
+
+    http_cache.configure(enabled=not args.no_cache, refresh=args.refresh)
+
+    if args.batch:
+        overrides = {}
+        if args.max_pages is not None:
+            overrides['max_pages'] = args.max_pages
+        if args.time_budget is not None:
+            overrides['time_budget_s'] = args.time_budget
+        if args.fill_gaps is not None:
+            overrides['gap_fill_credits'] = args.fill_gaps
+        try:
+            result = run_batch(args.batch, sirene=args.sirene, overrides=overrides)
+        except (OSError, ValueError, RuntimeError) as e:
+            print(f"Echec : {e}")
+            sys.exit(1)
+        if not result:
+            print("Echec du batch")
+            sys.exit(1)
+        print(f"Succes ! Dossier : {result}")
+        return
+
+    if args.resume:
+        # Reprise : filtres et curseur de pagination relus depuis le checkpoint
+        try:
+            checkpoint = ScrapeCheckpoint.load(args.resume)
+        except FileNotFoundError as e:
+            print(f"Echec : {e}")
+            sys.exit(1)
+        options = checkpoint.options
+        if args.sirene or options.get('source', 'datagouv') != 'datagouv':
+            # Le miroir SIRENE ne se reprend pas (aucun checkpoint créé)
+            parser.error("--resume ne reprend que les runs data.gouv (sans --sirene)")
+        if checkpoint.filtres is None:
+            print(f"Echec : run {args.resume} interrompu avant le scraping, relancer sans --resume")
+            sys.exit(1)
+        # Source et découpage delta du run d'origine, pas ceux de la ligne de commande
+        if args.delta != bool(options.get('delta', args.delta)):
+            print(f" Reprise : --delta {'active' if options['delta'] else 'desactive'} "
+                  f"comme dans le run d'origine")
+        args.delta = bool(options.get('delta', args.delta))
+        filtres = checkpoint.filtres
     # Mode CLI direct si des arguments sont passes
-    if any(v is not None for v in [args.limit, args.ca_min, args.ca_max, args.region]):
+    elif any(v is not None for v in [args.limit, args.ca_min, args.ca_max, args.region]):
         filtres = {
             'tranches_effectif': TRANCHES_PME,
             'region': args.region,
@@ -281,9 +593,34 @@ def main():
         # Mode interactif
         filtres = interactive_setup()
 
-    result = run_pipeline(filtres)
+    if args.max_pages is not None:
+        filtres['max_pages'] = args.max_pages
+    if args.time_budget is not None:
+        filtres['time_budget_s'] = args.time_budget
+    if args.pappers_credits is not None:
+        filtres['credit_budget'] = args.pappers_credits
+    if args.sources:
+        filtres['source_mode'] = args.sources
+    if args.hedge_after is not None:
+        filtres['latency_budget_s'] = args.hedge_after
+        filtres.setdefault('source_mode', 'hedged')
+    if args.fill_gaps is not None:
+        filtres['gap_fill_credits'] = args.fill_gaps
+
+    if args.sirene:
+        # Recherche locale : pas de pagination à reprendre, ni de checkpoint
+        checkpoint = None
+    elif not args.resume:
+        checkpoint = ScrapeCheckpoint(ScrapeCheckpoint.new_run_id())
+        checkpoint.set_options(source='datagouv', delta=args.delta)
+    if checkpoint is not None:
+        print(f"\n Run id : {checkpoint.run_id} (reprise : python run_all.py --resume {checkpoint.run_id})")
+
+    result = run_pipeline(filtres, checkpoint=checkpoint, delta=args.delta, sirene=args.sirene)
 
     if result:
+        if checkpoint is not None:
+            checkpoint.remove()
         print(f"Succes ! Fichier : {result}")
     else:
         print("Echec du pipeline")
@@ -12,14 +12,26 @@ IMPORTANT:
 import json
 import logging
 import os
+import pickle
+import queue
+import re
+import threading
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
+import numpy as np
 import pandas as pd
 import time
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set
 import config
+from checkpoint import ScrapeCheckpoint
+from http_cache import ResponseCache, get_shared_response_cache
+from pm_cache import PMLookupCache, get_shared_pm_cache
+from request_log import RequestLog
+from throttle import CircuitOpenError, get_host_throttle, parse_retry_after
 
 logger = logging.getLogger(__name__)
 
@@ -76,6 +88,27 @@ REGION_DEPARTEMENTS = {
     "94": ["2A", "2B"],  # Corse
 }
 
+# Tous les départements (métropole + DOM) : partition complète pour le sharding
+ALL_DEPARTEMENTS = sorted(
+    {d for depts in REGION_DEPARTEMENTS.values() for d in depts}
+    | {"971", "972", "973", "974", "976"}
+)
+
+# Division NAF (2 chiffres) → section lettre, nomenclature NAF rév. 2 complète
+NAF_DIVISION_TO_SECTION = {
+    f"{division:02d}": section
+    for section, (first, last) in {
+        "A": (1, 3), "B": (5, 9), "C": (10, 33), "D": (35, 35), "E": (36, 39),
+        "F": (41, 43), "G": (45, 47), "H": (49, 53), "I": (55, 56), "J": (58, 63),
+        "K": (64, 66), "L": (68, 68), "M": (69, 75), "N": (77, 82), "O": (84, 84),
+        "P": (85, 85), "Q": (86, 88), "R": (90, 93), "S": (94, 96), "T": (97, 98),
+        "U": (99, 99),
+    }.items()
+    for division in range(first, last + 1)
+}
+# Sections lettre, acceptées telles quelles dans filtres['secteur_naf']
+NAF_SECTIONS = frozenset(NAF_DIVISION_TO_SECTION.values())
+
 # Mapping forme juridique texte → codes nature_juridique
 FORME_TO_NATURE = {
     "SAS": ["5710"],
@@ -87,23 +120,342 @@ FORME_TO_NATURE = {
 # Mapping code NAF (ex: "62.01Z") → libellé en français
 # Source : SocialGouv/codes-naf (données INSEE)
 _NAF_JSON = os.path.join(os.path.dirname(__file__), 'data', 'naf_codes.json')
-try:
-    with open(_NAF_JSON, encoding='utf-8') as _f:
-        NAF_LABELS = {e['id']: e['label'] for e in json.load(_f)}
-except FileNotFoundError:
-    NAF_LABELS = {}
+
+
+class _NafLabels(Mapping):
+    """
+    Index code NAF → libellé, chargé au premier accès (pas à l'import).
+    Copie pickle dans config.CACHE_CONFIG['dir'], invalidée quand le JSON
+    source change (mtime + taille). JSON absent → index vide.
+    """
+
+    def __init__(self, path: str):
+        self._path = path
+        self._labels: Optional[Dict[str, str]] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, str]:
+        if self._labels is None:
+            with self._lock:
+                if self._labels is None:
+                    self._labels = self._read()
+        return self._labels
+
+    def _read(self) -> Dict[str, str]:
+        try:
+            st = os.stat(self._path)
+        except FileNotFoundError:
+            return {}
+        stamp = (st.st_mtime_ns, st.st_size)
+        cache_path = os.path.join(config.CACHE_CONFIG['dir'], 'naf_labels.pickle')
+        try:
+            with open(cache_path, 'rb') as f:
+                cached_stamp, labels = pickle.load(f)
+            if cached_stamp == stamp:
+                return labels
+        except (OSError, EOFError, ValueError, TypeError, pickle.UnpicklingError):
+            pass
+
+        with open(self._path, encoding='utf-8') as f:
+            labels = {e['id']: e['label'] for e in json.load(f)}
+        try:
+            os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+            tmp = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp, 'wb') as f:
+                pickle.dump((stamp, labels), f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, cache_path)
+        except OSError:
+            pass  # cache en lecture seule : on relira le JSON au prochain process
+        return labels
+
+    def __getitem__(self, code: str) -> str:
+        return self._load()[code]
+
+    def get(self, code, default=None):
+        return self._load().get(code, default)
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self) -> int:
+        return len(self._load())
+
+
+NAF_LABELS = _NafLabels(_NAF_JSON)
+
+# Schéma du DataFrame commun aux scrapers (ordre des colonnes)
+RECORD_COLUMNS = (
+    'nom_entreprise', 'siren', 'siret_siege', 'forme_juridique', 'code_naf',
+    'libelle_naf', 'date_creation', 'tranche_effectif', 'categorie',
+    'ca_euros', 'resultat_euros',
+    'adresse', 'code_postal', 'ville', 'departement', 'region', 'adresse_complete',
+    'dirigeant_principal', 'dirigeant_nom', 'dirigeant_prenom', 'age_dirigeant',
+    'url_pappers', 'url_datagouv',
+)
+# Colonnes que CompanyEnricher calcule depuis l'enregistrement retenu (raw_records)
+ENRICHED_COLUMNS = ('evolution_ca', 'dirigeant_enrichi')
+# Faible cardinalité → dtype category ; numériques → float64 (NaN si inconnu)
+CATEGORICAL_COLUMNS = frozenset({'region', 'departement', 'tranche_effectif',
+                                 'forme_juridique', 'code_naf'})
+NUMERIC_COLUMNS = frozenset({'ca_euros', 'resultat_euros', 'age_dirigeant'})
+
+# Manifeste du schéma : champs lus dans la réponse de chaque API pour produire
+# chaque colonne ('bloc.champ' = champ d'un dict, ou de chaque élément d'une
+# liste). FILTER_FIELDS : champs lus avant to_dataframe (dédup, post-filtres,
+# dirigeant PM). projection() en dérive ce qu'on demande à l'API.
+_DIRIGEANT_DATAGOUV = tuple(f"dirigeants.{f}" for f in (
+    'type_dirigeant', 'nom', 'prenoms', 'qualite', 'date_de_naissance', 'siren', 'denomination'))
+_DIRIGEANT_PAPPERS = tuple(f"representants.{f}" for f in (
+    'type', 'type_dirigeant', 'personne_morale', 'nom', 'prenom', 'prenoms', 'qualite', 'age',
+    'date_de_naissance', 'date_naissance', 'date_de_naissance_formate', 'denomination', 'siren'))
+FIELD_MANIFEST = {
+    'nom_entreprise': {'datagouv': ('nom_complet',),
+                       'pappers': ('nom_entreprise', 'denomination', 'nom_complet')},
+    'siren': {'datagouv': ('siren',), 'pappers': ('siren',)},
+    'siret_siege': {'datagouv': ('siege.siret',), 'pappers': ('siege.siret', 'siret_siege')},
+    'forme_juridique': {'datagouv': ('nature_juridique',),
+                        'pappers': ('categorie_juridique', 'forme_juridique', 'nature_juridique')},
+    'code_naf': {'datagouv': ('activite_principale',),
+                 'pappers': ('code_naf', 'activite_principale')},
+    'libelle_naf': {'datagouv': ('activite_principale',), 'pappers': ('libelle_code_naf',)},
+    'date_creation': {'datagouv': ('date_creation',), 'pappers': ('date_creation',)},
+    'tranche_effectif': {'datagouv': ('tranche_effectif_salarie',),
+                         'pappers': ('tranche_effectif_salarie', 'effectif')},
+    'categorie': {'datagouv': ('categorie_entreprise',), 'pappers': ('categorie_entreprise',)},
+    'ca_euros': {'datagouv': ('finances',), 'pappers': ('chiffre_affaires', 'finances')},
+    'resultat_euros': {'datagouv': ('finances',), 'pappers': ('resultat', 'finances')},
+    'adresse': {'datagouv': ('siege.adresse',),
+                'pappers': ('siege.adresse_ligne_1', 'siege.adresse')},
+    'code_postal': {'datagouv': ('siege.code_postal',), 'pappers': ('siege.code_postal',)},
+    'ville': {'datagouv': ('siege.libelle_commune',),
+              'pappers': ('siege.ville', 'siege.libelle_commune')},
+    'departement': {'datagouv': ('siege.departement',), 'pappers': ('siege.departement',)},
+    'region': {'datagouv': ('siege.region',), 'pappers': ('siege.region',)},
+    'adresse_complete': {'datagouv': ('siege.adresse', 'siege.code_postal', 'siege.libelle_commune'),
+                         'pappers': ('siege.adresse_ligne_1', 'siege.adresse', 'siege.code_postal',
+                                     'siege.ville', 'siege.libelle_commune')},
+    'dirigeant_principal': {'datagouv': _DIRIGEANT_DATAGOUV, 'pappers': _DIRIGEANT_PAPPERS},
+    'dirigeant_nom': {'datagouv': _DIRIGEANT_DATAGOUV, 'pappers': _DIRIGEANT_PAPPERS},
+    'dirigeant_prenom': {'datagouv': _DIRIGEANT_DATAGOUV, 'pappers': _DIRIGEANT_PAPPERS},
+    'age_dirigeant': {'datagouv': _DIRIGEANT_DATAGOUV, 'pappers': _DIRIGEANT_PAPPERS},
+    'url_pappers': {'datagouv': ('siren',), 'pappers': ('siren',)},
+    'url_datagouv': {'datagouv': ('siren',), 'pappers': ('siren',)},
+    # Calculées par CompanyEnricher depuis l'enregistrement du scraping
+    'evolution_ca': {'datagouv': ('finances',)},
+    'dirigeant_enrichi': {'datagouv': _DIRIGEANT_DATAGOUV},
+    # Bonus Pappers (PAPPERS_COLUMNS)
+    'site_web': {'pappers': ('site_internet', 'site_web', 'sites_internet')},
+    'telephone': {'pappers': ('telephone',)},
+    'email': {'pappers': ('email',)},
+}
+FILTER_FIELDS = {
+    'datagouv': ('siren', 'siege.departement', 'activite_principale', 'date_creation',
+                 'finances') + _DIRIGEANT_DATAGOUV,
+    'pappers': ('siren',),
+}
+# Blocs optionnels de recherche-entreprises (?minimal=true&include=...)
+DATAGOUV_BLOCKS = ('siege', 'dirigeants', 'finances', 'complements',
+                   'matching_etablissements', 'score')
+
+
+def projection(source: str, columns: Iterable[str] = RECORD_COLUMNS) -> Dict[str, Optional[frozenset]]:
+    """
+    Champs de l'API `source` nécessaires pour `columns` + FILTER_FIELDS :
+    {champ: None (gardé entier) ou frozenset des sous-champs gardés}.
+    """
+    paths = set(FILTER_FIELDS.get(source, ()))
+    for column in columns:
+        paths.update(FIELD_MANIFEST.get(column, {}).get(source, ()))
+    tree: Dict[str, Optional[set]] = {}
+    for path in paths:
+        top, _, sub = path.partition('.')
+        if not sub:
+            tree[top] = None
+        elif top not in tree:
+            tree[top] = {sub}
+        elif tree[top] is not None:
+            tree[top].add(sub)
+    return {k: frozenset(v) if v is not None else None for k, v in sorted(tree.items())}
+
+
+def project_record(record: Dict, tree: Dict[str, Optional[frozenset]]) -> Dict:
+    """Copie de `record` réduite aux champs de `tree` (voir projection())."""
+    out = {}
+    for key, sub in tree.items():
+        if key not in record:
+            continue
+        value = record[key]
+        if sub is not None:
+            if isinstance(value, dict):
+                value = {k: v for k, v in value.items() if k in sub}
+            elif isinstance(value, list):
+                value = [{k: v for k, v in item.items() if k in sub} if isinstance(item, dict)
+                         else item for item in value]
+        out[key] = value
+    return out
+
+
+def datagouv_projection_params(columns: Iterable[str] = RECORD_COLUMNS) -> Dict[str, str]:
+    """Paramètres minimal/include de recherche-entreprises pour ces colonnes."""
+    tree = projection('datagouv', columns)
+    return {'minimal': 'true', 'include': ','.join(b for b in DATAGOUV_BLOCKS if b in tree)}
+
+URL_PAPPERS = "https://www.pappers.fr/entreprise/"
+URL_DATAGOUV = "https://annuaire-entreprises.data.gouv.fr/entreprise/"
+
+
+def build_dataframe(columns: Sequence[str], rows: Iterable[tuple],
+                    chunk_size: int = 4096) -> pd.DataFrame:
+    """
+    Construit un DataFrame colonne par colonne à partir de tuples de valeurs
+    (dans l'ordre de `columns`), sans dict intermédiaire par ligne.
+    Les lignes sont transposées par paquets de `chunk_size` dans une liste
+    par colonne, puis chaque colonne est typée une seule fois : float64 pour
+    NUMERIC_COLUMNS, category pour CATEGORICAL_COLUMNS.
+    """
+    data = [[] for _ in columns]
+    chunk = []
+    for values in rows:
+        chunk.append(values)
+        if len(chunk) >= chunk_size:
+            for column, part in zip(data, zip(*chunk)):
+                column.extend(part)
+            chunk.clear()
+    if chunk:
+        for column, part in zip(data, zip(*chunk)):
+            column.extend(part)
+
+    frame = {}
+    for name, values in zip(columns, data):
+        if name in NUMERIC_COLUMNS:
+            frame[name] = np.array(values, dtype=np.float64)
+        elif name in CATEGORICAL_COLUMNS:
+            frame[name] = pd.Categorical(values)
+        else:
+            frame[name] = np.array(values, dtype=object)
+    return pd.DataFrame(frame, columns=list(columns))
+
+
+class PostFilter:
+    """
+    Post-filtres data.gouv compilés une fois depuis `filtres`.
+
+    Deux étages de prédicats (nom, fonction), chacun du moins cher au plus cher :
+    - cheap : dédup SIREN, département du siège, préfixe NAF, âge entreprise
+      (lecture du JSON uniquement)
+    - dirigeant : âge du dirigeant, qui peut nécessiter un deep lookup HTTP
+      de la holding ; les holdings sont résolues en lot entre les deux étages.
+    Chaque rejet est compté par prédicat (voir summary()).
+    """
+
+    def __init__(self, filtres: Dict, target_depts: List[str], seen_sirens: set,
+                 age_dirigeant):
+        self.target_depts = target_depts
+        self._lock = threading.Lock()
+
+        cheap = [('doublon', lambda c: c.get('siren') and c['siren'] not in seen_sirens)]
+        if target_depts:
+            # L'API filtre sur TOUT établissement : on vérifie le département du SIÈGE
+            depts = frozenset(target_depts)
+            cheap.append(('departement_siege',
+                          lambda c: (c.get('siege') or {}).get('departement', '') in depts))
+        secteur = filtres.get('secteur_naf')
+        if secteur and '.' not in secteur and secteur not in NAF_SECTIONS:
+            # NAF 2 chiffres : la section envoyée à l'API est trop large
+            prefix = secteur + '.'
+            cheap.append(('secteur_naf',
+                          lambda c: (c.get('activite_principale') or '').startswith(prefix)))
+        age_min = filtres.get('age_min', 0) or 0
+        if age_min > 0:
+            # âge >= age_min  <=>  année de création <= année courante - age_min
+            year_max = datetime.now().year - age_min
+            cheap.append(('age_min', lambda c: 0 < _creation_year(c) <= year_max))
+
+        dirigeant = []
+        age_dir_min = filtres.get('age_dirigeant_min', 0) or 0
+        age_dir_max = filtres.get('age_dirigeant_max', 0) or 0
+        if age_dir_min > 0 or age_dir_max > 0:
+            # Age inconnu → exclure si filtre actif
+            dirigeant.append(('age_dirigeant_inconnu', lambda c: age_dirigeant(c) is not None))
+            if age_dir_min > 0:
+                dirigeant.append(('age_dirigeant_min', lambda c: age_dirigeant(c) >= age_dir_min))
+            if age_dir_max > 0:
+                dirigeant.append(('age_dirigeant_max', lambda c: age_dirigeant(c) <= age_dir_max))
+
+        self.cheap = cheap
+        self.dirigeant = dirigeant
+        self.rejected = {name: 0 for name, _ in cheap + dirigeant}
+        self.checked = 0
+
+    @property
+    def needs_dirigeant(self) -> bool:
+        """True si un prédicat lit le dirigeant (holdings à résoudre avant)."""
+        return bool(self.dirigeant)
+
+    def _run(self, predicates: List[tuple], companies: List[Dict]) -> List[Dict]:
+        rejected = {}
+        for name, predicate in predicates:
+            kept = [c for c in companies if predicate(c)]
+            if len(kept) < len(companies):
+                rejected[name] = len(companies) - len(kept)
+            companies = kept
+            if not companies:
+                break
+        if rejected:
+            with self._lock:
+                for name, n in rejected.items():
+                    self.rejected[name] += n
+        return companies
+
+    def filter_cheap(self, companies: List[Dict]) -> List[Dict]:
+        """Étage sans requête HTTP."""
+        with self._lock:
+            self.checked += len(companies)
+        return self._run(self.cheap, companies)
+
+    def filter_dirigeant(self, companies: List[Dict]) -> List[Dict]:
+        """Étage dirigeant (holdings déjà résolues par _prefetch_pm)."""
+        return self._run(self.dirigeant, companies)
+
+    def count_rejected(self, name: str, n: int = 1):
+        with self._lock:
+            self.rejected[name] = self.rejected.get(name, 0) + n
+
+    def summary(self) -> str:
+        """'doublon=3, departement_siege=120 (48%), ...' (part des entreprises examinées)."""
+        parts = []
+        for name, n in self.rejected.items():
+            share = f" ({n / self.checked:.0%})" if self.checked else ""
+            parts.append(f"{name}={n}{share}")
+        return ', '.join(parts)
+
+
+def _creation_year(company: Dict) -> int:
+    """Année de création (0 si absente ou illisible)."""
+    try:
+        return int((company.get('date_creation') or '')[:4])
+    except ValueError:
+        return 0
 
 
 class DataGouvScraper:
     """Scraper pour l'API de l'annuaire des entreprises"""
 
     BASE_URL = "https://recherche-entreprises.api.gouv.fr/search"
+    SOURCE = 'datagouv'  # source des événements request_log
     MAX_PAGES = 400  # API max = 10000/25 = 400 pages
+    # Ordre de découpage quand une requête dépasse 10 000 résultats
+    SHARD_DIMENSIONS = ('tranche', 'departement', 'naf')
 
     # Timeout plus long pour Streamlit Cloud (serveurs US → API FR)
     REQUEST_TIMEOUT = 30
 
-    def __init__(self):
+    def __init__(self, pm_cache: Optional[PMLookupCache] = None,
+                 http_cache: Optional[ResponseCache] = None,
+                 base_url: Optional[str] = None):
+        # Endpoint interrogé (config.ENDPOINTS, ex: mock_server.py) ; débit et
+        # disjoncteur restent ceux du host de production (BASE_URL)
+        self.base_url = base_url or config.ENDPOINTS['datagouv']
         self.session = requests.Session()
         # Headers réalistes pour éviter le blocage Cloudflare (Streamlit Cloud = AWS US)
         self.session.headers.update({
@@ -114,31 +466,150 @@ class DataGouvScraper:
             'Connection': 'keep-alive',
             'Cache-Control': 'no-cache',
         })
-        # Retry automatique sur erreurs réseau / 5xx
+        # Retry automatique sur erreurs de connexion uniquement : 429 / 5xx /
+        # HTML Cloudflare remontent au contrôleur du host (self.throttle)
         retry = Retry(
             total=3,
             backoff_factor=2,
-            status_forcelist=[500, 502, 503, 504],
+            status_forcelist=[],
             allowed_methods=["GET"],
+            # Sinon urllib3 rejoue seul les 429/503 avec Retry-After, invisibles du throttle
+            respect_retry_after_header=False,
         )
         self.session.mount("https://", HTTPAdapter(max_retries=retry))
+        self.session.mount("http://", HTTPAdapter(max_retries=retry))
+        # Débit, pause commune et disjoncteur du host, partagés avec l'enrichisseur
+        self.throttle = get_host_throttle(self.BASE_URL)
+        # Dirigeant résolu par SIREN (voir _resolve_dirigeant)
+        self._dirigeants: Dict[str, Dict] = {}
+        self._pm_unresolved: Set[str] = set()  # holdings dont le lookup a échoué
+        # Holdings → dirigeant PP, partagé entre scrapers et entre runs
+        self.pm_cache = pm_cache or get_shared_pm_cache()
+        # Réponses /search sur disque (pages + deep lookups)
+        self.http_cache = http_cache or get_shared_response_cache()
         self.diagnostics = []  # Log visible pour debug Streamlit Cloud
+        # Événements structurés (requêtes, pages) : latences, attente, acceptation
+        self.request_log = RequestLog()
+        # Bilan de la dernière recherche (trouvés, pages lues, projection, budget)
+        self.search_summary: Dict = {}
 
     def _log(self, msg: str):
         """Log message both to stdout and to diagnostics buffer."""
         print(msg)
         self.diagnostics.append(msg)
 
-    def search_companies(self, filtres: Dict) -> List[Dict]:
+    @property
+    def limiter(self):
+        """Token bucket du host (débit adaptatif géré par self.throttle)."""
+        return self.throttle.bucket
+
+    def search_companies(self, filtres: Dict,
+                         checkpoint: Optional[ScrapeCheckpoint] = None) -> List[Dict]:
+        """
+        Recherche les entreprises selon les filtres (liste complète).
+        Simple enveloppe de iter_companies, voir sa doc pour stratégie et options.
+        """
+        return list(self.iter_companies(filtres, checkpoint=checkpoint))
+
+    def iter_companies(self, filtres: Dict,
+                       checkpoint: Optional[ScrapeCheckpoint] = None) -> Iterator[Dict]:
         """
-        Recherche les entreprises selon les filtres.
+        Générateur : produit les entreprises retenues au fil des pages, sans
+        attendre la dernière page. Les étapes suivantes (to_records,
+        enrichissement, scoring) peuvent démarrer dès la page 1.
+
+        Avec un checkpoint (voir checkpoint.py), le curseur de page, la dédup
+        et les lignes retenues sont enregistrés page par page ; un checkpoint
+        existant reprend après la dernière page terminée, sans refetch.
 
         Stratégie:
-        1. Appel API avec filtres supportés (effectif, NAF, nature juridique)
+        1. Appel API avec filtres supportés (effectif, NAF, nature juridique,
+           départements de la région)
         2. Post-filtrage par siège.region (l'API filtre par tout établissement)
         3. Post-filtrage par âge + CA (finances API)
         4. Déduplication par SIREN
         5. Continue à paginer jusqu'à avoir assez de résultats qualifiés
+
+        Options de cadence (filtres, défauts dans config.SCRAPING_CONFIG):
+        - fetch_window: nombre de pages téléchargées en parallèle
+        - requests_per_second: débit max du token bucket
+        - shard: 'auto' (défaut), 'tranche', 'departement', 'naf', liste ou False.
+          Au-delà de 10 000 résultats, découpe la requête en sous-requêtes
+          exécutées en parallèle (shard_workers) avec dédup SIREN globale.
+        - region_pushdown: True (défaut) = la région est envoyée à l'API
+          comme une sous-requête par département du siège.
+
+        Budgets d'arrêt anticipé (0 = illimité) :
+        - max_pages: nombre max de pages API lues
+        - time_budget_s: durée max de la collecte (secondes)
+        Le taux d'acceptation courant sert à projeter le nombre de pages encore
+        nécessaires pour atteindre `limit` (self.search_summary, diagnostics).
+        """
+        params, post, state, pushdown = self._prepare_search(filtres)
+        limit = state['limit']
+
+        # Pagination et collecte (pages en vol rythmées par le token bucket)
+        window = int(filtres.get('fetch_window')
+                     or config.SCRAPING_CONFIG.get('fetch_window', 1) or 1)
+        # Débit propre à cette recherche : le contrôleur du host est partagé
+        # par le process, le débit précédent est restauré en fin de recherche
+        rate = filtres.get('requests_per_second')
+        previous_rate = self.throttle.set_rate(float(rate)) if rate else None
+        self._log(f"  Fenêtre: {window} page(s) en vol, débit max: {self.limiter.rate:g} req/s")
+
+        batches = None
+        try:
+            if checkpoint is not None and checkpoint.plan is not None:
+                # Reprise : plan figé, lignes déjà retenues rejouées sans refetch
+                shards = [(sub, None) for sub in checkpoint.plan]
+                restored = list(checkpoint.rows())
+                for company in restored:
+                    state['seen_sirens'].add(company['siren'])
+                state['accepted'] = state['restored'] = len(restored)
+                if state['accepted'] >= limit:
+                    state['stop'].set()
+                self._log(f"  Reprise du run {checkpoint.run_id}: {len(restored)} entreprises déjà retenues, "
+                          f"{len(checkpoint.state['done'])}/{len(shards)} sous-requête(s) terminée(s)")
+                yield from restored[:limit]
+            else:
+                if checkpoint is not None:
+                    checkpoint.start(filtres, None)  # reprenable même si le plan échoue
+                shards = self._plan_queries(params, filtres, pushdown, post.target_depts, window)
+                if checkpoint is not None:
+                    checkpoint.start(filtres, [sub for sub, _ in shards])
+
+            if not state['stop'].is_set():
+                batches = self._iter_plan(shards, params, post, state, window, filtres, checkpoint)
+                for batch in batches:
+                    yield from batch
+        finally:
+            # Fin normale ou consommateur arrêté : on coupe les pages / shards en vol
+            state['stop'].set()
+            if batches is not None:
+                batches.close()
+            if previous_rate is not None:
+                self.throttle.set_rate(previous_rate)
+            self.pm_cache.save()
+            self._log_summary(params, post, state)
+
+    def _log_summary(self, params: Dict, post: PostFilter, state: Dict):
+        """Bilan de fin de recherche (diagnostics)."""
+        self._log(f"  Params API: {params}")
+        if post.checked:
+            self._log(f"  Rejets post-filtres ({post.checked} examinées): {post.summary()}")
+        cache_stats = self.http_cache.stats()
+        self._log(f"  Cache HTTP: {cache_stats['hits']} hits / {cache_stats['misses']} misses")
+        if state['received']:
+            self._log(f"  Taux d'acceptation: {state['accepted']}/{state['received']} "
+                      f"({state['accepted'] / state['received']:.0%})")
+        self._log(f"  Total retenu: {state['accepted']} entreprises uniques")
+        state['rejections'] = dict(post.rejected)
+        self._report_progress(state)
+
+    def _prepare_search(self, filtres: Dict) -> tuple:
+        """
+        Traduit les filtres en (params API, PostFilter, état partagé, pushdown).
+        Commun aux backends synchrone et asynchrone (scraper_async.py).
         """
         limit = filtres.get('limit', 100) or 100
         region_code = filtres.get('region')
@@ -149,6 +620,10 @@ class DataGouvScraper:
         ca_max = float(filtres.get('ca_max', 0) or 0)
 
         self.diagnostics = []
+        self.request_log.reset()
+        self.search_summary = {}
+        self._dirigeants = {}
+        self._pm_unresolved = set()
         self._log(f"\n[Scraper] Recherche data.gouv.fr...")
         self._log(f"  Limite cible: {limit}")
         if ca_min > 0 or ca_max > 0:
@@ -180,6 +655,10 @@ class DataGouvScraper:
                 section = NAF_TO_SECTION[secteur]
                 params['section_activite_principale'] = section
                 self._log(f"  Section NAF: {secteur} → section {section}")
+            elif secteur in NAF_SECTIONS:
+                # Section lettre (ex: run_all.py --batch, divisions voisines regroupées)
+                params['section_activite_principale'] = secteur
+                self._log(f"  Section NAF: {secteur}")
             else:
                 self._log(f"  NAF {secteur}: non mappable, ignoré")
 
@@ -195,193 +674,680 @@ class DataGouvScraper:
         if ca_max > 0:
             params['ca_max'] = int(ca_max)
 
-        # Pagination et collecte
-        all_companies = []
-        seen_sirens = set()
-        page = 1
-        max_retries_per_page = 3  # Retry si Cloudflare bloque (réponse HTML)
-
-        while page <= self.MAX_PAGES:
-            params['page'] = page
-
-            # Throttle: 2s entre chaque requête pour éviter le 429
-            if page > 1:
-                time.sleep(2)
-
-            # Retry par page (Cloudflare peut bloquer puis laisser passer)
-            response = None
-            data = None
-            for attempt in range(1, max_retries_per_page + 1):
-                try:
-                    response = self.session.get(
-                        self.BASE_URL,
-                        params=params,
-                        timeout=self.REQUEST_TIMEOUT,
-                    )
-                    self._log(f"  Page {page} (tentative {attempt}): HTTP {response.status_code}, "
-                              f"Content-Type: {response.headers.get('content-type', '?')}")
-
-                    # 429 = rate limit → attendre et réessayer
-                    if response.status_code == 429:
-                        if attempt < max_retries_per_page:
-                            wait = attempt * 5  # 5s, 10s
-                            self._log(f"  Rate limit 429, attente {wait}s...")
-                            time.sleep(wait)
-                            continue
-                        self._log("  Rate limit 429 persistant, arrêt pagination")
-                        break
-
-                    response.raise_for_status()
-
-                    # Vérifier que la réponse est bien du JSON
-                    ct = response.headers.get('content-type', '')
-                    if 'application/json' not in ct:
-                        body_preview = response.text[:300].replace('\n', ' ')
-                        self._log(f"  Pas de JSON (blocage probable). Réponse: {body_preview[:150]}")
-                        if attempt < max_retries_per_page:
-                            wait = attempt * 3  # 3s, 6s
-                            self._log(f"  Retry dans {wait}s...")
-                            time.sleep(wait)
-                            continue
-                        msg = (f"L'API ne retourne pas du JSON après {max_retries_per_page} tentatives "
-                               f"(Content-Type: {ct}). Blocage Cloudflare probable.")
-                        self._log(f"  {msg}")
-                        if page == 1:
-                            raise RuntimeError(msg)
-                        break
+        # Projection : blocs de la réponse lus par to_dataframe, les post-filtres
+        # et l'enrichissement (enregistrements réutilisés par CompanyEnricher)
+        if config.SCRAPING_CONFIG.get('field_projection', True):
+            params.update(datagouv_projection_params(RECORD_COLUMNS + ENRICHED_COLUMNS))
+            self._log(f"  Projection: include={params['include']}")
+
+        # État partagé entre sous-requêtes (dédup SIREN globale + coupure à limit)
+        state = {
+            'seen_sirens': set(),
+            'received': 0,
+            'accepted': 0,
+            'limit': limit,
+            'lock': threading.Lock(),
+            'stop': threading.Event(),
+            # Arrêt anticipé : pages lues, budgets, projection
+            'per_page': params['per_page'],
+            'pages': 0,
+            'restored': 0,
+            'available_pages': None,
+            'started': time.monotonic(),
+            'max_pages': int(self._budget(filtres, 'max_pages')),
+            'time_budget': float(self._budget(filtres, 'time_budget_s')),
+            'projection_every': int(config.SCRAPING_CONFIG.get('projection_every', 10) or 0),
+            'budget_hit': None,
+        }
+        if state['max_pages'] or state['time_budget']:
+            self._log(f"  Budget: {state['max_pages'] or '∞'} pages, "
+                      f"{state['time_budget'] or '∞'} s")
+
+        # Post-filtres compilés une fois (dédup, siège, NAF, âges)
+        post = PostFilter(filtres, target_depts, state['seen_sirens'], self._extract_age_dirigeant)
+        names = [name for name, _ in post.cheap + post.dirigeant]
+        self._log(f"  Post-filtres: {' → '.join(names)}")
+
+        # Région → contrainte département poussée à l'API, une sous-requête par
+        # département. Le post-filtre siège reste comme garde-fou : l'API filtre
+        # sur TOUT établissement, pas seulement le siège.
+        pushdown = bool(target_depts) and filtres.get('region_pushdown', True)
+        if pushdown:
+            params['departement'] = ','.join(target_depts)
+        return params, post, state, pushdown
+
+    def _plan_queries(self, params: Dict, filtres: Dict, pushdown: bool,
+                      target_depts: List[str], window: int) -> List[tuple]:
+        """
+        Plan d'exécution : liste de (params, page 1 ou None). Une seule entrée
+        pour une requête simple ; une par shard (pushdown région, sharding).
+        """
+        cap = self.MAX_PAGES * params['per_page']
+        shard_mode = filtres.get('shard', 'auto')
+        secteur = filtres.get('secteur_naf')
 
-                    try:
-                        data = response.json()
-                    except ValueError:
-                        body_preview = response.text[:300].replace('\n', ' ')
-                        self._log(f"  JSON invalide. Réponse: {body_preview[:150]}")
-                        if attempt < max_retries_per_page:
-                            wait = attempt * 3
-                            self._log(f"  Retry dans {wait}s...")
-                            time.sleep(wait)
-                            continue
-                        msg = f"JSON invalide après {max_retries_per_page} tentatives."
-                        self._log(f"  {msg}")
-                        if page == 1:
-                            raise RuntimeError(msg)
-                        break
+        if pushdown:
+            self._log(f"  Pushdown région: {len(target_depts)} sous-requête(s) par département")
+            extra = self._shard_dimensions(shard_mode, True)
+            shard_dims = ['departement'] + [d for d in extra if d != 'departement']
+            shards = self._plan_shards(params, shard_dims, cap, secteur, window)
+            if shards:
+                self._log(f"  Sharding {shard_dims}: {len(shards)} sous-requêtes")
+            return shards or [(params, None)]
+
+        first = self._fetch_page(params, 1)
+        total = first.get('total_results', 0) or 0
+        self._log(f"  API: {total} résultats totaux")
+
+        shard_dims = self._shard_dimensions(shard_mode, total > cap)
+        if shard_dims:
+            shards = self._plan_shards(params, shard_dims, cap, secteur, window)
+            if shards:
+                self._log(f"  Sharding {shard_dims}: {len(shards)} sous-requêtes")
+                return shards
+            self._log(f"  Sharding {shard_dims}: pas de découpage utile, requête unique")
+        elif total > cap:
+            self._log(f"  ATTENTION: {total} résultats > plafond API {cap}, "
+                      f"candidats tronqués (activer filtres['shard'])")
+        return [(params, first)]
+
+    def _iter_collect(self, params: Dict, post: PostFilter, state: Dict, window: int,
+                      first: Optional[Dict] = None, label: str = '',
+                      stats: Optional[Dict] = None, checkpoint=None,
+                      index: int = 0) -> Iterator[List[Dict]]:
+        """
+        Pagine une requête, post-filtre chaque page et produit la liste des
+        entreprises retenues page par page. `stats` (optionnel) reçoit
+        total_results, pages lues et retenus pour les diagnostics.
+        Avec un checkpoint, reprend après la dernière page terminée de la
+        sous-requête `index` et enregistre chaque page traitée.
+        """
+        prefix = f"  [{label}]" if label else " "
+        stats = stats if stats is not None else {}
+        stats.setdefault('total', 0)
+        stats.setdefault('pages', 0)
+        stats.setdefault('accepted', 0)
+
+        start_page = 1
+        if checkpoint is not None:
+            if checkpoint.is_done(index):
+                return
+            start_page = checkpoint.next_page(index)
+        pages = self._iter_pages(params, window, first=first if start_page == 1 else None,
+                                 start_page=start_page)
+
+        exhausted = True
+        try:
+            for page, data in pages:
+                if state['stop'].is_set() or data is None:
+                    # Limite atteinte ou page en échec : sous-requête à reprendre
+                    exhausted = False
+                    break
+                results = data.get('results', [])
+                stats['total'] = data.get('total_results', 0) or stats['total']
 
-                    # JSON OK → sortir de la boucle retry
+                if not results:
+                    self._log(f"{prefix} Page {page}: aucun résultat, arrêt")
                     break
 
-                except (requests.exceptions.ConnectionError,
-                        requests.exceptions.Timeout) as e:
-                    self._log(f"  Erreur réseau tentative {attempt}: {type(e).__name__}")
-                    if attempt < max_retries_per_page:
-                        wait = attempt * 3
-                        self._log(f"  Retry dans {wait}s...")
-                        time.sleep(wait)
-                        continue
-                    if page == 1:
-                        raise RuntimeError(
-                            f"Impossible de joindre l'API data.gouv.fr après {max_retries_per_page} tentatives "
-                            f"({type(e).__name__}). Réessayez dans quelques minutes."
-                        ) from e
+                added = self._accept_page(results, post, state, window)
+                stats['pages'] += 1
+                stats['accepted'] += len(added)
+                with state['lock']:
+                    state['received'] += len(results)
+                self.request_log.page(self.SOURCE, page, len(results), len(added), label)
+                if checkpoint is not None:
+                    checkpoint.record_page(index, page, added)
+                self._log(f"{prefix} Page {page}: {len(results)} résultats API → +{len(added)} retenus "
+                          f"({len(added) / len(results):.0%} acceptés, total: {state['accepted']})")
+                self._count_page(state)
+                if added:
+                    yield added
+
+                # Assez de résultats ?
+                if state['stop'].is_set():
+                    exhausted = False
                     break
-                except RuntimeError:
-                    raise
-                except Exception as e:
-                    msg = f"Erreur page {page}: {type(e).__name__}: {e}"
-                    self._log(f"  {msg}")
-                    if page == 1:
-                        raise
+        finally:
+            # Annule les pages encore en vol si on s'arrête avant la fin
+            pages.close()
+
+        if exhausted and checkpoint is not None:
+            checkpoint.mark_done(index)
+
+    # ──────────────────────────────────────────
+    # Arrêt anticipé (budgets) et projection des pages restantes
+    # ──────────────────────────────────────────
+
+    @staticmethod
+    def _budget(filtres: Dict, key: str) -> float:
+        value = filtres.get(key)
+        if value is None:
+            value = config.SCRAPING_CONFIG.get(key, 0)
+        return value or 0
+
+    def _count_page(self, state: Dict):
+        """Compte une page lue, logue la projection périodique et applique les budgets."""
+        with state['lock']:
+            state['pages'] += 1
+            pages = state['pages']
+        if state['stop'].is_set():
+            return
+
+        every = state['projection_every']
+        if every and pages % every == 0:
+            remaining = self._estimate_remaining_pages(state)
+            self._log(f"  Projection après {pages} pages: {state['accepted']}/{state['limit']}, "
+                      f"{'inconnue' if remaining is None else f'~{remaining} pages restantes'}")
+
+        reason = None
+        if state['max_pages'] and pages >= state['max_pages']:
+            reason = f"budget de {state['max_pages']} pages atteint"
+        elif state['time_budget'] and time.monotonic() - state['started'] >= state['time_budget']:
+            reason = f"budget de {state['time_budget']:g} s atteint"
+        if reason:
+            with state['lock']:
+                state['budget_hit'] = state['budget_hit'] or reason
+            state['stop'].set()
+
+    def _estimate_remaining_pages(self, state: Dict) -> Optional[int]:
+        """
+        Pages encore nécessaires pour atteindre la limite, au taux d'acceptation
+        observé sur ce run. None si rien n'a encore été retenu (taux inconnu).
+        """
+        missing = state['limit'] - state['accepted']
+        if missing <= 0:
+            return 0
+        accepted = state['accepted'] - state['restored']
+        if not state['received'] or accepted <= 0:
+            return None
+        per_page_accepted = accepted / state['received'] * state['per_page']
+        return int(-(-missing // per_page_accepted))
+
+    def _report_progress(self, state: Dict):
+        """Bilan final : trouvés / limite, pages lues, projection, budget éventuel."""
+        remaining = self._estimate_remaining_pages(state)
+        elapsed = time.monotonic() - state['started']
+        self.search_summary = {
+            'found': state['accepted'],
+            'limit': state['limit'],
+            'pages_read': state['pages'],
+            'acceptance_rate': ((state['accepted'] - state['restored']) / state['received']
+                                if state['received'] else None),
+            'estimated_pages_remaining': remaining,
+            'available_pages': state['available_pages'],
+            'elapsed_s': round(elapsed, 1),
+            'budget_hit': state['budget_hit'],
+            'rejections': state.get('rejections', {}),
+        }
+        if state['budget_hit']:
+            self._log(f"  Arrêt anticipé: {state['budget_hit']}")
+        if remaining == 0:
+            return
+        estimate = "estimation impossible (aucune entreprise retenue)" if remaining is None \
+            else f"environ {remaining} pages supplémentaires nécessaires"
+        if remaining and state['pages']:
+            estimate += f" (~{remaining * elapsed / state['pages']:.0f} s au rythme actuel)"
+        self._log(f"  Trouvé {state['accepted']} sur {state['limit']}, {estimate}")
+        available = state['available_pages']
+        if remaining and available is not None and remaining > available - state['pages']:
+            self._log(f"  Limite hors d'atteinte: seulement {max(0, available - state['pages'])} "
+                      f"pages restantes côté API pour ces filtres")
+
+    def _accept_page(self, results: List[Dict], post: PostFilter, state: Dict,
+                     window: int) -> List[Dict]:
+        """Post-filtre une page et retient les entreprises jusqu'à la limite globale."""
+        candidates = post.filter_cheap(results)
+
+        # Filtre âge dirigeant : résout d'abord les holdings de la page en parallèle
+        if candidates and post.needs_dirigeant:
+            self._prefetch_pm(candidates, window)
+            candidates = post.filter_dirigeant(candidates)
+
+        added = self._admit(candidates, post, state)
+
+        # Holdings des lignes retenues : résolues ici, page par page,
+        # plutôt qu'une à une dans to_dataframe
+        self._prefetch_pm(added, window)
+        return added
+
+    def _admit(self, candidates: List[Dict], post: PostFilter, state: Dict) -> List[Dict]:
+        """Dédup SIREN (entre shards) et coupure à limit, sous verrou."""
+        # CA est filtré server-side via params ca_min/ca_max
+        added = []
+        for company in candidates:
+            with state['lock']:
+                if state['accepted'] >= state['limit']:
                     break
+                if company['siren'] in state['seen_sirens']:
+                    post.count_rejected('doublon')
+                    continue
+                state['seen_sirens'].add(company['siren'])
+                state['accepted'] += 1
+            added.append(company)
 
-            # Si pas de data JSON valide après retries, arrêter
-            if data is None:
-                if page == 1 and not all_companies:
-                    raise RuntimeError(
-                        "Aucune réponse JSON valide de l'API. "
-                        "L'API est peut-être temporairement inaccessible depuis ce serveur."
-                    )
-                break
+        if state['accepted'] >= state['limit']:
+            state['stop'].set()
+        return added
+
+    # ──────────────────────────────────────────
+    # Sharding (au-delà du plafond de 10 000 résultats)
+    # ──────────────────────────────────────────
+
+    def _shard_dimensions(self, mode, over_cap: bool) -> List[str]:
+        """
+        Dimensions de découpage selon filtres['shard'] :
+        'auto' (défaut) = seulement si la requête dépasse le plafond,
+        'tranche' / 'departement' / 'naf' ou une liste = forcé, False = jamais.
+        """
+        if not mode:
+            return []
+        if mode == 'auto':
+            return list(self.SHARD_DIMENSIONS) if over_cap else []
+        dims = [mode] if isinstance(mode, str) else list(mode)
+        unknown = [d for d in dims if d not in self.SHARD_DIMENSIONS]
+        if unknown:
+            self._log(f"  Sharding: dimension(s) inconnue(s) {unknown}, ignorée(s)")
+        dims = [d for d in dims if d in self.SHARD_DIMENSIONS]
+        # Dimensions restantes en renfort si un shard dépasse encore le plafond
+        return dims + [d for d in self.SHARD_DIMENSIONS if d not in dims] if dims else []
+
+    def _split_params(self, params: Dict, dim: str, secteur: Optional[str]) -> List[Dict]:
+        """Découpe une requête selon une dimension (partition des résultats)."""
+        if dim == 'tranche':
+            key = 'tranche_effectif_salarie'
+            values = params[key].split(',') if params.get(key) else list(TRANCHES_EFFECTIF)
+        elif dim == 'departement':
+            key = 'departement'
+            values = params[key].split(',') if params.get(key) else ALL_DEPARTEMENTS
+        elif dim == 'naf':
+            if params.get('activite_principale'):
+                key = 'activite_principale'
+                values = params[key].split(',')
+            elif params.get('section_activite_principale'):
+                # Section → codes NAF complets (restreints au préfixe 2 chiffres demandé)
+                key = 'activite_principale'
+                section = params['section_activite_principale']
+                if secteur in NAF_SECTIONS:
+                    secteur = None
+                values = [code for code in NAF_LABELS
+                          if (secteur and code.startswith(secteur + '.'))
+                          or (not secteur and NAF_DIVISION_TO_SECTION.get(code[:2]) == section)]
+            else:
+                key = 'section_activite_principale'
+                values = sorted(set(NAF_DIVISION_TO_SECTION.values()))
+        else:
+            return [params]
+
+        if len(values) <= 1:
+            return [params]
+        subs = []
+        for value in values:
+            sub = dict(params, **{key: value})
+            if key == 'activite_principale':
+                sub.pop('section_activite_principale', None)
+            subs.append(sub)
+        return subs
+
+    def _plan_shards(self, params: Dict, dims: List[str], cap: int,
+                     secteur: Optional[str], window: int) -> List[tuple]:
+        """
+        Découpe récursivement la requête jusqu'à ce que chaque sous-requête
+        tienne sous le plafond. Retourne [(params, page 1)] ; la page 1 sert de
+        sonde (total_results) et est réutilisée pour la collecte. Une sonde en
+        échec garde sa sous-requête avec page 1 None (retentée à la collecte) ;
+        l'erreur n'est levée que si toutes les sondes échouent.
+        """
+        if not dims:
+            return []
+        dim, rest = dims[0], dims[1:]
+        subs = self._split_params(params, dim, secteur)
+        if len(subs) == 1:
+            return self._plan_shards(params, rest, cap, secteur, window) if rest else []
+
+        def probe(sub: Dict) -> tuple:
+            try:
+                return self._fetch_page(sub, 1), None
+            except Exception as e:
+                return None, e
+
+        with ThreadPoolExecutor(max_workers=max(1, window)) as executor:
+            probes = list(executor.map(probe, subs))
+        errors = [error for _, error in probes if error is not None]
+        if errors and len(errors) == len(subs):
+            raise errors[0]
+
+        shards = []
+        for sub, (first, error) in zip(subs, probes):
+            if error is not None:
+                self._log(f"  Sonde [{self._shard_label(sub, params)}] en échec: "
+                          f"{type(error).__name__}: {error}")
+                shards.append((sub, None))
+                continue
+            total = (first or {}).get('total_results', 0) or 0
+            if not total:
+                continue
+            if total > cap and rest:
+                deeper = self._plan_shards(sub, rest, cap, secteur, window)
+                if deeper:
+                    shards.extend(deeper)
+                    continue
+            shards.append((sub, first))
+        return shards
+
+    @staticmethod
+    def _shard_label(sub: Dict, params: Dict) -> str:
+        """Libellé d'une sous-requête : clés qui la distinguent de `params`."""
+        keys = ('tranche_effectif_salarie', 'departement',
+                'section_activite_principale', 'activite_principale')
+        return ' '.join(f"{k.split('_')[0]}={sub[k]}" for k in keys
+                        if sub.get(k) != params.get(k) and sub.get(k))
+
+    def _iter_plan(self, shards: List[tuple], params: Dict, post: PostFilter, state: Dict,
+                   window: int, filtres: Dict, checkpoint=None) -> Iterator[List[Dict]]:
+        """
+        Exécute le plan. Requête simple : pages en vol selon `window`.
+        Plusieurs shards : exécutés en parallèle (débit partagé), pages retenues
+        produites dans leur ordre d'arrivée, dédupliquées via l'état global.
+        Un shard en erreur est journalisé et marqué tronqué ; les autres
+        continuent. La recherche n'échoue que si tous les shards échouent sans
+        rien retenir.
+        """
+        # Pages disponibles côté API (connues si chaque sous-requête a été sondée)
+        per_page = params['per_page']
+        totals = [first.get('total_results', 0) or 0 for _, first in shards if first is not None]
+        if len(totals) == len(shards):
+            state['available_pages'] = sum(min(self.MAX_PAGES, -(-t // per_page)) for t in totals)
+
+        if len(shards) == 1:
+            sub, first = shards[0]
+            yield from self._iter_collect(sub, post, state, window, first=first,
+                                          checkpoint=checkpoint, index=0)
+            return
+
+        cap = self.MAX_PAGES * params['per_page']
+        workers = int(filtres.get('shard_workers')
+                      or config.SCRAPING_CONFIG.get('shard_workers', 4) or 1)
+        self._log(f"  Shards: {len(shards)} sous-requêtes, {workers} en parallèle")
+
+        def label_of(sub: Dict) -> str:
+            return self._shard_label(sub, params)
+
+        stats = [{'total': (first or {}).get('total_results', 0) or 0} for _, first in shards]
+        out = queue.Queue()
+
+        def run(i: int):
+            sub, first = shards[i]
+            try:
+                if not state['stop'].is_set():
+                    # Une page à la fois par shard : le parallélisme vient des shards
+                    for batch in self._iter_collect(sub, post, state, 1, first=first,
+                                                    label=label_of(sub), stats=stats[i],
+                                                    checkpoint=checkpoint, index=i):
+                        out.put(batch)
+            except Exception as e:
+                # Shard en échec : lignes des autres shards conservées
+                stats[i]['error'] = e
+                self._log(f"  Shard [{label_of(sub)}] en échec: {type(e).__name__}: {e}")
+            finally:
+                out.put(None)  # fin de ce shard
 
-            if 'erreur' in data:
-                msg = f"Erreur API: {data['erreur'][:200]}"
-                self._log(f"  {msg}")
-                if page == 1:
-                    raise RuntimeError(msg)
+        executor = ThreadPoolExecutor(max_workers=workers)
+        try:
+            for i in range(len(shards)):
+                executor.submit(run, i)
+            running = len(shards)
+            while running:
+                item = out.get()
+                if item is None:
+                    running -= 1
+                else:
+                    yield item
+            failed = [st['error'] for st in stats if st.get('error') is not None]
+            if failed and len(failed) == len(shards) and not any(st.get('accepted') for st in stats):
+                raise failed[0]
+        finally:
+            state['stop'].set()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+            # Diagnostics : totaux par shard pour vérifier la couverture
+            shard_total = 0
+            for (sub, _), st in zip(shards, stats):
+                shard_total += st['total']
+                flag = " (TRONQUÉ: plafond API)" if st['total'] > cap else ""
+                if st.get('error') is not None:
+                    flag = f" (TRONQUÉ: {type(st['error']).__name__})"
+                self._log(f"  Shard [{label_of(sub)}]: total API {st['total']}, "
+                          f"{st.get('pages', 0)} pages lues, +{st.get('accepted', 0)} retenus{flag}")
+            self._log(f"  Couverture: Σ totaux shards = {shard_total} "
+                      f"(requête globale plafonnée à {cap})")
+
+    def _iter_pages(self, params: Dict, window: int = 1, first: Optional[Dict] = None,
+                    start_page: int = 1):
+        """
+        Génère (page, data) dans l'ordre des pages, à partir de `start_page`.
+
+        Avec window > 1, jusqu'à `window` pages sont téléchargées en parallèle,
+        rythmées par self.throttle ; le consommateur les reçoit toujours dans
+        l'ordre, donc la dédup et la coupure à `limit` restent identiques.
+        `first` : première page déjà téléchargée (sonde), réutilisée telle quelle.
+        Une page en échec est signalée par (page, None), puis la pagination s'arrête.
+        """
+        per_page = params.get('per_page', 25)
+
+        data = first if first is not None else self._fetch_page(params, start_page)
+        yield start_page, data
+        if data is None or len(data.get('results', [])) < per_page:
+            return
+
+        # total_results connu → inutile de demander des pages au-delà
+        last_page = self.MAX_PAGES
+        total = data.get('total_results') or 0
+        if total:
+            last_page = min(last_page, -(-total // per_page))
+
+        executor = ThreadPoolExecutor(max_workers=window) if window > 1 else None
+        pending = {}
+        next_page = start_page + 1
+        try:
+            for page in range(start_page + 1, last_page + 1):
+                if executor:
+                    while next_page <= last_page and len(pending) < window:
+                        pending[next_page] = executor.submit(self._fetch_page, params, next_page)
+                        next_page += 1
+                    data = pending.pop(page).result()
+                else:
+                    data = self._fetch_page(params, page)
+
+                yield page, data
+                if data is None:
+                    return
+
+                # Plus de pages ?
+                if len(data.get('results', [])) < per_page:
+                    return
+        finally:
+            if executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    # Retry si Cloudflare bloque (réponse HTML)
+    MAX_RETRIES_PER_PAGE = 3
+
+    def _fetch_page(self, params: Dict, page: int) -> Optional[Dict]:
+        """
+        Télécharge une page avec retry (Cloudflare peut bloquer puis laisser passer).
+        Retourne le JSON, ou None pour arrêter la pagination.
+        Lève RuntimeError si la page 1 échoue.
+        """
+        page_params = dict(params, page=page)
+        cached = self.http_cache.get(self.base_url, page_params)
+        if cached is not None:
+            self._log(f"  Page {page}: cache HTTP")
+            self.request_log.cached(self.SOURCE, page)
+            return cached
+
+        data = None
+        slept = 0.0
+        for attempt in range(1, self.MAX_RETRIES_PER_PAGE + 1):
+            # Throttle: pause commune du host + token bucket (remplace les sleeps fixes) ;
+            # le slot libère la requête de test du disjoncteur quelle que soit l'issue
+            try:
+                with self.throttle.slot() as waited:
+                    slept += waited
+                    data, wait = self._request_page(page_params, page, attempt, slept)
+            except CircuitOpenError as e:
+                return self._circuit_open(e, page)
+
+            if data is not None or wait is None:
                 break
+            time.sleep(wait)
+            slept = wait
 
-            results = data.get('results', [])
-            total = data.get('total_results', 0)
+        return self._finish_page(data, page, page_params)
 
+    def _request_page(self, page_params: Dict, page: int, attempt: int, slept: float) -> tuple:
+        """
+        Une tentative HTTP de _fetch_page → (data, attente) comme
+        _read_page_response ; (None, None) si la page est abandonnée.
+        """
+        started = time.monotonic()
+        response = None
+        try:
+            response = self.session.get(
+                self.base_url,
+                params=page_params,
+                timeout=self.REQUEST_TIMEOUT,
+            )
+            self._record_request(page, attempt, response, started, slept)
+            return self._read_page_response(response, page, attempt)
+        except (requests.exceptions.ConnectionError,
+                requests.exceptions.Timeout) as e:
+            self._record_request(page, attempt, None, started, slept, error=type(e).__name__)
+            return None, self._network_error_wait(e, page, attempt)
+        except RuntimeError:
+            raise
+        except Exception as e:
+            if response is None:
+                self._record_request(page, attempt, None, started, slept,
+                                     error=type(e).__name__)
+            msg = f"Erreur page {page}: {type(e).__name__}: {e}"
+            self._log(f"  {msg}")
             if page == 1:
-                self._log(f"  API: {total} résultats totaux")
+                raise
+            return None, None
 
-            if not results:
-                self._log(f"  Page {page}: aucun résultat, arrêt")
-                break
+    def _record_request(self, page: Optional[int], attempt: int, response, started: float,
+                        slept: float, error: Optional[str] = None, source: Optional[str] = None):
+        """Événement request_log d'une tentative HTTP (response None si erreur réseau)."""
+        self.request_log.request(
+            source or self.SOURCE, page=page, attempt=attempt,
+            status=response.status_code if response is not None else None,
+            latency_s=time.monotonic() - started,
+            size=len(response.content) if response is not None else 0,
+            sleep_s=slept, error=error,
+        )
 
-            # Post-filtrage par siège
-            added = 0
-            for company in results:
-                siren = company.get('siren')
-                if not siren or siren in seen_sirens:
-                    continue
+    def _circuit_open(self, error: CircuitOpenError, page: int) -> None:
+        """Host bloqué : la page 1 échoue (bascule Pappers), sinon fin de pagination."""
+        self._log(f"  {error}")
+        if page == 1:
+            raise error
+        return None
 
-                siege = company.get('siege', {})
-
-                # Filtre région: vérifier le département du SIÈGE
-                if target_depts:
-                    siege_dept = siege.get('departement', '')
-                    if siege_dept not in target_depts:
-                        continue
-
-                # Filtre NAF 2 chiffres: section est trop large, post-filtre
-                if secteur and not '.' in secteur:
-                    company_naf = company.get('activite_principale', '')
-                    if not company_naf.startswith(secteur + '.'):
-                        continue
-
-                # Filtre âge entreprise
-                age_min = filtres.get('age_min', 0)
-                if age_min > 0:
-                    age = self._calculate_age(company)
-                    if age < age_min:
-                        continue
-
-                # Filtre âge dirigeant
-                age_dir_min = filtres.get('age_dirigeant_min', 0)
-                age_dir_max = filtres.get('age_dirigeant_max', 0)
-                if age_dir_min > 0 or age_dir_max > 0:
-                    age_dir = self._extract_age_dirigeant(company)
-                    if age_dir is None:
-                        continue  # Age inconnu → exclure si filtre actif
-                    if age_dir_min > 0 and age_dir < age_dir_min:
-                        continue
-                    if age_dir_max > 0 and age_dir > age_dir_max:
-                        continue
-
-                # CA est filtré server-side via params ca_min/ca_max
-
-                seen_sirens.add(siren)
-                all_companies.append(company)
-                added += 1
-
-            self._log(f"  Page {page}: {len(results)} résultats API → +{added} retenus (total: {len(all_companies)})")
-
-            # Assez de résultats ?
-            if len(all_companies) >= limit:
-                break
+    def _read_page_response(self, response, page: int, attempt: int) -> tuple:
+        """
+        Interprète une réponse HTTP de /search (requests ou httpx).
+        Retourne (data, None) si JSON valide, (None, attente) pour réessayer,
+        (None, None) pour abandonner la page. Lève RuntimeError si la page 1
+        est définitivement bloquée. Les blocages (429, 5xx, HTML) sont signalés
+        à self.throttle, qui impose la pause à tous les appelants du host :
+        l'attente renvoyée est alors 0.
+        """
+        max_retries = self.MAX_RETRIES_PER_PAGE
+        self._log(f"  Page {page} (tentative {attempt}): HTTP {response.status_code}, "
+                  f"Content-Type: {response.headers.get('content-type', '?')}")
+
+        # 429 = rate limit / 5xx = surcharge → pause commune (Retry-After) et retry
+        if response.status_code == 429 or response.status_code >= 500:
+            pause = self.throttle.record_throttled(
+                parse_retry_after(response.headers.get('retry-after')),
+                reason=f"HTTP {response.status_code}")
+            if attempt < max_retries:
+                self._log(f"  HTTP {response.status_code}, pause du host {pause:.0f}s...")
+                return None, 0
+            self._log(f"  HTTP {response.status_code} persistant, arrêt pagination")
+            return None, None
 
-            # Plus de pages ?
-            if len(results) < 25:
-                break
+        response.raise_for_status()
+
+        # Vérifier que la réponse est bien du JSON
+        ct = response.headers.get('content-type', '')
+        if 'application/json' not in ct:
+            body_preview = response.text[:300].replace('\n', ' ')
+            self._log(f"  Pas de JSON (blocage probable). Réponse: {body_preview[:150]}")
+            pause = self.throttle.record_throttled(reason='HTML au lieu de JSON')
+            if attempt < max_retries:
+                self._log(f"  Retry après pause du host ({pause:.0f}s)...")
+                return None, 0
+            msg = (f"L'API ne retourne pas du JSON après {max_retries} tentatives "
+                   f"(Content-Type: {ct}). Blocage Cloudflare probable.")
+            self._log(f"  {msg}")
+            if page == 1:
+                raise RuntimeError(msg)
+            return None, None
+
+        try:
+            data = response.json()
+            self.throttle.record_success()
+            return data, None
+        except ValueError:
+            body_preview = response.text[:300].replace('\n', ' ')
+            self._log(f"  JSON invalide. Réponse: {body_preview[:150]}")
+            pause = self.throttle.record_throttled(reason='JSON invalide')
+            if attempt < max_retries:
+                self._log(f"  Retry après pause du host ({pause:.0f}s)...")
+                return None, 0
+            msg = f"JSON invalide après {max_retries} tentatives."
+            self._log(f"  {msg}")
+            if page == 1:
+                raise RuntimeError(msg)
+            return None, None
 
-            page += 1
-            time.sleep(0.3)
+    def _network_error_wait(self, error: Exception, page: int, attempt: int) -> Optional[int]:
+        """Erreur réseau : attente avant retry, None pour abandonner (RuntimeError en page 1)."""
+        max_retries = self.MAX_RETRIES_PER_PAGE
+        self._log(f"  Erreur réseau tentative {attempt}: {type(error).__name__}")
+        pause = self.throttle.record_error(type(error).__name__)
+        if attempt < max_retries:
+            self._log(f"  Retry après pause du host ({pause:.0f}s)...")
+            return 0
+        if page == 1:
+            raise RuntimeError(
+                f"Impossible de joindre l'API data.gouv.fr après {max_retries} tentatives "
+                f"({type(error).__name__}). Réessayez dans quelques minutes."
+            ) from error
+        return None
 
-        all_companies = all_companies[:limit]
-        self._log(f"  Params API: {params}")
-        self._log(f"  Total retenu: {len(all_companies)} entreprises uniques")
+    def _finish_page(self, data: Optional[Dict], page: int, page_params: Dict) -> Optional[Dict]:
+        """Valide le JSON final d'une page et le met en cache."""
+        # Si pas de data JSON valide après retries, arrêter
+        if data is None:
+            if page == 1:
+                raise RuntimeError(
+                    "Aucune réponse JSON valide de l'API. "
+                    "L'API est peut-être temporairement inaccessible depuis ce serveur."
+                )
+            return None
+
+        if 'erreur' in data:
+            msg = f"Erreur API: {data['erreur'][:200]}"
+            self._log(f"  {msg}")
+            if page == 1:
+                raise RuntimeError(msg)
+            return None
 
-        return all_companies
+        self.http_cache.put(self.base_url, page_params, data)
+        return data
 
     def _calculate_age(self, company: Dict) -> int:
         """Calcule l'âge de l'entreprise en années"""
@@ -394,58 +1360,85 @@ class DataGouvScraper:
         except Exception:
             return 0
 
-    def to_dataframe(self, companies: List[Dict]) -> pd.DataFrame:
-        """Convertit les résultats en DataFrame"""
-        data = []
+    def to_dataframe(self, companies: Iterable[Dict]) -> pd.DataFrame:
+        """Convertit les résultats en DataFrame (construction par colonnes, voir build_dataframe)"""
+        return build_dataframe(RECORD_COLUMNS, self._iter_values(companies))
+
+    def to_records(self, companies: Iterable[Dict]) -> Iterator[Dict]:
+        """
+        Version streaming de to_dataframe : produit une ligne normalisée par
+        entreprise au fil de l'eau (ex: to_records(iter_companies(filtres))).
+        """
+        for values in self._iter_values(companies):
+            yield dict(zip(RECORD_COLUMNS, values))
+
+    def _iter_values(self, companies: Iterable[Dict]) -> Iterator[tuple]:
+        """Tuples de valeurs (ordre RECORD_COLUMNS), entreprises illisibles ignorées."""
+        if isinstance(companies, (list, tuple)):
+            # Liste complète : holdings pas encore résolues traitées en lot
+            self._prefetch_pm(companies, int(config.SCRAPING_CONFIG.get('fetch_window', 1) or 1))
 
         for company in companies:
             try:
-                siege = company.get('siege', {})
-                tranche_code = company.get('tranche_effectif_salarie', '')
-
-                # Finances (API fournit ca + resultat_net par année)
-                ca_euros, resultat_euros = self._extract_finances(company)
-
-                row = {
-                    'nom_entreprise': company.get('nom_complet', ''),
-                    'siren': company.get('siren', ''),
-                    'siret_siege': siege.get('siret', ''),
-                    'forme_juridique': company.get('nature_juridique', ''),
-                    'code_naf': company.get('activite_principale', ''),
-                    'libelle_naf': NAF_LABELS.get(company.get('activite_principale', ''), ''),
-                    'date_creation': company.get('date_creation', ''),
-                    'tranche_effectif': TRANCHES_EFFECTIF.get(tranche_code, tranche_code),
-                    'categorie': company.get('categorie_entreprise', ''),
-
-                    # Finances (directement depuis l'API)
-                    'ca_euros': ca_euros,
-                    'resultat_euros': resultat_euros,
-
-                    # Adresse siège
-                    'adresse': siege.get('adresse', ''),
-                    'code_postal': siege.get('code_postal', ''),
-                    'ville': siege.get('libelle_commune', ''),
-                    'departement': siege.get('departement', ''),
-                    'region': config.REGIONS.get(siege.get('region', ''), siege.get('region', '')),
-                    'adresse_complete': self._build_complete_address(siege),
-
-                    # Dirigeant + âge (directement depuis l'API)
-                    'dirigeant_principal': self._extract_dirigeant(company),
-                    'dirigeant_nom': self._extract_dirigeant_nom(company),
-                    'dirigeant_prenom': self._extract_dirigeant_prenom(company),
-                    'age_dirigeant': self._extract_age_dirigeant(company),
-
-                    # Liens
-                    'url_pappers': f"https://www.pappers.fr/entreprise/{company.get('siren', '')}",
-                    'url_datagouv': f"https://annuaire-entreprises.data.gouv.fr/entreprise/{company.get('siren', '')}",
-                }
-
-                data.append(row)
+                yield self._record_values(company)
             except Exception as e:
                 print(f"  Erreur parsing: {e}")
-                continue
+        self.pm_cache.save()
+
+    def _to_record(self, company: Dict) -> Optional[Dict]:
+        """Ligne normalisée (schéma commun aux scrapers) pour une entreprise."""
+        try:
+            return dict(zip(RECORD_COLUMNS, self._record_values(company)))
+        except Exception as e:
+            print(f"  Erreur parsing: {e}")
+            return None
 
-        return pd.DataFrame(data)
+    def _record_values(self, company: Dict) -> tuple:
+        """Valeurs d'une entreprise dans l'ordre de RECORD_COLUMNS."""
+        get = company.get
+        siege = get('siege') or {}
+        siege_get = siege.get
+        siren = get('siren', '')
+        code_naf = get('activite_principale', '')
+        tranche_code = get('tranche_effectif_salarie', '')
+        region_code = siege_get('region', '')
+
+        # Finances (API fournit ca + resultat_net par année)
+        ca_euros, resultat_euros = self._extract_finances(company)
+
+        return (
+            get('nom_complet', ''),
+            siren,
+            siege_get('siret', ''),
+            get('nature_juridique', ''),
+            code_naf,
+            NAF_LABELS.get(code_naf, ''),
+            get('date_creation', ''),
+            TRANCHES_EFFECTIF.get(tranche_code, tranche_code),
+            get('categorie_entreprise', ''),
+
+            # Finances (directement depuis l'API)
+            ca_euros,
+            resultat_euros,
+
+            # Adresse siège
+            siege_get('adresse', ''),
+            siege_get('code_postal', ''),
+            siege_get('libelle_commune', ''),
+            siege_get('departement', ''),
+            config.REGIONS.get(region_code, region_code),
+            self._build_complete_address(siege),
+
+            # Dirigeant + âge (directement depuis l'API)
+            self._extract_dirigeant(company),
+            self._extract_dirigeant_nom(company),
+            self._extract_dirigeant_prenom(company),
+            self._extract_age_dirigeant(company),
+
+            # Liens
+            URL_PAPPERS + siren,
+            URL_DATAGOUV + siren,
+        )
 
     def _build_complete_address(self, siege: Dict) -> str:
         """Construit l'adresse complète depuis les composants du siège"""
@@ -528,27 +1521,90 @@ class DataGouvScraper:
         # 3. Tous les PP sont exclus → retourner None pour tenter le deep lookup PM
         return None, personne_morale, pm_siren
 
+    @staticmethod
+    def _pm_lookup_params(siren_pm: str) -> Dict:
+        """Recherche d'une holding par SIREN : seul le bloc dirigeants est lu."""
+        params = {'q': siren_pm, 'per_page': 1}
+        if config.SCRAPING_CONFIG.get('field_projection', True):
+            params.update(minimal='true', include='dirigeants')
+        return params
+
     def _deep_lookup_pm(self, siren_pm: str) -> Optional[Dict]:
-        """Cherche le dirigeant PP derriere une personne morale via son SIREN."""
+        """Cherche le dirigeant PP derriere une personne morale via son SIREN (caché)."""
         if not siren_pm:
             return None
+        found, pp = self.pm_cache.get(siren_pm)
+        if found:
+            return pp
+        params = self._pm_lookup_params(siren_pm)
         try:
-            r = self.session.get(
-                self.BASE_URL,
-                params={'q': siren_pm, 'per_page': 1},
-                timeout=5,
-            )
-            if r.status_code == 200:
-                results = r.json().get('results', [])
+            data = self.http_cache.get(self.base_url, params)
+            # 429 / 5xx : pause commune du host (appliquée par le slot suivant)
+            # puis même requête, comme _fetch_page
+            for attempt in range(1, self.MAX_RETRIES_PER_PAGE + 1):
+                if data is not None:
+                    break
+                with self.throttle.slot() as slept:
+                    started = time.monotonic()
+                    r = self.session.get(self.base_url, params=params, timeout=5)
+                    self._record_request(None, attempt, r, started, slept, source=f"{self.SOURCE}_pm")
+                    if r.status_code == 200:
+                        data = r.json()
+                        self.throttle.record_success()
+                        self.http_cache.put(self.base_url, params, data)
+                    elif r.status_code == 429 or r.status_code >= 500:
+                        self.throttle.record_throttled(
+                            parse_retry_after(r.headers.get('retry-after')),
+                            reason=f"HTTP {r.status_code}")
+                    else:
+                        break
+            if data is not None:
+                results = data.get('results', [])
+                pp = None
                 if results:
                     pm_dirs = results[0].get('dirigeants', [])
                     # Use same priority logic for deep lookup
                     pp, _, _ = self._pick_best_dirigeant(pm_dirs)
-                    return pp
+                # Réponse valide : on mémorise aussi l'absence de PP (cache négatif)
+                self.pm_cache.put(siren_pm, pp)
+                self._pm_unresolved.discard(siren_pm)
+                return pp
         except Exception:
             pass
+        # Pas de réponse exploitable (blocage persistant, circuit ouvert, erreur) :
+        # ni cache PM ni mémorisation du dirigeant de repli (_resolve_dirigeant)
+        self._pm_unresolved.add(siren_pm)
         return None
 
+    def _prefetch_pm(self, companies: List[Dict], window: int = 4):
+        """
+        Résout en parallèle les holdings (SIREN PM) d'un lot d'entreprises
+        sans dirigeant PP direct, puis mémorise le dirigeant de chaque entreprise.
+        Les requêtes restent rythmées par self.throttle.
+        """
+        pending = []
+        pm_sirens = set()
+        for company in companies:
+            if (company.get('siren') or id(company)) in self._dirigeants:
+                continue
+            dirigeants = company.get('dirigeants') or []
+            if not dirigeants:
+                continue
+            pending.append(company)
+            pp, _, pm_siren = self._pick_best_dirigeant(dirigeants)
+            if not pp and pm_siren and not self.pm_cache.get(pm_siren)[0]:
+                pm_sirens.add(pm_siren)
+
+        if len(pm_sirens) > 1 and window > 1:
+            with ThreadPoolExecutor(max_workers=min(window, len(pm_sirens))) as executor:
+                list(executor.map(self._deep_lookup_pm, pm_sirens))
+        else:
+            for pm_siren in pm_sirens:
+                self._deep_lookup_pm(pm_siren)
+
+        for company in pending:
+            self._resolve_dirigeant(company)
+
     def _get_best_pp(self, company: Dict) -> tuple:
         """
         Retourne (pp_dict, pm_name, found_via_pm) pour une entreprise.
@@ -576,17 +1632,49 @@ class DataGouvScraper:
 
         return pp, pm_name, found_via_pm
 
+    def _resolve_dirigeant(self, company: Dict) -> Dict:
+        """
+        Résout le dirigeant d'une entreprise UNE seule fois et le mémorise par SIREN.
+        Le filtre âge dirigeant et toutes les colonnes dirigeant_* lisent ce même
+        enregistrement : _pick_best_dirigeant et le deep lookup PM (HTTP) ne
+        tournent qu'une fois par entreprise.
+        Retourne {'pp': dict|None, 'pm_name': str|None, 'via_pm': bool}.
+        """
+        key = company.get('siren') or id(company)
+        resolved = self._dirigeants.get(key)
+        if resolved is None:
+            try:
+                pp, pm_name, found_via_pm = self._get_best_pp(company)
+            except Exception:
+                pp, pm_name, found_via_pm = None, None, False
+            resolved = {'pp': pp, 'pm_name': pm_name, 'via_pm': found_via_pm}
+            if not self._pm_lookup_failed(company, found_via_pm):
+                self._dirigeants[key] = resolved
+        return resolved
+
+    def _pm_lookup_failed(self, company: Dict, found_via_pm: bool) -> bool:
+        """
+        True si le dirigeant de `company` dépend d'un deep lookup PM resté sans
+        réponse (429 persistant...) : le repli n'est pas mémorisé, la
+        prochaine résolution retente la holding.
+        """
+        if found_via_pm or not self._pm_unresolved:
+            return False
+        pp, _, pm_siren = self._pick_best_dirigeant(company.get('dirigeants') or [])
+        return not pp and pm_siren in self._pm_unresolved
+
     def _extract_dirigeant(self, company: Dict) -> str:
         """Extrait le dirigeant principal formaté pour l'Excel."""
         try:
-            pp, pm_name, found_via_pm = self._get_best_pp(company)
+            resolved = self._resolve_dirigeant(company)
+            pp, pm_name = resolved['pp'], resolved['pm_name']
 
             if pp:
                 prenoms = pp.get('prenoms', '')
                 nom = pp.get('nom', '')
                 qualite = pp.get('qualite', '')
                 result = f"{prenoms} {nom} ({qualite})".strip()
-                if found_via_pm and pm_name:
+                if resolved['via_pm'] and pm_name:
                     pm_short = pm_name.split('(')[0].strip()
                     result += f" [via {pm_short}]"
                 return result
@@ -599,12 +1687,11 @@ class DataGouvScraper:
     def _extract_dirigeant_nom(self, company: Dict) -> str:
         """Extrait le NOM de famille du dirigeant PP (champ séparé, sans nom de naissance)."""
         try:
-            pp, _, _ = self._get_best_pp(company)
+            pp = self._resolve_dirigeant(company)['pp']
             if not pp:
                 return ''
             nom = pp.get('nom', '')
             # Retirer le nom de naissance entre parentheses : "GERBER (FOREST)" → "GERBER"
-            import re
             nom = re.sub(r'\s*\([^)]*\)', '', nom).strip()
             return nom
         except Exception:
@@ -613,7 +1700,7 @@ class DataGouvScraper:
     def _extract_dirigeant_prenom(self, company: Dict) -> str:
         """Extrait les PRENOMS du dirigeant PP (champ séparé)."""
         try:
-            pp, _, _ = self._get_best_pp(company)
+            pp = self._resolve_dirigeant(company)['pp']
             return pp.get('prenoms', '') if pp else ''
         except Exception:
             return ''
@@ -635,7 +1722,7 @@ class DataGouvScraper:
     def _extract_age_dirigeant(self, company: Dict) -> Optional[int]:
         """Extrait l'âge du dirigeant PP depuis date_de_naissance (format: '1972-12')"""
         try:
-            pp, _, _ = self._get_best_pp(company)
+            pp = self._resolve_dirigeant(company)['pp']
             if not pp:
                 return None
 
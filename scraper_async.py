@@ -0,0 +1,428 @@
+"""
+Backend asyncio du scraper data.gouv (recherche-entreprises.api.gouv.fr).
+
+AsyncDataGouvScraper hérite de DataGouvScraper : mêmes filtres (_prepare_search),
+mêmes post-filtres (PostFilter, _admit), même sharding, même schéma
+to_dataframe. Seul le transport change :
+- httpx.AsyncClient : pool de connexions keep-alive partagé
+- asyncio.Semaphore : borne le nombre de requêtes en vol (max_in_flight)
+- contrôleur du host (throttle.slot_async) : débit, pause, disjoncteur
+
+Usage:
+    async with AsyncDataGouvScraper(max_in_flight=100) as scraper:
+        companies = await scraper.search_companies_async(filtres)
+        df = await scraper.to_dataframe_async(companies)
+
+Depuis du code synchrone : asyncio.run(...). httpx est importé à la
+première requête (dépendance optionnelle, seul ce backend en a besoin :
+requirements-optional.txt).
+Pas de checkpoint (--resume) sur ce backend.
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+
+import pandas as pd
+
+import config
+from http_cache import ResponseCache
+from pm_cache import PMLookupCache
+from scraper import DataGouvScraper, PostFilter
+from throttle import CircuitOpenError, parse_retry_after
+
+
+class AsyncDataGouvScraper(DataGouvScraper):
+    """DataGouvScraper sur asyncio + httpx (centaines de requêtes en vol par process)."""
+
+    def __init__(self, max_in_flight: Optional[int] = None,
+                 pm_cache: Optional[PMLookupCache] = None,
+                 http_cache: Optional[ResponseCache] = None):
+        super().__init__(pm_cache=pm_cache, http_cache=http_cache)
+        self.max_in_flight = int(max_in_flight
+                                 or config.SCRAPING_CONFIG.get('async_max_in_flight', 50) or 1)
+        self._httpx = None
+        self._client = None
+        self._semaphore = None
+        self._loop = None
+        # Holdings déjà tentées en async (succès ou échec) : jamais relancées en bloquant
+        self._pm_async: Dict[str, Optional[Dict]] = {}
+
+    async def __aenter__(self) -> 'AsyncDataGouvScraper':
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self):
+        """Ferme le pool de connexions."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _get_client(self):
+        """Client httpx + sémaphore, (re)créés pour la boucle d'événements courante."""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            if self._httpx is None:
+                try:
+                    import httpx
+                except ImportError as e:
+                    raise RuntimeError(
+                        "AsyncDataGouvScraper nécessite httpx (pip install -r requirements-optional.txt)"
+                    ) from e
+                self._httpx = httpx
+            self._client = self._httpx.AsyncClient(
+                headers=dict(self.session.headers),
+                timeout=self.REQUEST_TIMEOUT,
+                limits=self._httpx.Limits(max_connections=self.max_in_flight,
+                                          max_keepalive_connections=self.max_in_flight),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+            self._loop = loop
+        return self._client
+
+    @asynccontextmanager
+    async def _get(self, params: Dict, timeout: Optional[float] = None,
+                   page: Optional[int] = None, attempt: int = 1, source: Optional[str] = None):
+        """
+        GET /search : débit (token bucket) puis place dans le sémaphore (tracé
+        dans request_log). Contexte qui fournit la réponse : le verdict
+        (record_*) se donne dedans, la requête de test du disjoncteur est
+        libérée en sortie quoi qu'il arrive.
+        """
+        client = self._get_client()
+        async with self.throttle.slot_async() as slept:
+            async with self._semaphore:
+                started = time.monotonic()
+                try:
+                    response = await client.get(self.base_url, params=params,
+                                                timeout=timeout or self.REQUEST_TIMEOUT)
+                except Exception as e:
+                    self._record_request(page, attempt, None, started, slept,
+                                         error=type(e).__name__, source=source)
+                    raise
+            self._record_request(page, attempt, response, started, slept, source=source)
+            yield response
+
+    # ──────────────────────────────────────────
+    # Recherche
+    # ──────────────────────────────────────────
+
+    async def search_companies_async(self, filtres: Dict) -> List[Dict]:
+        """Équivalent async de search_companies (liste complète)."""
+        return [company async for company in self.iter_companies_async(filtres)]
+
+    async def iter_companies_async(self, filtres: Dict) -> AsyncIterator[Dict]:
+        """
+        Équivalent async de iter_companies : entreprises retenues au fil des
+        pages. Toutes les pages du plan (shards compris) sont téléchargées en
+        parallèle dans la limite de max_in_flight, et traitées dans l'ordre
+        du plan : dédup, coupure à limit et budgets identiques au synchrone.
+        """
+        params, post, state, pushdown = self._prepare_search(filtres)
+        rate = filtres.get('requests_per_second')
+        previous_rate = self.throttle.set_rate(float(rate)) if rate else None
+        self._log(f"  Async: {self.max_in_flight} requêtes en vol max, "
+                  f"débit max: {self.limiter.rate:g} req/s")
+
+        try:
+            shards = await self._plan_queries_async(params, filtres, pushdown, post.target_depts)
+            async for batch in self._iter_plan_async(shards, params, post, state):
+                for company in batch:
+                    yield company
+        finally:
+            state['stop'].set()
+            if previous_rate is not None:
+                self.throttle.set_rate(previous_rate)
+            await asyncio.to_thread(self.pm_cache.save)
+            self._log_summary(params, post, state)
+
+    async def _plan_queries_async(self, params: Dict, filtres: Dict, pushdown: bool,
+                                  target_depts: List[str]) -> List[tuple]:
+        """Version async de _plan_queries : [(params, page 1 ou None)]."""
+        cap = self.MAX_PAGES * params['per_page']
+        shard_mode = filtres.get('shard', 'auto')
+        secteur = filtres.get('secteur_naf')
+
+        if pushdown:
+            self._log(f"  Pushdown région: {len(target_depts)} sous-requête(s) par département")
+            extra = self._shard_dimensions(shard_mode, True)
+            shard_dims = ['departement'] + [d for d in extra if d != 'departement']
+            shards = await self._plan_shards_async(params, shard_dims, cap, secteur)
+            if shards:
+                self._log(f"  Sharding {shard_dims}: {len(shards)} sous-requêtes")
+            return shards or [(params, None)]
+
+        first = await self._fetch_page_async(params, 1)
+        total = first.get('total_results', 0) or 0
+        self._log(f"  API: {total} résultats totaux")
+
+        shard_dims = self._shard_dimensions(shard_mode, total > cap)
+        if shard_dims:
+            shards = await self._plan_shards_async(params, shard_dims, cap, secteur)
+            if shards:
+                self._log(f"  Sharding {shard_dims}: {len(shards)} sous-requêtes")
+                return shards
+            self._log(f"  Sharding {shard_dims}: pas de découpage utile, requête unique")
+        elif total > cap:
+            self._log(f"  ATTENTION: {total} résultats > plafond API {cap}, "
+                      f"candidats tronqués (activer filtres['shard'])")
+        return [(params, first)]
+
+    async def _plan_shards_async(self, params: Dict, dims: List[str], cap: int,
+                                 secteur: Optional[str]) -> List[tuple]:
+        """
+        Version async de _plan_shards : sondes page 1 lancées ensemble. Une
+        sonde en échec garde sa sous-requête (page 1 retentée à l'exécution) ;
+        l'erreur n'est levée que si toutes les sondes échouent.
+        """
+        if not dims:
+            return []
+        dim, rest = dims[0], dims[1:]
+        subs = self._split_params(params, dim, secteur)
+        if len(subs) == 1:
+            return await self._plan_shards_async(params, rest, cap, secteur) if rest else []
+
+        firsts = await self._gather_probes(subs)
+
+        shards = []
+        for sub, first in zip(subs, firsts):
+            if isinstance(first, Exception):
+                self._log(f"  Sonde [{self._shard_label(sub, params)}] en échec: "
+                          f"{type(first).__name__}: {first}")
+                shards.append((sub, None))
+                continue
+            total = (first or {}).get('total_results', 0) or 0
+            if not total:
+                continue
+            if total > cap and rest:
+                deeper = await self._plan_shards_async(sub, rest, cap, secteur)
+                if deeper:
+                    shards.extend(deeper)
+                    continue
+            shards.append((sub, first))
+        return shards
+
+    async def _gather_probes(self, subs: List[Dict], raise_if_all: bool = True) -> List:
+        """
+        Pages 1 de `subs` en parallèle ; exception à la place d'une sonde en
+        échec, levée si toutes échouent (raise_if_all).
+        """
+        firsts = await asyncio.gather(*(self._fetch_page_async(sub, 1) for sub in subs),
+                                      return_exceptions=True)
+        for first in firsts:
+            if isinstance(first, BaseException) and not isinstance(first, Exception):
+                raise first  # annulation : propagée telle quelle
+        errors = [first for first in firsts if isinstance(first, Exception)]
+        if raise_if_all and errors and len(errors) == len(subs):
+            raise errors[0]
+        return firsts
+
+    async def _iter_plan_async(self, shards: List[tuple], params: Dict, post: PostFilter,
+                               state: Dict) -> AsyncIterator[List[Dict]]:
+        """
+        Exécute le plan : liste ordonnée (shard, page) téléchargée avec
+        max_in_flight pages d'avance, consommée dans l'ordre. Une page courte,
+        vide ou en échec clôt son shard (pages suivantes annulées) ; un shard
+        dont la page 1 échoue est ignoré, les autres continuent.
+        """
+        # Page 1 manquante (pushdown sans découpage, sonde en échec) : sondée d'abord
+        missing = [i for i, (_, first) in enumerate(shards) if first is None]
+        if missing:
+            firsts = await self._gather_probes([shards[i][0] for i in missing],
+                                               raise_if_all=len(missing) == len(shards))
+            for i, first in zip(missing, firsts):
+                if isinstance(first, Exception):
+                    self._log(f"  Shard {i + 1} en échec (TRONQUÉ): {type(first).__name__}: {first}")
+                    first = None
+                shards[i] = (shards[i][0], first)
+
+        jobs = []
+        for i, (sub, first) in enumerate(shards):
+            if first is None:
+                continue
+            per_page = sub['per_page']
+            total = first.get('total_results', 0) or 0
+            last_page = min(self.MAX_PAGES, -(-total // per_page)) if total else 1
+            jobs.extend((i, page) for page in range(1, last_page + 1))
+        state['available_pages'] = len(jobs)
+        if len(shards) > 1:
+            self._log(f"  Shards: {len(shards)} sous-requêtes, {len(jobs)} pages planifiées")
+
+        def launch(i: int, page: int):
+            if page == 1:
+                done = asyncio.get_running_loop().create_future()
+                done.set_result(shards[i][1])
+                return done
+            return asyncio.ensure_future(self._fetch_page_async(shards[i][0], page))
+
+        pending = deque()
+        closed = set()
+        upcoming = iter(jobs)
+        try:
+            while True:
+                while len(pending) < self.max_in_flight:
+                    job = next(upcoming, None)
+                    if job is None:
+                        break
+                    if job[0] not in closed:
+                        pending.append((job, launch(*job)))
+                if not pending:
+                    break
+
+                (i, page), task = pending.popleft()
+                if i in closed:
+                    task.cancel()
+                    continue
+                data = await task
+                if data is None:
+                    closed.add(i)
+                    continue
+
+                results = data.get('results', [])
+                if not results:
+                    self._log(f"  Page {page}: aucun résultat, fin de la sous-requête")
+                    closed.add(i)
+                    continue
+
+                candidates = post.filter_cheap(results)
+                if candidates and post.needs_dirigeant:
+                    await self._prefetch_pm_async(candidates)
+                    candidates = post.filter_dirigeant(candidates)
+                added = self._admit(candidates, post, state)
+                await self._prefetch_pm_async(added)
+
+                state['received'] += len(results)
+                self.request_log.page(self.SOURCE, page, len(results), len(added),
+                                      self._shard_label(shards[i][0], params))
+                self._log(f"  Page {page}: {len(results)} résultats API → +{len(added)} retenus "
+                          f"({len(added) / len(results):.0%} acceptés, total: {state['accepted']})")
+                self._count_page(state)
+                if added:
+                    yield added
+
+                if state['stop'].is_set():
+                    break
+                if len(results) < shards[i][0]['per_page']:
+                    closed.add(i)
+        finally:
+            for _, task in pending:
+                task.cancel()
+
+    async def _fetch_page_async(self, params: Dict, page: int) -> Optional[Dict]:
+        """Version async de _fetch_page (mêmes retries, mêmes erreurs)."""
+        page_params = dict(params, page=page)
+        # Caches SQLite / JSON synchrones : hors de la boucle d'événements
+        cached = await asyncio.to_thread(self.http_cache.get, self.base_url, page_params)
+        if cached is not None:
+            self._log(f"  Page {page}: cache HTTP")
+            self.request_log.cached(self.SOURCE, page)
+            return cached
+
+        self._get_client()
+        httpx = self._httpx
+        data = None
+        for attempt in range(1, self.MAX_RETRIES_PER_PAGE + 1):
+            try:
+                async with self._get(page_params, page=page, attempt=attempt) as response:
+                    data, wait = self._read_page_response(response, page, attempt)
+            except CircuitOpenError as e:
+                return self._circuit_open(e, page)
+            except httpx.TransportError as e:
+                data, wait = None, self._network_error_wait(e, page, attempt)
+            except RuntimeError:
+                raise
+            except Exception as e:
+                msg = f"Erreur page {page}: {type(e).__name__}: {e}"
+                self._log(f"  {msg}")
+                if page == 1:
+                    raise
+                break
+
+            if data is not None or wait is None:
+                break
+            await asyncio.sleep(wait)
+
+        return await asyncio.to_thread(self._finish_page, data, page, page_params)
+
+    # ──────────────────────────────────────────
+    # Holdings (deep lookup PM)
+    # ──────────────────────────────────────────
+
+    async def _deep_lookup_pm_async(self, siren_pm: str) -> Optional[Dict]:
+        """Version async de _deep_lookup_pm (même cache PM, même cache HTTP)."""
+        found, pp = await asyncio.to_thread(self.pm_cache.get, siren_pm)
+        if found:
+            return pp
+        params = self._pm_lookup_params(siren_pm)
+        pp = None
+        try:
+            data = await asyncio.to_thread(self.http_cache.get, self.base_url, params)
+            # 429 / 5xx : pause commune du host puis même requête (comme le synchrone)
+            for attempt in range(1, self.MAX_RETRIES_PER_PAGE + 1):
+                if data is not None:
+                    break
+                async with self._get(params, timeout=5, attempt=attempt,
+                                     source=f"{self.SOURCE}_pm") as r:
+                    if r.status_code == 200:
+                        data = r.json()
+                        self.throttle.record_success()
+                        await asyncio.to_thread(self.http_cache.put, self.base_url, params, data)
+                    elif r.status_code == 429 or r.status_code >= 500:
+                        self.throttle.record_throttled(
+                            parse_retry_after(r.headers.get('retry-after')),
+                            reason=f"HTTP {r.status_code}")
+                    else:
+                        break
+            if data is not None:
+                results = data.get('results', [])
+                if results:
+                    pp, _, _ = self._pick_best_dirigeant(results[0].get('dirigeants', []))
+                # Réponse valide : on mémorise aussi l'absence de PP (cache négatif)
+                await asyncio.to_thread(self.pm_cache.put, siren_pm, pp)
+                self._pm_unresolved.discard(siren_pm)
+                return pp
+        except Exception:
+            pass
+        # Sans réponse : repli non mémorisé, holding retentée au prochain lot
+        self._pm_unresolved.add(siren_pm)
+        return None
+
+    def _deep_lookup_pm(self, siren_pm: str) -> Optional[Dict]:
+        # Holding déjà tentée en async : pas de requête bloquante dans la boucle
+        if siren_pm in self._pm_async:
+            return self._pm_async[siren_pm]
+        return super()._deep_lookup_pm(siren_pm)
+
+    async def _prefetch_pm_async(self, companies: Iterable[Dict]):
+        """Version async de _prefetch_pm : holdings résolues ensemble, puis mémorisées."""
+        pending = []
+        pm_sirens = set()
+        for company in companies:
+            if (company.get('siren') or id(company)) in self._dirigeants:
+                continue
+            dirigeants = company.get('dirigeants') or []
+            if not dirigeants:
+                continue
+            pending.append(company)
+            pp, _, pm_siren = self._pick_best_dirigeant(dirigeants)
+            if not pp and pm_siren and (pm_siren not in self._pm_async
+                                        or pm_siren in self._pm_unresolved):
+                pm_sirens.add(pm_siren)
+
+        pm_sirens = list(pm_sirens)
+        if pm_sirens:
+            results = await asyncio.gather(*(self._deep_lookup_pm_async(s) for s in pm_sirens))
+            self._pm_async.update(zip(pm_sirens, results))
+
+        for company in pending:
+            self._resolve_dirigeant(company)
+
+    async def to_dataframe_async(self, companies: Iterable[Dict]) -> pd.DataFrame:
+        """to_dataframe après résolution async des holdings (aucune requête bloquante)."""
+        companies = list(companies)
+        await self._prefetch_pm_async(companies)
+        return self.to_dataframe(companies)
@@ -5,27 +5,45 @@ Drop-in replacement pour DataGouvScraper.
 API: https://api.pappers.fr/v2/recherche
 Auth: api_token query param
 Limites: dépend du plan (gratuit = limité)
+Pagination: curseur (curseur=* puis curseur_suivant) ou pages, sous-requêtes
+par département / NAF, reprise par checkpoint (voir iter_companies)
 """
 
+import math
+import queue
 import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 import pandas as pd
-import time
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Dict, Iterable, Iterator, List, Optional
 import config
+from request_log import RequestLog
+from throttle import CircuitOpenError, get_host_throttle, parse_retry_after
 
 # Réutilise les constantes du scraper data.gouv
 from scraper import (
+    ALL_DEPARTEMENTS,
     TRANCHES_PME,
     REGION_DEPARTEMENTS,
     FORME_TO_NATURE,
     NAF_LABELS,
     TRANCHES_EFFECTIF,
+    RECORD_COLUMNS,
+    URL_DATAGOUV,
+    URL_PAPPERS,
+    build_dataframe,
+    project_record,
+    projection,
 )
 
+# Schéma commun + bonus Pappers (pré-remplis, enricher peut compléter)
+PAPPERS_COLUMNS = RECORD_COLUMNS + ('site_web', 'telephone', 'email')
+
 
 class PappersScraper:
     """Scraper utilisant l'API Pappers v2 — drop-in replacement pour DataGouvScraper."""
@@ -33,6 +51,7 @@ class PappersScraper:
     BASE_URL = "https://api.pappers.fr/v2/recherche"
     REQUEST_TIMEOUT = 30
     MAX_PER_PAGE = 20  # Pappers limite à 20 résultats par page
+    SHARD_DIMENSIONS = ('departement', 'naf')
 
     # Qualités à EXCLURE
     _QUALITE_EXCLUSIONS = [
@@ -59,17 +78,31 @@ class PappersScraper:
         'administrateur',
     ]
 
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, base_url: Optional[str] = None):
         self.api_key = api_key
+        # Endpoint interrogé (config.ENDPOINTS) ; throttle du host de production
+        self.base_url = base_url or config.ENDPOINTS['pappers']
         self.session = requests.Session()
+        # Erreurs de connexion seulement : 429 / 5xx passent par self.throttle
         retry = Retry(
             total=3,
             backoff_factor=1,
-            status_forcelist=[500, 502, 503, 504],
+            status_forcelist=[],
             allowed_methods=["GET"],
+            # Sinon urllib3 rejoue seul les 429/503 avec Retry-After, invisibles du throttle
+            respect_retry_after_header=False,
         )
         self.session.mount("https://", HTTPAdapter(max_retries=retry))
+        self.session.mount("http://", HTTPAdapter(max_retries=retry))
+        # Débit, pause commune (Retry-After) et disjoncteur du host Pappers
+        self.throttle = get_host_throttle(self.BASE_URL)
         self.diagnostics: List[str] = []
+        # Événements structurés (requêtes, pages) : latences, attente, acceptation
+        self.request_log = RequestLog()
+        # Bilan de la dernière recherche (jetons consommés, budget)
+        self.search_summary: Dict = {}
+        # Bilan du dernier lot de fiches (lookup_companies)
+        self.lookup_summary: Dict = {}
 
     def _log(self, msg: str):
         print(msg)
@@ -79,15 +112,87 @@ class PappersScraper:
     # search_companies — même interface que DataGouvScraper
     # ──────────────────────────────────────────
 
-    def search_companies(self, filtres: Dict) -> List[Dict]:
+    def search_companies(self, filtres: Dict, checkpoint=None) -> List[Dict]:
+        return list(self.iter_companies(filtres, checkpoint=checkpoint))
+
+    def iter_companies(self, filtres: Dict, checkpoint=None) -> Iterator[Dict]:
+        """
+        Version streaming de search_companies : entreprises retenues page par
+        page ; fermer l'itérateur arrête la pagination (pages en vol annulées).
+
+        Pagination (config.PAPPERS_CONFIG['pagination']) :
+        - 'cursor' : curseur=* puis curseur_suivant, sans pages profondes
+          (une requête à la fois par sous-requête)
+        - 'page'   : page=1..N, fenêtre de fetch_window pages en parallèle
+        Sharding (filtres['shard'], défaut config) comme DataGouvScraper :
+        'auto' découpe par département au-delà de shard_above résultats
+        visés, 'departement' / 'naf' / liste forcent, False jamais. Les
+        sous-requêtes tournent en parallèle (shard_workers), SIREN dédoublonnés.
+
+        Avec un checkpoint (checkpoint.py), plan, curseur de chaque
+        sous-requête et lignes retenues sont écrits page par page ; un
+        checkpoint existant reprend sans refetch. Rien n'est accumulé ici
+        (lignes reprises relues du disque au fil de l'eau) : la mémoire reste
+        bornée aux SIREN vus et aux pages en vol.
+        """
         limit = filtres.get('limit', 100) or 100
         self.diagnostics = []
+        self.request_log.reset()
         self._log("\n[Pappers] Recherche API Pappers v2...")
         self._log(f"  Limite cible: {limit}")
 
+        params, fields = self._prepare_search(filtres)
+        cfg = config.PAPPERS_CONFIG
+        mode = cfg.get('pagination', 'cursor')
+        budget = float(filtres.get('credit_budget') or cfg.get('credit_budget', 0) or 0)
+        state = self._credit_state(budget)
+        state.update({
+            'limit': limit,
+            'retained': 0,
+            'seen': set(),
+            'stop': threading.Event(),
+            'fields': fields,
+            'mode': mode,
+            'window': max(1, int(cfg.get('fetch_window', 1) or 1)),
+            'per_page': min(self.MAX_PER_PAGE, limit),
+            'per_cursor': min(int(cfg.get('per_cursor', 100) or 100), limit),
+        })
+        self._log(f"  Pagination: {mode}")
+        if budget:
+            self._log(f"  Budget jetons: {budget:g}")
+
+        shards: List[Dict] = []
+        try:
+            if checkpoint is not None and checkpoint.plan is not None:
+                # Reprise : plan figé, lignes déjà retenues rejouées sans refetch
+                shards = [dict(sub, api_token=self.api_key) for sub in checkpoint.plan]
+                self._log(f"  Reprise du run {checkpoint.run_id}: {checkpoint.state['row_count']} "
+                          f"entreprises déjà retenues, {len(checkpoint.state['done'])}/{len(shards)} "
+                          f"sous-requête(s) terminée(s)")
+                for company in checkpoint.rows():
+                    state['seen'].add(company.get('siren'))
+                    if state['retained'] < limit:
+                        state['retained'] += 1
+                        yield company
+            else:
+                if checkpoint is not None:
+                    checkpoint.start(filtres, None)  # reprenable même si le plan échoue
+                shards = self._plan_shards(params, filtres, state)
+                if checkpoint is not None:
+                    # Jamais la clé API sur disque
+                    checkpoint.start(filtres, [{k: v for k, v in sub.items() if k != 'api_token'}
+                                               for sub in shards])
+
+            if state['retained'] < limit:
+                yield from self._iter_plan(shards, state, checkpoint)
+        finally:
+            state['stop'].set()
+            self._log_summary(params, state, len(shards))
+
+    def _prepare_search(self, filtres: Dict) -> tuple:
+        """Paramètres API des filtres (sans pagination) et projection des champs."""
         params = {
             'api_token': self.api_key,
-            'par_page': min(self.MAX_PER_PAGE, limit),
             'entreprise_cessee': 'false',
         }
 
@@ -138,207 +243,653 @@ class PappersScraper:
             params['date_creation_max'] = f"{max_year}-12-31"
             self._log(f"  Age entreprise min: {age_min} ans (créée avant {max_year})")
 
-        # --- Pagination ---
-        all_companies = []
-        seen_sirens = set()
-        page = 1
+        # --- Projection : champs lus par to_dataframe (scraper.FIELD_MANIFEST) ---
+        fields = None
+        if config.PAPPERS_CONFIG.get('field_projection', True):
+            fields = projection('pappers', PAPPERS_COLUMNS)
+            fields_param = config.PAPPERS_CONFIG.get('fields_param')
+            if fields_param:
+                params[fields_param] = ','.join(fields)
+            self._log(f"  Projection: {len(fields)} champs")
+        return params, fields
+
+    def _log_summary(self, params: Dict, state: Dict, n_shards: int = 1):
+        """Bilan de fin de recherche : jetons consommés (search_summary), total retenu."""
+        used = state['used']
+        retained = state['retained']
+        self.search_summary = {
+            'credits_used': used,
+            'credits_per_prospect': round(used / retained, 2) if retained else None,
+            'credit_budget': state['budget'],
+            'budget_hit': state['budget_hit'],
+            'pagination': state['mode'],
+            'shards': n_shards,
+        }
+        if state['budget_hit']:
+            self._log(f"  Budget de {state['budget']:g} jetons atteint : pagination arrêtée")
+        per = (f", {self.search_summary['credits_per_prospect']:g} par prospect retenu"
+               if retained else "")
+        self._log(f"  Jetons Pappers: {used:g} utilisés{per}")
+        self._log(f"  Params API: { {k: v for k, v in params.items() if k != 'api_token'} }")
+        self._log(f"  Total retenu: {retained} entreprises uniques")
 
-        while len(all_companies) < limit:
-            params['page'] = page
+    # ──────────────────────────────────────────
+    # Sharding (sous-requêtes par département ou NAF)
+    # ──────────────────────────────────────────
 
+    def _plan_shards(self, params: Dict, filtres: Dict, state: Dict) -> List[Dict]:
+        """Sous-requêtes à paginer (une seule si pas de découpage)."""
+        cfg = config.PAPPERS_CONFIG
+        mode = filtres.get('shard', cfg.get('shard', 'auto'))
+        if not mode:
+            return [params]
+        if mode == 'auto':
+            threshold = int(cfg.get('shard_above', 0) or 0)
+            # Limite sous le seuil : une seule requête suffit, pas de sonde
+            if not threshold or state['limit'] <= threshold:
+                return [params]
+            total = self._probe_total(params, state)
+            self._log(f"  API: {total if total is not None else '?'} résultats totaux")
+            if total is None or total <= threshold:
+                return [params]
+            dims = list(self.SHARD_DIMENSIONS)
+        else:
+            dims = [mode] if isinstance(mode, str) else list(mode)
+            unknown = [d for d in dims if d not in self.SHARD_DIMENSIONS]
+            if unknown:
+                self._log(f"  Sharding: dimension(s) inconnue(s) {unknown}, ignorée(s)")
+        for dim in dims:
+            subs = self._split_params(params, dim)
+            if len(subs) > 1:
+                self._log(f"  Sharding {dim}: {len(subs)} sous-requêtes")
+                return subs
+        return [params]
+
+    def _probe_total(self, params: Dict, state: Dict) -> Optional[int]:
+        """Nombre total de résultats (requête d'un seul résultat, 1 jeton)."""
+        if not self._reserve_credits(state, self._page_cost(1)):
+            return None
+        data = self._fetch_page(dict(params, par_page=1, page=1), None, state, 1,
+                                fatal=True, label='Sonde')
+        total = (data or {}).get('total', (data or {}).get('total_results'))
+        return total if isinstance(total, int) else None
+
+    @staticmethod
+    def _split_params(params: Dict, dim: str) -> List[Dict]:
+        """Découpe une requête selon une dimension (partition des résultats)."""
+        if dim == 'departement':
+            values = params['departement'].split(',') if params.get('departement') else ALL_DEPARTEMENTS
+            return [dict(params, departement=dept) for dept in values] if len(values) > 1 else [params]
+        if dim != 'naf':
+            return [params]
+        codes = params['code_naf'].split(',') if params.get('code_naf') else []
+        if len(codes) == 1 and '.' not in codes[0]:
+            # Division (2 chiffres) → codes NAF complets de la division
+            codes = [code for code in NAF_LABELS if code.startswith(codes[0] + '.')]
+        if codes:
+            return [dict(params, code_naf=code) for code in codes] if len(codes) > 1 else [params]
+        # Pas de filtre NAF : une sous-requête par division (liste de ses codes)
+        divisions: Dict[str, List[str]] = {}
+        for code in NAF_LABELS:
+            divisions.setdefault(code[:2], []).append(code)
+        return [dict(params, code_naf=','.join(group)) for _, group in sorted(divisions.items())]
+
+    @staticmethod
+    def _shard_label(params: Dict) -> str:
+        if ',' not in params.get('code_naf', ','):
+            return f"naf={params['code_naf']}"
+        if ',' not in params.get('departement', ','):
+            return f"dept={params['departement']}"
+        return f"naf={params.get('code_naf', '')[:2]}"
+
+    def _iter_plan(self, shards: List[Dict], state: Dict, checkpoint=None) -> Iterator[Dict]:
+        """
+        Entreprises retenues de toutes les sous-requêtes. Plusieurs shards :
+        exécutés en parallèle, au plus 2 pages retenues d'avance par worker
+        (les shards attendent le consommateur : mémoire bornée).
+        """
+        if len(shards) == 1:
+            for added in self._iter_shard(0, shards[0], state, checkpoint):
+                yield from added
+            return
+
+        workers = max(1, int(config.PAPPERS_CONFIG.get('shard_workers', 1) or 1))
+        self._log(f"  Shards: {len(shards)} sous-requêtes, {workers} en parallèle")
+        out: queue.Queue = queue.Queue()
+        slots = threading.Semaphore(2 * workers)
+
+        def run(index: int):
+            batches = self._iter_shard(index, shards[index], state, checkpoint,
+                                       label=self._shard_label(shards[index]))
             try:
-                response = self.session.get(
-                    self.BASE_URL,
-                    params=params,
-                    timeout=self.REQUEST_TIMEOUT,
-                )
-
-                self._log(f"  Page {page}: HTTP {response.status_code}, "
-                          f"Content-Type: {response.headers.get('content-type', '?')}")
-
-                # Gestion erreurs HTTP
-                if response.status_code in (401, 402, 403):
-                    try:
-                        err = response.json()
-                        err_msg = err.get('error', '') or err.get('message', '')
-                    except Exception:
-                        err_msg = response.text[:200]
-                    raise RuntimeError(f"API Pappers ({response.status_code}): {err_msg}")
-                if response.status_code == 429:
-                    self._log("  Rate limit atteint, arrêt.")
+                for added in batches:
+                    while not slots.acquire(timeout=0.2):
+                        if state['stop'].is_set():
+                            return
+                    out.put(('rows', added))
+            except Exception as e:
+                out.put(('error', e))
+            finally:
+                batches.close()
+                out.put(('done', None))
+
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='pappers-shard')
+        futures = [executor.submit(run, i) for i in range(len(shards))]
+        running = len(shards)
+        try:
+            while running:
+                kind, payload = out.get()
+                if kind == 'rows':
+                    slots.release()
+                    yield from payload
+                elif kind == 'error':
+                    raise payload
+                else:
+                    running -= 1
+        finally:
+            state['stop'].set()
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    def _iter_shard(self, index: int, params: Dict, state: Dict, checkpoint=None,
+                    label: str = '') -> Iterator[List[Dict]]:
+        """
+        Pagine une sous-requête (curseur ou pages) et produit les entreprises
+        retenues page par page ; chaque page est enregistrée dans le checkpoint.
+        """
+        prefix = f"  [{label}]" if label else " "
+        if checkpoint is not None and checkpoint.is_done(index):
+            return
+        pages = (self._iter_cursor(index, params, state, checkpoint, prefix)
+                 if state['mode'] == 'cursor' else
+                 self._iter_paged(index, params, state, checkpoint, prefix))
+        exhausted = False
+        try:
+            for page, results, cursor, last in pages:
+                added = self._admit(results, state)
+                self.request_log.page('pappers', page, len(results), len(added), label)
+                if checkpoint is not None:
+                    checkpoint.record_page(index, page, added, cursor=cursor)
+                if results:
+                    self._log(f"{prefix} Page {page}: {len(results)} reçus → +{len(added)} retenus "
+                              f"(total: {state['retained']})")
+                else:
+                    self._log(f"{prefix} Page {page}: aucun résultat, arrêt")
+                if added:
+                    yield added
+                if last:
+                    exhausted = True
                     break
-
-                ct = response.headers.get('content-type', '')
-                if 'application/json' not in ct:
-                    body = response.text[:300].replace('\n', ' ')
-                    msg = f"Pappers ne retourne pas du JSON (CT: {ct}). Body: {body}"
-                    self._log(f"  {msg}")
-                    if page == 1:
-                        raise RuntimeError(msg)
+                if state['stop'].is_set():
                     break
-
-                try:
-                    data = response.json()
-                except ValueError:
-                    body = response.text[:300].replace('\n', ' ')
-                    msg = f"JSON invalide. Body: {body}"
-                    self._log(f"  {msg}")
-                    if page == 1:
-                        raise RuntimeError(msg)
+        finally:
+            pages.close()
+        if exhausted and checkpoint is not None:
+            checkpoint.mark_done(index)
+
+    def _admit(self, results: List[Dict], state: Dict) -> List[Dict]:
+        """Dédup SIREN (entre shards) et coupure à limit, sous verrou."""
+        added = []
+        with state['lock']:
+            for company in results:
+                if state['retained'] >= state['limit']:
                     break
+                siren = company.get('siren', '')
+                if not siren or siren in state['seen']:
+                    continue
+                state['seen'].add(siren)
+                state['retained'] += 1
+                # Champs ignorés par l'API : réduits ici (mémoire, empreinte delta)
+                added.append(project_record(company, state['fields']) if state['fields'] else company)
+            if state['retained'] >= state['limit']:
+                state['stop'].set()
+        return added
 
-                response.raise_for_status()
+    # ──────────────────────────────────────────
+    # Pagination : curseur ou pages
+    # ──────────────────────────────────────────
 
-                # Debug: log les clés du premier résultat
+    def _iter_cursor(self, index: int, params: Dict, state: Dict, checkpoint,
+                     prefix: str) -> Iterator[tuple]:
+        """
+        Pagination par curseur : (page, résultats, curseur suivant, dernière).
+        Une requête à la fois (chaque curseur vient de la réponse précédente).
+        """
+        cfg = config.PAPPERS_CONFIG
+        cursor = (checkpoint.next_cursor(index) if checkpoint is not None else None) or '*'
+        page = checkpoint.next_page(index) if checkpoint is not None else 1
+        resumed = cursor != '*'
+        while not state['stop'].is_set():
+            # Taille libre à chaque curseur : réduite au reste de la limite et du budget
+            size = self._reserve_results(state, state['per_cursor'])
+            if not size:
+                return
+            query = dict(params, **{cfg.get('cursor_param', 'curseur'): cursor,
+                                    cfg.get('cursor_size_param', 'par_curseur'): size})
+            data = self._fetch_page(query, page, state, size, fatal=page == 1 and index == 0,
+                                    label=f"{prefix.strip()} Page {page}".strip())
+            if data is None:
+                if resumed:
+                    # Curseur de reprise expiré : sous-requête relancée (SIREN déjà vus ignorés)
+                    self._log(f"{prefix} Curseur de reprise refusé, sous-requête reprise au début")
+                    cursor, resumed = '*', False
+                    continue
+                return
+            resumed = False
+            results = data.get('resultats', data.get('results', []))
+            if page == 1 and index == 0:
+                total = data.get('total', data.get('total_results'))
+                self._log(f"  API: {total if total is not None else '?'} résultats totaux")
+                if results:
+                    self._log(f"  Clés résultat: {list(results[0].keys())[:15]}")
+            cursor = data.get(cfg.get('cursor_next_key', 'curseur_suivant'))
+            last = not results or not cursor or len(results) < size
+            yield page, results, cursor, last
+            if last:
+                return
+            page += 1
+
+    def _iter_paged(self, index: int, params: Dict, state: Dict, checkpoint,
+                    prefix: str) -> Iterator[tuple]:
+        """
+        Pagination page=1..N : (page, résultats, None, dernière). Page de
+        départ seule (total), puis fenêtre de pages en parallèle bornée par
+        fetch_window, les pages encore nécessaires et le budget de jetons.
+        """
+        size = state['per_page']
+        cost = self._page_cost(size)
+        window = state['window']
+        page = checkpoint.next_page(index) if checkpoint is not None else 1
+
+        def fetch(n: int) -> Optional[Dict]:
+            return self._fetch_page(dict(params, par_page=size, page=n), n, state, size,
+                                    fatal=n == 1 and index == 0,
+                                    label=f"{prefix.strip()} Page {n}".strip())
+
+        pending: Dict[int, Future] = {}
+        executor = ThreadPoolExecutor(max_workers=window, thread_name_prefix='pappers')
+        try:
+            data = fetch(page) if self._reserve_credits(state, cost) else None
+            last_page = None
+            while data is not None:
                 results = data.get('resultats', data.get('results', []))
-                total = data.get('total', data.get('total_results', '?'))
+                if last_page is None:
+                    total = data.get('total', data.get('total_results'))
+                    if page == 1 and index == 0:
+                        self._log(f"  API: {total if total is not None else '?'} résultats totaux")
+                        if results:
+                            self._log(f"  Clés résultat: {list(results[0].keys())[:15]}")
+                    last_page = math.ceil(total / size) if isinstance(total, int) else None
+                last = (not results or len(results) < size
+                        or (last_page is not None and page >= last_page))
+                yield page, results, None, last
+                if last or state['stop'].is_set():
+                    break
 
-                if page == 1:
-                    self._log(f"  API: {total} résultats totaux")
-                    if results:
-                        self._log(f"  Clés résultat: {list(results[0].keys())[:15]}")
+                # Pages suivantes : jamais plus que ce qu'il reste à retenir
+                needed = math.ceil((state['limit'] - state['retained']) / size)
+                next_page = page + 1 + len(pending)
+                while (len(pending) < min(window, needed)
+                       and (last_page is None or next_page <= last_page)):
+                    if not self._reserve_credits(state, cost):
+                        break
+                    pending[next_page] = executor.submit(fetch, next_page)
+                    next_page += 1
 
-                if not results:
-                    self._log(f"  Page {page}: aucun résultat, arrêt")
+                page += 1
+                future = pending.pop(page, None)
+                if future is None:
                     break
+                data = future.result()
+        finally:
+            for future in pending.values():
+                future.cancel()
+            executor.shutdown(wait=True)
 
-                added = 0
-                for company in results:
-                    siren = company.get('siren', '')
-                    if not siren or siren in seen_sirens:
-                        continue
-                    seen_sirens.add(siren)
-                    all_companies.append(company)
-                    added += 1
-
-                self._log(f"  Page {page}: {len(results)} reçus → +{added} retenus "
-                          f"(total: {len(all_companies)})")
+    # ──────────────────────────────────────────
+    # Fiches par SIREN (complément des lignes data.gouv, gap_fill.py)
+    # ──────────────────────────────────────────
 
-                if len(all_companies) >= limit:
-                    break
-                if len(results) < params['par_page']:
+    def lookup_companies(self, sirens: Iterable[str], columns: Iterable[str] = PAPPERS_COLUMNS,
+                         credit_budget: float = 0) -> Iterator[Dict]:
+        """
+        Fiches /v2/entreprise des SIREN donnés (dans l'ordre de fin des requêtes),
+        réduites aux champs des colonnes demandées. Chaque requête réserve
+        credits_per_lookup jetons : plus aucune n'est envoyée une fois
+        credit_budget atteint (0 = illimité). SIREN inconnus (404) ignorés,
+        non facturés. Bilan dans self.lookup_summary.
+        """
+        sirens = list(dict.fromkeys(str(s) for s in sirens if s))
+        url = config.ENDPOINTS.get('pappers_entreprise', self.BASE_URL.replace('/recherche', '/entreprise'))
+        cost = float(config.PAPPERS_CONFIG.get('credits_per_lookup', 1) or 0)
+        window = max(1, int(config.PAPPERS_CONFIG.get('fetch_window', 1) or 1))
+        state = self._credit_state(float(credit_budget or 0))
+
+        params = {'api_token': self.api_key}
+        fields = None
+        if config.PAPPERS_CONFIG.get('field_projection', True):
+            fields = projection('pappers', columns)
+            fields_param = config.PAPPERS_CONFIG.get('fields_param')
+            if fields_param:
+                params[fields_param] = ','.join(fields)
+
+        self._log(f"\n[Pappers] Fiches entreprise: {len(sirens)} SIREN"
+                  + (f", budget {state['budget']:g} jetons" if state['budget'] else ""))
+        found = 0
+        remaining = iter(sirens)
+        pending = set()
+        executor = ThreadPoolExecutor(max_workers=window, thread_name_prefix='pappers-fiche')
+        try:
+            while True:
+                while len(pending) < window and not state['budget_hit']:
+                    siren = next(remaining, None)
+                    if siren is None or not self._reserve_credits(state, cost):
+                        break
+                    pending.add(executor.submit(
+                        self._fetch_json, url, dict(params, siren=siren), state, cost,
+                        lambda data: cost, label=f"Fiche {siren}"))
+                if not pending:
                     break
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    data = future.result()
+                    if data and data.get('siren'):
+                        found += 1
+                        yield project_record(data, fields) if fields else data
+        finally:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+            self.lookup_summary = {
+                'requested': len(sirens),
+                'found': found,
+                'credits_used': state['used'],
+                'credit_budget': state['budget'],
+                'budget_hit': state['budget_hit'],
+            }
+            if state['budget_hit']:
+                self._log(f"  Budget de {state['budget']:g} jetons atteint : fiches restantes ignorées")
+            self._log(f"  Fiches: {found}/{len(sirens)} trouvées, {state['used']:g} jetons")
 
-                page += 1
-                time.sleep(0.5)  # Respecter les limites
-
-            except (requests.exceptions.ConnectionError,
-                    requests.exceptions.Timeout) as e:
-                msg = f"Erreur réseau: {type(e).__name__}: {e}"
-                self._log(f"  {msg}")
-                if page == 1:
-                    raise RuntimeError(f"Impossible de joindre l'API Pappers: {msg}") from e
-                break
-            except RuntimeError:
-                raise
-            except Exception as e:
-                msg = f"Erreur page {page}: {type(e).__name__}: {e}"
-                self._log(f"  {msg}")
-                if page == 1:
-                    raise
-                break
+    # ──────────────────────────────────────────
+    # Jetons et pages
+    # ──────────────────────────────────────────
 
-        all_companies = all_companies[:limit]
-        self._log(f"  Params API: { {k: v for k, v in params.items() if k != 'api_token'} }")
-        self._log(f"  Total retenu: {len(all_companies)} entreprises uniques")
-        return all_companies
+    @staticmethod
+    def _page_cost(n_results: int) -> float:
+        """Jetons facturés pour une page de n_results résultats (config.PAPPERS_CONFIG)."""
+        cfg = config.PAPPERS_CONFIG
+        return cfg.get('credits_per_request', 0) + n_results * cfg.get('credits_per_result', 0)
+
+    @staticmethod
+    def _credit_state(budget: float) -> Dict:
+        """Compteur de jetons partagé par les requêtes d'une recherche (ou d'un lot de fiches)."""
+        return {'lock': threading.Lock(), 'budget': budget, 'used': 0.0, 'reserved': 0.0,
+                'budget_hit': False}
+
+    def _reserve_results(self, state: Dict, size: int) -> int:
+        """
+        Réserve le coût d'une requête de `size` résultats au plus, réduite à ce
+        qu'il reste à retenir et à ce que le budget permet ; 0 si rien ne passe.
+        """
+        cfg = config.PAPPERS_CONFIG
+        per_result = cfg.get('credits_per_result', 0)
+        with state['lock']:
+            size = min(size, state['limit'] - state['retained'])
+            if state['budget']:
+                left = (state['budget'] - state['used'] - state['reserved']
+                        - cfg.get('credits_per_request', 0))
+                if per_result:
+                    size = min(size, math.floor(left / per_result))
+                elif left < 0:
+                    size = 0
+                if size <= 0:
+                    state['budget_hit'] = True
+            if size <= 0:
+                return 0
+            state['reserved'] += self._page_cost(size)
+        return size
+
+    @staticmethod
+    def _reserve_credits(state: Dict, cost: float) -> bool:
+        """Réserve le coût maximal d'une requête ; False si le budget serait dépassé."""
+        with state['lock']:
+            if state['budget'] and state['used'] + state['reserved'] + cost > state['budget']:
+                state['budget_hit'] = True
+                return False
+            state['reserved'] += cost
+        return True
+
+    def _fetch_page(self, query: Dict, page: Optional[int], state: Dict, size: int,
+                    fatal: bool = False, label: str = '') -> Optional[Dict]:
+        """
+        Une page de recherche de `size` résultats max (jetons réservés par
+        _reserve_credits). Retourne le JSON, ou None pour arrêter la
+        pagination ; avec fatal les erreurs remontent (RuntimeError /
+        CircuitOpenError).
+        """
+        def cost_of(data: Dict) -> float:
+            # Coût réel : dépend du nombre de résultats renvoyés
+            return self._page_cost(len(data.get('resultats', data.get('results', []))))
+
+        return self._fetch_json(self.base_url, query, state, self._page_cost(size), cost_of,
+                                label=label or f"Page {page}", page=page, fatal=fatal)
+
+    def _fetch_json(self, url: str, params: Dict, state: Dict, reserved: float, cost_of,
+                    label: str, page: Optional[int] = None, fatal: bool = False,
+                    source: str = 'pappers') -> Optional[Dict]:
+        """
+        Une requête JSON (retries 429/5xx compris). `reserved` jetons ont été
+        réservés par l'appelant : libérés à la fin, seul cost_of(data) est
+        compté. None si la requête échoue ; avec fatal, les erreurs remontent.
+        Les refus d'authentification / de quota (401, 402, 403) remontent toujours.
+        """
+        attempt = 0
+        try:
+            while True:
+                attempt += 1
+                slept, started = 0.0, time.monotonic()
+                try:
+                    # Slot : requête de test du disjoncteur libérée même sans verdict (401/402/403...)
+                    with self.throttle.slot() as slept:
+                        started = time.monotonic()
+                        try:
+                            response = self.session.get(
+                                url,
+                                params=params,
+                                timeout=self.REQUEST_TIMEOUT,
+                            )
+                        except (requests.exceptions.ConnectionError,
+                                requests.exceptions.Timeout) as e:
+                            # Verdict donné dans le slot (circuit rouvert avant un autre test)
+                            self.throttle.record_error(type(e).__name__)
+                            raise
+                        latency = time.monotonic() - started
+
+                        def record(credits: float = 0):
+                            self.request_log.request(source, page=page, attempt=attempt,
+                                                     status=response.status_code, latency_s=latency,
+                                                     size=len(response.content), sleep_s=slept,
+                                                     credits=credits)
+
+                        self._log(f"  {label}: HTTP {response.status_code}, "
+                                  f"Content-Type: {response.headers.get('content-type', '?')}")
+
+                        # Gestion erreurs HTTP (non facturées)
+                        if response.status_code in (401, 402, 403):
+                            record()
+                            try:
+                                err = response.json()
+                                err_msg = err.get('error', '') or err.get('message', '')
+                            except Exception:
+                                err_msg = response.text[:200]
+                            raise RuntimeError(f"API Pappers ({response.status_code}): {err_msg}")
+                        if response.status_code == 429 or response.status_code >= 500:
+                            record()
+                            # Pause commune du host puis même requête ; le disjoncteur borne les retries
+                            pause = self.throttle.record_throttled(
+                                parse_retry_after(response.headers.get('retry-after')),
+                                reason=f"HTTP {response.status_code}")
+                            self._log(f"  HTTP {response.status_code}, pause du host {pause:.0f}s...")
+                            continue
+                        if response.status_code == 404:
+                            record()
+                            self.throttle.record_success()
+                            return None
+
+                        ct = response.headers.get('content-type', '')
+                        if 'application/json' not in ct:
+                            record()
+                            body = response.text[:300].replace('\n', ' ')
+                            msg = f"Pappers ne retourne pas du JSON (CT: {ct}). Body: {body}"
+                            self._log(f"  {msg}")
+                            self.throttle.record_throttled(reason='HTML au lieu de JSON')
+                            if fatal:
+                                raise RuntimeError(msg)
+                            return None
+
+                        try:
+                            data = response.json()
+                        except ValueError:
+                            record()
+                            body = response.text[:300].replace('\n', ' ')
+                            msg = f"JSON invalide. Body: {body}"
+                            self._log(f"  {msg}")
+                            if fatal:
+                                raise RuntimeError(msg)
+                            return None
+
+                        response.raise_for_status()
+                        self.throttle.record_success()
+                        credits = cost_of(data)
+                        with state['lock']:
+                            state['used'] += credits
+                        record(credits)
+                        return data
+
+                except CircuitOpenError as e:
+                    self._log(f"  {e}")
+                    if fatal:
+                        raise
+                    return None
+                except (requests.exceptions.ConnectionError,
+                        requests.exceptions.Timeout) as e:
+                    msg = f"Erreur réseau: {type(e).__name__}: {e}"
+                    self._log(f"  {msg}")
+                    self.request_log.request(source, page=page, attempt=attempt,
+                                             latency_s=time.monotonic() - started,
+                                             sleep_s=slept, error=type(e).__name__)
+                    if fatal:
+                        raise RuntimeError(f"Impossible de joindre l'API Pappers: {msg}") from e
+                    return None
+                except RuntimeError:
+                    raise
+                except Exception as e:
+                    msg = f"Erreur {label}: {type(e).__name__}: {e}"
+                    self._log(f"  {msg}")
+                    if fatal:
+                        raise
+                    return None
+        finally:
+            # Réservation libérée : seul le coût réel (déjà compté) reste
+            with state['lock']:
+                state['reserved'] -= reserved
 
     # ──────────────────────────────────────────
     # to_dataframe — même schéma que DataGouvScraper
     # ──────────────────────────────────────────
 
-    def to_dataframe(self, companies: List[Dict]) -> pd.DataFrame:
-        data = []
+    def to_dataframe(self, companies: Iterable[Dict]) -> pd.DataFrame:
+        """Convertit les résultats en DataFrame (construction par colonnes, voir build_dataframe)"""
+        return build_dataframe(PAPPERS_COLUMNS, self._iter_values(companies))
+
+    def to_records(self, companies: Iterable[Dict]) -> Iterator[Dict]:
+        """Version streaming de to_dataframe : une ligne (dict) par entreprise."""
+        for values in self._iter_values(companies):
+            yield dict(zip(PAPPERS_COLUMNS, values))
+
+    def _iter_values(self, companies: Iterable[Dict]) -> Iterator[tuple]:
+        """Tuples de valeurs (ordre PAPPERS_COLUMNS), entreprises illisibles ignorées."""
         for company in companies:
             try:
-                siege = company.get('siege', {})
-                siren = company.get('siren', '')
-
-                # Finances
-                ca_euros, resultat_euros = self._extract_finances(company)
-
-                # Dirigeant
-                pp = self._pick_best_dirigeant_pp(company)
-                dirigeant_principal = self._format_dirigeant(pp)
-                dirigeant_nom = self._extract_nom(pp)
-                dirigeant_prenom = self._extract_prenom(pp)
-                age_dirigeant = self._extract_age(pp)
-
-                # NAF
-                code_naf = (company.get('code_naf')
-                            or company.get('activite_principale', ''))
-                libelle_naf = (company.get('libelle_code_naf')
-                               or NAF_LABELS.get(code_naf, ''))
-
-                # Tranche effectif
-                tranche_code = (company.get('tranche_effectif_salarie')
-                                or company.get('effectif', ''))
-                tranche_text = TRANCHES_EFFECTIF.get(str(tranche_code), str(tranche_code))
-
-                # Adresse
-                adresse = siege.get('adresse_ligne_1') or siege.get('adresse', '')
-                code_postal = siege.get('code_postal', '')
-                ville = (siege.get('ville')
-                         or siege.get('libelle_commune', ''))
-                dept = siege.get('departement', '')
-                region_code = siege.get('region', '')
-                region_name = config.REGIONS.get(region_code, region_code)
-
-                adresse_complete = ', '.join(
-                    p for p in [adresse, f"{code_postal} {ville}".strip()] if p
-                )
-
-                row = {
-                    'nom_entreprise': (company.get('nom_entreprise')
-                                       or company.get('denomination')
-                                       or company.get('nom_complet', '')),
-                    'siren': siren,
-                    'siret_siege': (siege.get('siret')
-                                    or company.get('siret_siege', '')),
-                    'forme_juridique': (company.get('categorie_juridique')
-                                        or company.get('forme_juridique')
-                                        or company.get('nature_juridique', '')),
-                    'code_naf': code_naf,
-                    'libelle_naf': libelle_naf,
-                    'date_creation': company.get('date_creation', ''),
-                    'tranche_effectif': tranche_text,
-                    'categorie': company.get('categorie_entreprise', ''),
-
-                    'ca_euros': ca_euros,
-                    'resultat_euros': resultat_euros,
-
-                    'adresse': adresse,
-                    'code_postal': code_postal,
-                    'ville': ville,
-                    'departement': dept,
-                    'region': region_name,
-                    'adresse_complete': adresse_complete,
-
-                    'dirigeant_principal': dirigeant_principal,
-                    'dirigeant_nom': dirigeant_nom,
-                    'dirigeant_prenom': dirigeant_prenom,
-                    'age_dirigeant': age_dirigeant,
-
-                    'url_pappers': f"https://www.pappers.fr/entreprise/{siren}",
-                    'url_datagouv': f"https://annuaire-entreprises.data.gouv.fr/entreprise/{siren}",
-
-                    # Bonus Pappers (pré-remplis, enricher peut compléter)
-                    'site_web': company.get('site_internet')
-                               or company.get('site_web', ''),
-                    'telephone': company.get('telephone', ''),
-                    'email': company.get('email', ''),
-                }
-                data.append(row)
+                yield self._record_values(company)
             except Exception as e:
                 print(f"  Erreur parsing {company.get('siren', '?')}: {e}")
-                continue
 
-        return pd.DataFrame(data)
+    def _record_values(self, company: Dict) -> tuple:
+        """Valeurs d'une entreprise dans l'ordre de PAPPERS_COLUMNS."""
+        get = company.get
+        siege = get('siege') or {}
+        siege_get = siege.get
+        siren = get('siren', '')
+
+        # Finances
+        ca_euros, resultat_euros = self._extract_finances(company)
+
+        # Dirigeant
+        pp = self._pick_best_dirigeant_pp(company)
+
+        # NAF
+        code_naf = get('code_naf') or get('activite_principale', '')
+        libelle_naf = get('libelle_code_naf') or NAF_LABELS.get(code_naf, '')
+
+        # Tranche effectif
+        tranche_code = str(get('tranche_effectif_salarie') or get('effectif', ''))
+
+        # Adresse
+        adresse = siege_get('adresse_ligne_1') or siege_get('adresse', '')
+        code_postal = siege_get('code_postal', '')
+        ville = siege_get('ville') or siege_get('libelle_commune', '')
+        region_code = siege_get('region', '')
+        cp_ville = f"{code_postal} {ville}".strip()
+        adresse_complete = ', '.join(p for p in (adresse, cp_ville) if p)
+
+        return (
+            get('nom_entreprise') or get('denomination') or get('nom_complet', ''),
+            siren,
+            siege_get('siret') or get('siret_siege', ''),
+            get('categorie_juridique') or get('forme_juridique') or get('nature_juridique', ''),
+            code_naf,
+            libelle_naf,
+            get('date_creation', ''),
+            TRANCHES_EFFECTIF.get(tranche_code, tranche_code),
+            get('categorie_entreprise', ''),
+
+            ca_euros,
+            resultat_euros,
+
+            adresse,
+            code_postal,
+            ville,
+            siege_get('departement', ''),
+            config.REGIONS.get(region_code, region_code),
+            adresse_complete,
+
+            self._format_dirigeant(pp),
+            self._extract_nom(pp),
+            self._extract_prenom(pp),
+            self._extract_age(pp),
+
+            URL_PAPPERS + str(siren),
+            URL_DATAGOUV + str(siren),
+
+            get('site_internet') or get('site_web') or self._first_site(get('sites_internet')),
+            get('telephone', ''),
+            get('email', ''),
+        )
 
     # ──────────────────────────────────────────
     # Helpers privés
     # ──────────────────────────────────────────
 
+    @staticmethod
+    def _first_site(sites) -> str:
+        """Fiche /v2/entreprise : sites_internet est une liste."""
+        if isinstance(sites, list):
+            return next((str(site) for site in sites if site), '')
+        return sites or ''
+
     def _extract_finances(self, company: Dict) -> tuple:
         """Extrait CA et résultat net (année la plus récente)."""
         # Pappers peut avoir "finances" (list de dicts) ou "chiffre_affaires" direct
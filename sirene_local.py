@@ -0,0 +1,417 @@
+"""
+Miroir SIRENE local : backend hors ligne de search_companies, sans appel à
+recherche-entreprises.api.gouv.fr.
+
+Import (stocks INSEE mensuels, https://www.data.gouv.fr/fr/datasets/base-sirene-des-entreprises-et-de-leurs-etablissements-siren-siret/) :
+    python sirene_local.py import StockUniteLegale_utf8.csv StockEtablissement_utf8.csv \\
+        [--finances ratios_financiers.csv] [--out data/sirene]
+
+→ une ligne par unité légale active, jointe à son établissement siège et au
+  dernier exercice connu du CSV finances (optionnel), écrite en Parquet :
+  <out>/departement=XX/*.parquet
+- partitionné par département du siège : un filtre région ne lit que les
+  dossiers de ses départements
+- trié par code NAF dans chaque partition : les filtres NAF (code, division,
+  section) sont des intervalles sur activite_principale, que les
+  statistiques min/max des row groups comparent pour écarter les blocs hors
+  du code demandé ; la sortie suit le même ordre (département, NAF, SIREN)
+
+Recherche : SireneLocalScraper hérite de DataGouvScraper (mêmes filtres,
+même to_dataframe / to_records) ; les filtres deviennent une requête DuckDB
+sur le Parquet. Le stock SIRENE ne contient pas les dirigeants : colonnes
+dirigeant vides, filtres d'âge dirigeant ignorés.
+
+duckdb est importé à la première utilisation (dépendance optionnelle, seul
+ce backend en a besoin : pip install -r requirements-optional.txt).
+"""
+
+import argparse
+import glob
+import os
+import shutil
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+import config
+from http_cache import ResponseCache
+from pm_cache import PMLookupCache
+from scraper import (DataGouvScraper, FORME_TO_NATURE, NAF_DIVISION_TO_SECTION, NAF_SECTIONS,
+                     REGION_DEPARTEMENTS, TRANCHES_PME)
+
+# Départements d'outre-mer → code région INSEE (complète REGION_DEPARTEMENTS)
+_DOM_REGIONS = {"971": "01", "972": "02", "973": "03", "974": "04", "976": "06"}
+
+# Colonnes du Parquet (hors departement, porté par le chemin de partition)
+_COLUMNS = (
+    'siren', 'siret', 'nom_complet', 'nature_juridique', 'activite_principale',
+    'date_creation', 'tranche_effectif', 'categorie_entreprise',
+    'adresse', 'code_postal', 'libelle_commune', 'departement', 'region',
+    'ca', 'resultat_net', 'annee_finances',
+)
+
+
+def _duckdb():
+    try:
+        import duckdb
+    except ImportError as e:
+        raise RuntimeError("Le miroir SIRENE local nécessite duckdb "
+                           "(pip install -r requirements-optional.txt)") from e
+    return duckdb
+
+
+def _division_ranges(divisions: List[str]) -> List[tuple]:
+    """Divisions NAF triées ("10", "11", ..., "33") → plages consécutives [("10", "33")]."""
+    ranges = []
+    for division in divisions:
+        if ranges and int(division) == int(ranges[-1][1]) + 1:
+            ranges[-1] = (ranges[-1][0], division)
+        else:
+            ranges.append((division, division))
+    return ranges
+
+
+def _sql_str(value: str) -> str:
+    """Littéral SQL (chemins de fichiers : read_csv/COPY n'acceptent pas de paramètre)."""
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _dept_regions() -> List[tuple]:
+    pairs = [(d, r) for r, depts in REGION_DEPARTEMENTS.items() for d in depts]
+    return pairs + list(_DOM_REGIONS.items())
+
+
+# ──────────────────────────────────────────
+# Import des stocks SIRENE
+# ──────────────────────────────────────────
+
+def import_sirene(unites_csv: str, etablissements_csv: str,
+                  finances_csv: Optional[str] = None,
+                  out_dir: Optional[str] = None) -> Dict:
+    """
+    Construit le miroir Parquet depuis les stocks SIRENE (CSV UTF-8 INSEE).
+    Remplace atomiquement un miroir existant. Retourne les compteurs d'import.
+    """
+    out_dir = out_dir or config.SIRENE_CONFIG['dir']
+    started = time.monotonic()
+    con = _duckdb().connect()
+
+    con.execute(f"""
+        CREATE TEMP VIEW unites AS
+        SELECT siren,
+               siren || nicSiegeUniteLegale AS siret,
+               COALESCE(NULLIF(denominationUniteLegale, ''),
+                        TRIM(CONCAT_WS(' ', prenom1UniteLegale, nomUniteLegale))) AS nom_complet,
+               categorieJuridiqueUniteLegale AS nature_juridique,
+               activitePrincipaleUniteLegale AS activite_principale,
+               dateCreationUniteLegale AS date_creation,
+               trancheEffectifsUniteLegale AS tranche_effectif,
+               categorieEntreprise AS categorie_entreprise
+        FROM read_csv({_sql_str(unites_csv)}, header = true, all_varchar = true)
+        WHERE etatAdministratifUniteLegale = 'A'
+    """)
+    con.execute(f"""
+        CREATE TEMP VIEW sieges AS
+        SELECT siret,
+               CONCAT_WS(' ', NULLIF(numeroVoieEtablissement, ''),
+                         NULLIF(indiceRepetitionEtablissement, ''),
+                         NULLIF(typeVoieEtablissement, ''),
+                         NULLIF(libelleVoieEtablissement, '')) AS adresse,
+               codePostalEtablissement AS code_postal,
+               libelleCommuneEtablissement AS libelle_commune,
+               CASE WHEN codeCommuneEtablissement LIKE '97%'
+                    THEN LEFT(codeCommuneEtablissement, 3)
+                    ELSE LEFT(codeCommuneEtablissement, 2) END AS departement
+        FROM read_csv({_sql_str(etablissements_csv)}, header = true, all_varchar = true)
+        WHERE etablissementSiege = 'true' AND codeCommuneEtablissement IS NOT NULL
+    """)
+    con.execute("CREATE TEMP TABLE dept_region (departement VARCHAR, region VARCHAR)")
+    con.executemany("INSERT INTO dept_region VALUES (?, ?)", _dept_regions())
+
+    if finances_csv:
+        cols = config.SIRENE_CONFIG['finances_columns']
+        # Dernier exercice avec CA connu, par SIREN
+        con.execute(f"""
+            CREATE TEMP VIEW finances AS
+            SELECT siren, ca, resultat_net, LEFT(date_cloture, 4) AS annee_finances
+            FROM (
+                SELECT "{cols['siren']}" AS siren,
+                       "{cols['date_cloture']}" AS date_cloture,
+                       TRY_CAST("{cols['ca']}" AS DOUBLE) AS ca,
+                       TRY_CAST("{cols['resultat_net']}" AS DOUBLE) AS resultat_net
+                FROM read_csv({_sql_str(finances_csv)}, header = true, all_varchar = true)
+            )
+            WHERE ca IS NOT NULL
+            QUALIFY row_number() OVER (PARTITION BY siren ORDER BY date_cloture DESC) = 1
+        """)
+    else:
+        con.execute("""
+            CREATE TEMP VIEW finances AS
+            SELECT NULL::VARCHAR AS siren, NULL::DOUBLE AS ca,
+                   NULL::DOUBLE AS resultat_net, NULL::VARCHAR AS annee_finances
+            WHERE false
+        """)
+
+    tmp_dir = f"{out_dir.rstrip(os.sep)}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    con.execute(f"""
+        COPY (
+            SELECT u.siren, u.siret, u.nom_complet, u.nature_juridique,
+                   u.activite_principale, u.date_creation, u.tranche_effectif,
+                   u.categorie_entreprise, s.adresse, s.code_postal, s.libelle_commune,
+                   s.departement, COALESCE(r.region, '') AS region,
+                   f.ca, f.resultat_net, f.annee_finances
+            FROM unites u
+            JOIN sieges s ON s.siret = u.siret
+            LEFT JOIN finances f ON f.siren = u.siren
+            LEFT JOIN dept_region r ON r.departement = s.departement
+            ORDER BY s.departement, u.activite_principale, u.siren
+        ) TO {_sql_str(tmp_dir)} (FORMAT PARQUET, PARTITION_BY (departement),
+                                  ROW_GROUP_SIZE 100000)
+    """)
+
+    stats = con.execute(f"""
+        SELECT count(*), count(DISTINCT departement), count(ca)
+        FROM read_parquet({_sql_str(os.path.join(tmp_dir, '*', '*.parquet'))},
+                          hive_partitioning = true)
+    """).fetchone()
+    con.close()
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(os.path.dirname(os.path.abspath(out_dir)), exist_ok=True)
+    os.replace(tmp_dir, out_dir)
+    return {
+        'rows': stats[0],
+        'departements': stats[1],
+        'with_ca': stats[2],
+        'elapsed_s': round(time.monotonic() - started, 1),
+        'dir': out_dir,
+    }
+
+
+# ──────────────────────────────────────────
+# Recherche
+# ──────────────────────────────────────────
+
+class SireneLocalScraper(DataGouvScraper):
+    """DataGouvScraper dont la recherche interroge le miroir SIRENE local (DuckDB)."""
+
+    FETCH_SIZE = 2000  # lignes lues par lot depuis DuckDB
+
+    def __init__(self, directory: Optional[str] = None,
+                 pm_cache: Optional[PMLookupCache] = None,
+                 http_cache: Optional[ResponseCache] = None):
+        super().__init__(pm_cache=pm_cache, http_cache=http_cache)
+        self.directory = directory or config.SIRENE_CONFIG['dir']
+        self._con = None
+
+    def _connect(self):
+        if self._con is None:
+            if not glob.glob(os.path.join(self.directory, '*', '*.parquet')):
+                raise RuntimeError(
+                    f"Miroir SIRENE absent ({self.directory}) : "
+                    f"python sirene_local.py import StockUniteLegale_utf8.csv StockEtablissement_utf8.csv"
+                )
+            self._con = _duckdb().connect()
+        return self._con
+
+    def close(self):
+        if self._con is not None:
+            self._con.close()
+            self._con = None
+
+    def search_companies(self, filtres: Dict, checkpoint=None) -> List[Dict]:
+        """Recherche les entreprises selon les filtres (liste complète)."""
+        return list(self.iter_companies(filtres, checkpoint=checkpoint))
+
+    def iter_companies(self, filtres: Dict, checkpoint=None) -> Iterator[Dict]:
+        """
+        Générateur d'entreprises au format de l'API recherche-entreprises
+        (siege, finances, dirigeants vides), triées par SIREN.
+        `checkpoint` est accepté pour compatibilité et ignoré (requête locale).
+        Fermer le générateur (limite atteinte en amont, SourceRace) libère le
+        résultat en cours et la connexion DuckDB ; le bilan est toujours écrit.
+        """
+        sql, args, limit = self._build_query(filtres)
+        started = time.monotonic()
+        found = 0
+        try:
+            cursor = self._connect().execute(sql, args)
+            while True:
+                rows = cursor.fetchmany(self.FETCH_SIZE)
+                if not rows:
+                    break
+                for row in rows:
+                    found += 1
+                    yield self._to_company(dict(zip(_COLUMNS, row)))
+        finally:
+            # Fin normale ou consommateur arrêté : connexion rouverte à la prochaine recherche
+            self.close()
+            elapsed = time.monotonic() - started
+            self._log(f"  Total retenu: {found} entreprises uniques ({elapsed:.2f} s)")
+            self.search_summary = {
+                'found': found,
+                'limit': limit,
+                'pages_read': 0,
+                'elapsed_s': round(elapsed, 1),
+            }
+
+    def _build_query(self, filtres: Dict) -> tuple:
+        """Traduit les filtres en (SQL DuckDB, paramètres, limite)."""
+        limit = filtres.get('limit', 100) or 100
+        self.diagnostics = []
+        self.request_log.reset()
+        self.search_summary = {}
+        self._dirigeants = {}
+        self._log(f"\n[Scraper] Recherche miroir SIRENE local ({self.directory})...")
+        self._log(f"  Limite cible: {limit}")
+
+        where, args = [], []
+
+        # Région → départements du siège : élagage des partitions
+        region_code = filtres.get('region')
+        if region_code:
+            depts = REGION_DEPARTEMENTS.get(region_code, [])
+            where.append(f"departement IN ({', '.join('?' * len(depts)) or 'NULL'})")
+            args.extend(depts)
+            self._log(f"  Region: {config.REGIONS.get(region_code, region_code)} → departements siege: {depts}")
+
+        tranches = filtres.get('tranches_effectif', TRANCHES_PME)
+        if tranches:
+            where.append(f"tranche_effectif IN ({', '.join('?' * len(tranches))})")
+            args.extend(tranches)
+            self._log(f"  Effectif: {tranches}")
+
+        secteur = filtres.get('secteur_naf')
+        if secteur:
+            if '.' in secteur:
+                where.append("activite_principale = ?")
+                args.append(secteur)
+                self._log(f"  NAF: {secteur}")
+            elif secteur in NAF_SECTIONS:
+                divisions = sorted(d for d, section in NAF_DIVISION_TO_SECTION.items()
+                                   if section == secteur)
+                # Divisions consécutives fusionnées : un intervalle par plage ("10." ≤ code < "33/")
+                ranges = _division_ranges(divisions)
+                where.append("(" + " OR ".join(["activite_principale >= ? AND activite_principale < ?"]
+                                               * len(ranges)) + ")")
+                for first, last in ranges:
+                    args.extend([f"{first}.", f"{last}/"])
+                self._log(f"  Section NAF: {secteur} → divisions {divisions}")
+            else:
+                # Préfixe "62." en intervalle ('/' suit '.') : exploitable par les stats min/max
+                where.append("activite_principale >= ? AND activite_principale < ?")
+                args.extend([f"{secteur}.", f"{secteur}/"])
+                self._log(f"  NAF: {secteur}.*")
+
+        forme = filtres.get('forme_juridique')
+        if forme:
+            natures = FORME_TO_NATURE.get(forme)
+            if natures:
+                where.append(f"nature_juridique IN ({', '.join('?' * len(natures))})")
+                args.extend(natures)
+                self._log(f"  Forme: {forme} → {natures}")
+            else:
+                self._log(f"  Forme {forme}: non mappable, ignorée")
+
+        ca_min = float(filtres.get('ca_min', 0) or 0)
+        ca_max = float(filtres.get('ca_max', 0) or 0)
+        if ca_min > 0:
+            where.append("ca >= ?")
+            args.append(ca_min)
+        if ca_max > 0:
+            where.append("ca <= ?")
+            args.append(ca_max)
+        if ca_min > 0 or ca_max > 0:
+            self._log(f"  Filtre CA: {ca_min/1e6:.0f}M - {ca_max/1e6:.0f}M (CA connu requis)")
+
+        age_min = filtres.get('age_min', 0) or 0
+        if age_min > 0:
+            where.append("date_creation <= ?")
+            args.append(f"{datetime.now().year - age_min}-12-31")
+
+        if filtres.get('age_dirigeant_min') or filtres.get('age_dirigeant_max'):
+            self._log("  Age dirigeant: non disponible dans le stock SIRENE, filtre ignoré")
+
+        source = os.path.join(self.directory, '*', '*.parquet')
+        sql = (f"SELECT {', '.join(_COLUMNS)} "
+               f"FROM read_parquet({_sql_str(source)}, hive_partitioning = true, "
+               f"hive_types = {{'departement': VARCHAR}})")
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        # Ordre du stockage (partition, tri NAF de l'import) : la limite garde les mêmes lignes
+        sql += " ORDER BY departement, activite_principale, siren LIMIT ?"
+        args.append(int(limit))
+        return sql, args, limit
+
+    @staticmethod
+    def _to_company(row: Dict) -> Dict:
+        """Ligne du miroir → dict au format de l'API (lu par _record_values)."""
+        finances = {}
+        if row['ca'] is not None:
+            finances[row['annee_finances'] or ''] = {'ca': row['ca'],
+                                                     'resultat_net': row['resultat_net']}
+        return {
+            'siren': row['siren'],
+            'nom_complet': row['nom_complet'] or '',
+            'nature_juridique': row['nature_juridique'] or '',
+            'activite_principale': row['activite_principale'] or '',
+            'date_creation': row['date_creation'] or '',
+            'tranche_effectif_salarie': row['tranche_effectif'] or '',
+            'categorie_entreprise': row['categorie_entreprise'] or '',
+            'siege': {
+                'siret': row['siret'] or '',
+                'adresse': row['adresse'] or '',
+                'code_postal': row['code_postal'] or '',
+                'libelle_commune': row['libelle_commune'] or '',
+                'departement': row['departement'] or '',
+                'region': row['region'] or '',
+            },
+            'dirigeants': [],
+            'finances': finances,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Miroir SIRENE local (Parquet + DuckDB)")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    imp = sub.add_parser('import', help='Construit le miroir depuis les stocks SIRENE')
+    imp.add_argument('unites', help='StockUniteLegale_utf8.csv')
+    imp.add_argument('etablissements', help='StockEtablissement_utf8.csv')
+    imp.add_argument('--finances', help='CSV ratios financiers (siren, date_cloture_exercice, chiffre_d_affaires, resultat_net)')
+    imp.add_argument('--out', help=f"Dossier du miroir [{config.SIRENE_CONFIG['dir']}]")
+
+    search = sub.add_parser('search', help='Recherche de test sur le miroir')
+    search.add_argument('--dir', help='Dossier du miroir')
+    search.add_argument('--region', type=str)
+    search.add_argument('--secteur', type=str)
+    search.add_argument('--forme', type=str)
+    search.add_argument('--ca-min', type=float, help='CA minimum en M euros')
+    search.add_argument('--ca-max', type=float, help='CA maximum en M euros')
+    search.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    if args.command == 'import':
+        stats = import_sirene(args.unites, args.etablissements, args.finances, args.out)
+        print(f"Miroir SIRENE : {stats['rows']} unités légales actives, "
+              f"{stats['departements']} départements, {stats['with_ca']} avec CA "
+              f"({stats['elapsed_s']} s) → {stats['dir']}")
+        return
+
+    scraper = SireneLocalScraper(directory=args.dir)
+    filtres = {
+        'tranches_effectif': TRANCHES_PME,
+        'region': args.region,
+        'secteur_naf': args.secteur,
+        'forme_juridique': args.forme,
+        'ca_min': (args.ca_min or 0) * 1_000_000,
+        'ca_max': (args.ca_max or 0) * 1_000_000,
+        'limit': args.limit,
+    }
+    df = scraper.to_dataframe(scraper.search_companies(filtres))
+    print(df[['siren', 'nom_entreprise', 'code_naf', 'departement', 'ca_euros']].to_string())
+
+
+if __name__ == "__main__":
+    main()
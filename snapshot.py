@@ -0,0 +1,160 @@
+"""
+Snapshot par jeu de filtres pour les relances incrémentales (run_all.py --delta).
+
+Un snapshot = outputs/snapshots/<clé filtres>.json :
+- filtres : critères de recherche (ceux qui définissent la population)
+- rows : SIREN → {'hash': empreinte de l'enregistrement API brut,
+                  'row': ligne finale du run (enrichie + scorée)}
+
+Au run suivant avec les mêmes filtres, split() sépare les entreprises
+nouvelles / modifiées (empreinte différente), seules retraitées
+(to_dataframe, enrichissement, scoring), des inchangées dont la ligne est
+reprise telle quelle. merge() recolle les deux et marque statut_delta
+('nouveau' / 'modifie' / 'inchange'). Les SIREN absents du nouveau run
+sortent du snapshot.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+import config
+
+# Clés de filtres sans effet sur la population (débit, exécution, budgets,
+# volume) : les changer garde la même clé de snapshot
+_RUNTIME_KEYS = {
+    'limit', 'requests_per_second', 'fetch_window', 'max_pages',
+    'time_budget_s', 'projection_every', 'region_pushdown', 'shard',
+    'shard_workers', 'credit_budget', 'source_mode', 'latency_budget_s',
+    'hedge_credit_budget', 'gap_fill_credits',
+}
+
+STATUT_NOUVEAU = 'nouveau'
+STATUT_MODIFIE = 'modifie'
+STATUT_INCHANGE = 'inchange'
+
+
+def filtres_key(filtres: Dict) -> str:
+    """Clé stable d'un jeu de filtres (ordre des clés et des listes indifférent)."""
+    items = {}
+    for k, v in filtres.items():
+        if k in _RUNTIME_KEYS or v in (None, '', [], 0):
+            continue
+        if isinstance(v, (list, tuple, set)):
+            v = sorted(str(x) for x in v)
+        items[k] = v
+    blob = json.dumps(items, sort_keys=True, default=str)
+    return hashlib.sha1(blob.encode('utf-8')).hexdigest()[:16]
+
+
+def content_hash(company: Dict) -> str:
+    """Empreinte de l'enregistrement API brut (clés triées)."""
+    blob = json.dumps(company, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.md5(blob.encode('utf-8')).hexdigest()
+
+
+def _json_value(value):
+    """Valeur de ligne DataFrame → JSON (NaN/NA → None, scalaires numpy → Python)."""
+    if isinstance(value, (list, dict)):
+        return value
+    if pd.isna(value):
+        return None
+    return value.item() if hasattr(value, 'item') else value
+
+
+class DeltaSnapshot:
+    """Dernier résultat connu d'un jeu de filtres, persisté sur disque."""
+
+    def __init__(self, filtres: Dict, directory: Optional[str] = None):
+        self.filtres = filtres
+        self.key = filtres_key(filtres)
+        base = directory or os.path.join(config.OUTPUT_CONFIG['dir'], 'snapshots')
+        self.path = os.path.join(base, f"{self.key}.json")
+        self.rows: Dict[str, Dict] = {}
+        self.updated: Optional[str] = None
+        self._hashes: Dict[str, str] = {}
+        self._statuts: Dict[str, str] = {}
+        self._carried: List[Dict] = []
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    data = json.load(f)
+                self.rows = data.get('rows', {})
+                self.updated = data.get('updated')
+            except (OSError, ValueError):
+                self.rows = {}
+
+    @property
+    def exists(self) -> bool:
+        return bool(self.rows)
+
+    def split(self, companies: List[Dict]) -> List[Dict]:
+        """
+        Retourne les entreprises à retraiter (nouvelles ou modifiées).
+        Les lignes des inchangées sont mises de côté pour merge().
+        """
+        fresh = []
+        self._hashes, self._statuts, self._carried = {}, {}, []
+        for company in companies:
+            siren = str(company.get('siren', ''))
+            if not siren or siren in self._hashes:
+                continue
+            digest = content_hash(company)
+            self._hashes[siren] = digest
+            previous = self.rows.get(siren)
+            if previous is not None and previous.get('hash') == digest:
+                self._statuts[siren] = STATUT_INCHANGE
+                self._carried.append(previous['row'])
+            else:
+                self._statuts[siren] = STATUT_MODIFIE if previous is not None else STATUT_NOUVEAU
+                fresh.append(company)
+        return fresh
+
+    def counts(self) -> Dict[str, int]:
+        counts = {STATUT_NOUVEAU: 0, STATUT_MODIFIE: 0, STATUT_INCHANGE: 0}
+        for statut in self._statuts.values():
+            counts[statut] += 1
+        counts['sortis'] = sum(1 for siren in self.rows if siren not in self._statuts)
+        return counts
+
+    def merge(self, df: Optional[pd.DataFrame]) -> pd.DataFrame:
+        """Lignes retraitées + lignes reprises, triées par score, avec statut_delta."""
+        frames = []
+        if df is not None and len(df):
+            frames.append(df)
+        if self._carried:
+            frames.append(pd.DataFrame(self._carried))
+        if not frames:
+            return pd.DataFrame()
+        merged = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        merged['statut_delta'] = (merged['siren'].astype(str).map(self._statuts)
+                                  .fillna(STATUT_NOUVEAU))
+        if 'score' in merged.columns:
+            score_order = {'A': 0, 'B': 1, 'C': 2, 'D': 3}
+            merged['score_order'] = merged['score'].map(score_order)
+            merged = (merged.sort_values('score_order', kind='stable')
+                      .drop('score_order', axis=1).reset_index(drop=True))
+        return merged
+
+    def save(self, df: pd.DataFrame):
+        """Remplace le snapshot par les lignes finales du run (SIREN vus par split)."""
+        rows = {}
+        for row in df.drop(columns=['statut_delta'], errors='ignore').to_dict('records'):
+            siren = str(row.get('siren', ''))
+            digest = self._hashes.get(siren)
+            if digest is None:
+                continue
+            rows[siren] = {'hash': digest,
+                           'row': {k: _json_value(v) for k, v in row.items()}}
+        self.rows = rows
+        self.updated = datetime.now().isoformat(timespec='seconds')
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'filtres': self.filtres, 'updated': self.updated, 'rows': rows},
+                      f, ensure_ascii=False, default=str)
+        os.replace(tmp, self.path)
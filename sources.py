@@ -0,0 +1,302 @@
+"""
+Sources de recherche interchangeables et course entre sources.
+
+Une source = un nom + une fabrique de scraper. Le scraper expose
+iter_companies(filtres, ...), to_dataframe(companies), request_log et
+diagnostics (DataGouvScraper, SireneLocalScraper, PappersScraper).
+
+SourceRace enchaîne les sources selon le mode (config.SOURCES_CONFIG,
+surchargé par filtres['source_mode'] / filtres['latency_budget_s']) :
+- 'sequential' : source suivante seulement si la précédente échoue ou ne
+  trouve rien (repli data.gouv → Pappers, défaut)
+- 'hedged'     : source suivante lancée dès que la précédente n'a rien
+  livré après latency_budget_s (ou a échoué)
+- 'race'       : toutes les sources lancées ensemble
+La première source qui livre une entreprise gagne : les autres sont
+arrêtées. Si la gagnante échoue en cours de route, une autre source est
+(re)lancée pour compléter jusqu'à la limite. Un seul ensemble de SIREN
+dédoublonne toutes les sources. Une source lancée par anticipation (relais
+hedged, course) a son budget de jetons plafonné à hedge_credit_budget ; les
+threads des sources arrêtées sont attendus en fin de recherche, pour que
+leurs requêtes soient closes et comptées.
+
+SourceRace s'utilise comme un scraper : search_companies / iter_companies,
+to_dataframe (chaque entreprise convertie par le scraper qui l'a trouvée),
+request_log (événements de toutes les sources) et diagnostics.
+"""
+
+import itertools
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+import config
+from request_log import RequestLog
+
+MODES = ('sequential', 'hedged', 'race')
+
+
+class Source:
+    """Une source de recherche : nom, fabrique du scraper, arguments de iter_companies."""
+
+    def __init__(self, name: str, factory: Callable[[], object],
+                 search_kwargs: Optional[Dict] = None):
+        self.name = name
+        self.factory = factory
+        self.search_kwargs = search_kwargs or {}
+
+
+def default_sources(sirene: bool = False, checkpoint=None) -> List[Source]:
+    """data.gouv (ou miroir SIRENE local), puis Pappers si une clé API est configurée."""
+    if sirene:
+        from sirene_local import SireneLocalScraper
+        sources = [Source('sirene', SireneLocalScraper)]
+    else:
+        from scraper import DataGouvScraper
+        sources = [Source('datagouv', DataGouvScraper, {'checkpoint': checkpoint})]
+    if config.PAPPERS_API_KEY:
+        from scraper_pappers import PappersScraper
+        # Checkpoint propre (sous-dossier du run) : les deux sources reprennent
+        sources.append(Source('pappers', lambda: PappersScraper(config.PAPPERS_API_KEY),
+                              {'checkpoint': checkpoint.child('pappers') if checkpoint else None}))
+    return sources
+
+
+class SourceRace:
+    """Recherche sur plusieurs sources (voir docstring du module)."""
+
+    JOIN_TIMEOUT_S = 5
+
+    def __init__(self, sources: List[Source], mode: Optional[str] = None,
+                 latency_budget_s: Optional[float] = None):
+        if not sources:
+            raise ValueError("SourceRace : aucune source")
+        self.sources = sources
+        self.mode = mode
+        self.latency_budget_s = latency_budget_s
+        self.scrapers: Dict[str, object] = {}
+        self.origins: Dict[str, str] = {}
+        self.winner: Optional[str] = None
+        self.diagnostics: List[str] = []
+        self.request_log = RequestLog()
+        self.search_summary: Dict = {}
+
+    def _log(self, msg: str):
+        print(msg)
+        self.diagnostics.append(msg)
+
+    def _settings(self, filtres: Dict) -> tuple:
+        mode = filtres.get('source_mode') or self.mode or config.SOURCES_CONFIG.get('mode', 'sequential')
+        if mode not in MODES:
+            raise ValueError(f"Mode de sources inconnu '{mode}' ({', '.join(MODES)})")
+        budget = filtres.get('latency_budget_s')
+        if budget is None:
+            budget = self.latency_budget_s
+        if budget is None:
+            budget = config.SOURCES_CONFIG.get('latency_budget_s', 10)
+        return mode, float(budget)
+
+    @staticmethod
+    def _speculative_filtres(filtres: Dict) -> Dict:
+        """Filtres d'une source lancée par anticipation : budget de jetons plafonné."""
+        cap = filtres.get('hedge_credit_budget')
+        if cap is None:
+            cap = config.SOURCES_CONFIG.get('hedge_credit_budget', 0)
+        if not cap:
+            return filtres
+        budget = filtres.get('credit_budget') or config.PAPPERS_CONFIG.get('credit_budget', 0)
+        return dict(filtres, credit_budget=min(float(budget), float(cap)) if budget else float(cap))
+
+    # ──────────────────────────────────────────
+    # Recherche
+    # ──────────────────────────────────────────
+
+    def search_companies(self, filtres: Dict) -> List[Dict]:
+        return list(self.iter_companies(filtres))
+
+    def iter_companies(self, filtres: Dict) -> Iterator[Dict]:
+        """Entreprises de la source gagnante (puis des relais), dédoublonnées par SIREN."""
+        mode, budget = self._settings(filtres)
+        limit = filtres.get('limit', 100) or 100
+        self.diagnostics = []
+        self.request_log.reset()
+        self.scrapers, self.origins, self.winner = {}, {}, None
+        names = [s.name for s in self.sources]
+        self._log(f"\n[Sources] {' → '.join(names)} (mode {mode}"
+                  + (f", relais après {budget:g} s)" if mode == 'hedged' and len(names) > 1 else ")"))
+
+        events: queue.Queue = queue.Queue()
+        runs: Dict[int, Dict] = {}          # run_id → {'index', 'stop', 'started', 'thread'}
+        stopped: List[threading.Thread] = []  # threads des sources arrêtées, attendus en fin
+        waiting = list(range(len(self.sources)))
+        report = {name: {'statut': 'non lancée', 'retenues': 0} for name in names}
+        seen = set()                        # SIREN partagés par toutes les sources
+        started_at = time.monotonic()
+        last_start = started_at
+        first_result = None
+        retained = 0
+        run_ids = itertools.count(1)
+
+        def start(reason: str, speculative: bool = False):
+            nonlocal last_start
+            index = waiting.pop(0)
+            source = self.sources[index]
+            run_id = next(run_ids)
+            run = {'index': index, 'stop': threading.Event(), 'started': time.monotonic()}
+            runs[run_id] = run
+            last_start = run['started']
+            report[source.name]['statut'] = 'en cours'
+            report[source.name].setdefault('lancee_s', round(run['started'] - started_at, 3))
+            run_filtres = self._speculative_filtres(filtres) if speculative else filtres
+            cap = run_filtres.get('credit_budget') if run_filtres is not filtres else None
+            self._log(f"  {source.name} lancée ({reason})" + (f", {cap:g} jetons max" if cap else ""))
+            run['thread'] = threading.Thread(
+                target=self._run_source, args=(run_id, source, run_filtres, run['stop'], events),
+                name=f"source-{source.name}", daemon=True)
+            run['thread'].start()
+
+        def stop(run_id: int, statut: str):
+            run = runs.pop(run_id)
+            run['stop'].set()
+            stopped.append(run['thread'])
+            name = self.sources[run['index']].name
+            report[name]['statut'] = statut
+            if statut == 'arrêtée':
+                # Relançable si la gagnante échoue plus tard
+                waiting.append(run['index'])
+                waiting.sort()
+
+        try:
+            start('source principale')
+            if mode == 'race':
+                while waiting:
+                    start('course', speculative=True)
+            while retained < limit:
+                if not runs:
+                    if not waiting:
+                        break
+                    start('relais')
+                    continue
+                timeout = None
+                if mode == 'hedged' and self.winner is None and waiting:
+                    timeout = max(0.0, last_start + budget - time.monotonic())
+                try:
+                    run_id, kind, payload = events.get(timeout=timeout)
+                except queue.Empty:
+                    start(f"rien reçu après {budget:g} s", speculative=True)
+                    continue
+                if run_id not in runs:
+                    continue  # source déjà arrêtée : messages tardifs ignorés
+                name = self.sources[runs[run_id]['index']].name
+
+                if kind == 'company':
+                    if self.winner is None:
+                        self.winner = name
+                        elapsed = time.monotonic() - started_at
+                        if first_result is None:
+                            first_result = elapsed
+                            self._log(f"  {name} gagne (1er résultat en {elapsed:.1f} s)")
+                        else:
+                            self._log(f"  {name} prend le relais à {elapsed:.1f} s ({retained} déjà retenues)")
+                        report[name]['statut'] = 'gagnante'
+                        for other in [r for r in runs if r != run_id]:
+                            self._log(f"  {self.sources[runs[other]['index']].name} arrêtée")
+                            stop(other, 'arrêtée')
+                    siren = payload.get('siren')
+                    if not siren or siren in seen:
+                        continue
+                    seen.add(siren)
+                    self.origins[siren] = name
+                    report[name]['retenues'] += 1
+                    retained += 1
+                    yield payload
+                elif kind == 'error':
+                    self._log(f"  {name} en erreur : {payload}")
+                    stop(run_id, 'erreur')
+                    waiting[:] = [i for i in waiting if self.sources[i].name != name]
+                    if name == self.winner:
+                        self.winner = None  # la prochaine source qui livre prend le relais
+                else:  # 'done'
+                    stop(run_id, 'terminée' if report[name]['retenues'] else 'aucun résultat')
+                    if name == self.winner:
+                        break  # la gagnante a épuisé les résultats
+                    self._log(f"  {name} : aucun résultat")
+        finally:
+            # Fin (limite atteinte ou consommateur arrêté) : sources en vol coupées
+            for run in runs.values():
+                run['stop'].set()
+                stopped.append(run['thread'])
+                name = self.sources[run['index']].name
+                if report[name]['statut'] == 'en cours':
+                    report[name]['statut'] = 'arrêtée'
+            # Chaque thread ferme son itérateur (pages en vol annulées) au
+            # prochain résultat : attendus ici pour ne pas laisser une source
+            # perdante requêter en arrière-plan, et pour fusionner leur bilan
+            deadline = time.monotonic() + self.JOIN_TIMEOUT_S
+            for thread in stopped:
+                thread.join(timeout=max(0.0, deadline - time.monotonic()))
+                if thread.is_alive():
+                    self._log(f"  {thread.name} : arrêt non confirmé après {self.JOIN_TIMEOUT_S} s")
+            for scraper in list(self.scrapers.values()):
+                self.request_log.absorb(scraper.request_log)
+                self.diagnostics.extend(scraper.diagnostics)
+            self.search_summary = {
+                'mode': mode,
+                'winner': self.winner,
+                'first_result_s': round(first_result, 3) if first_result is not None else None,
+                'sources': report,
+            }
+            self._log(f"  Sources: " + ', '.join(f"{n} {r['statut']} ({r['retenues']})"
+                                                 for n, r in report.items()))
+
+    def _run_source(self, run_id: int, source: Source, filtres: Dict,
+                    stop: threading.Event, events: queue.Queue):
+        """Thread d'une source : pousse ('company' | 'done' | 'error') dans events."""
+        try:
+            scraper = source.factory()
+            self.scrapers[source.name] = scraper
+            iterator = scraper.iter_companies(filtres, **source.search_kwargs)
+            try:
+                for company in iterator:
+                    if stop.is_set():
+                        return
+                    events.put((run_id, 'company', company))
+            finally:
+                iterator.close()
+            events.put((run_id, 'done', None))
+        except Exception as e:
+            events.put((run_id, 'error', f"{type(e).__name__}: {e}"))
+
+    # ──────────────────────────────────────────
+    # Conversion
+    # ──────────────────────────────────────────
+
+    def raw_records(self, companies: List[Dict], sources=('datagouv',)) -> Dict[str, Dict]:
+        """
+        SIREN → enregistrement brut des entreprises trouvées par `sources`
+        (format recherche-entreprises, réutilisé par CompanyEnricher).
+        """
+        return {c['siren']: c for c in companies
+                if c.get('siren') and self.origins.get(c['siren']) in sources}
+
+    def to_dataframe(self, companies: List[Dict]) -> pd.DataFrame:
+        """Chaque entreprise convertie par le scraper de sa source, dans l'ordre reçu."""
+        from scraper import CATEGORICAL_COLUMNS
+
+        default = self.winner or next(iter(self.scrapers), self.sources[0].name)
+        groups: Dict[str, List[Dict]] = {}
+        for company in companies:
+            groups.setdefault(self.origins.get(company.get('siren'), default), []).append(company)
+        if len(groups) <= 1:
+            scraper = self.scrapers.get(default) or self.sources[0].factory()
+            return scraper.to_dataframe(companies)
+        frames = [self.scrapers[name].to_dataframe(items) for name, items in groups.items()]
+        df = pd.concat(frames, ignore_index=True)
+        order = {c.get('siren'): i for i, c in enumerate(companies)}
+        df = df.iloc[df['siren'].map(order).argsort(kind='stable')].reset_index(drop=True)
+        for col in CATEGORICAL_COLUMNS.intersection(df.columns):
+            df[col] = df[col].astype('category')
+        return df
@@ -0,0 +1,340 @@
+"""
+Limitation de débit partagée entre les clients HTTP.
+
+TokenBucket : seau à jetons thread-safe. Chaque requête consomme un jeton,
+les jetons se rechargent au débit autorisé par l'API (ex: 7 req/s pour
+recherche-entreprises.api.gouv.fr). Remplace les time.sleep() fixes.
+acquire_async : même seau, attente non bloquante pour la boucle asyncio.
+
+HostThrottle : contrôleur par host, partagé par tous les composants du process
+(scrapers data.gouv / Pappers, enrichisseur API + DuckDuckGo) via
+get_host_throttle(url) :
+- débit : token bucket, réduit de moitié à chaque signal de blocage
+  (429, 202 DDG, page HTML Cloudflare, 5xx) puis remonté progressivement
+- pause commune : Retry-After (ou backoff exponentiel) appliqué à tous les
+  appelants du host, pas seulement à celui qui a reçu la réponse
+- disjoncteur : après N blocages consécutifs le host est considéré bloqué,
+  acquire() lève CircuitOpenError pendant open_seconds (bascule / pause
+  côté appelant), puis une seule requête de test passe (les autres
+  appelants attendent son résultat) et referme ou rouvre le circuit.
+  slot() / slot_async() encadrent requête + verdict : la requête de test
+  est libérée même si l'appelant ne rapporte rien (4xx, exception)
+"""
+
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import config
+
+
+class TokenBucket:
+    """
+    Seau à jetons thread-safe (rate = jetons/seconde, capacity = rafale max).
+
+    Capacité 1 par défaut, seau initialement à 1 jeton : requêtes espacées de
+    1/rate dès la première seconde. Un seau plein de `rate` jetons laissait
+    partir jusqu'à ~2×rate requêtes la première seconde (rafale + recharge),
+    au-delà d'un quota strict comme les 7 req/s de data.gouv.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(capacity))
+        self._tokens = 1.0
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Bloque jusqu'à disposer de `tokens` jetons. Retourne le temps attendu (s)."""
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+            waited += wait
+
+    async def acquire_async(self, tokens: float = 1.0) -> float:
+        """Comme acquire, sans bloquer la boucle d'événements (asyncio.sleep)."""
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                wait = (tokens - self._tokens) / self.rate
+            await asyncio.sleep(wait)
+            waited += wait
+
+
+class CircuitOpenError(RuntimeError):
+    """Host bloqué (disjoncteur ouvert) : basculer sur une autre source ou patienter."""
+
+    def __init__(self, host: str, retry_in: float):
+        self.host = host
+        self.retry_in = retry_in
+        super().__init__(f"{host} bloqué (circuit ouvert), nouvel essai dans {retry_in:.0f}s")
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """En-tête Retry-After (secondes ou date HTTP) → secondes, None si absent/illisible."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class HostThrottle:
+    """Débit adaptatif + pause commune + disjoncteur pour un host."""
+
+    PROBE_POLL_S = 0.1   # attente des appelants pendant la requête de test
+
+    def __init__(self, host: str, rate: float, failure_threshold: int = 5,
+                 open_seconds: float = 60, base_backoff: float = 2,
+                 max_backoff: float = 60, min_rate: float = 0.2,
+                 probe_timeout: float = 30):
+        self.host = host
+        self.bucket = TokenBucket(rate)
+        self.target_rate = float(rate)
+        self.min_rate = min_rate
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.probe_timeout = probe_timeout
+        self._lock = threading.Lock()
+        self._failures = 0          # signaux de blocage consécutifs
+        self._pause_until = 0.0     # monotonic : aucune requête avant
+        self._open_until = 0.0      # monotonic : circuit ouvert jusqu'à
+        self._half_open = False
+        self._probe_in_flight = False  # requête de test partie, résultat attendu
+        self._probe_started = 0.0
+        self._probe_id = 0             # n° de la dernière requête de test
+        self.stats = {'ok': 0, 'throttled': 0, 'errors': 0, 'opened': 0, 'paused_s': 0.0}
+
+    # ──────────────────────────────────────────
+    # Avant la requête
+    # ──────────────────────────────────────────
+
+    def _wait_time(self) -> tuple:
+        """
+        (attente avant la prochaine requête, n° de requête de test ou 0) ;
+        lève CircuitOpenError si circuit ouvert.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._open_until:
+                if now < self._open_until:
+                    raise CircuitOpenError(self.host, self._open_until - now)
+                # Délai écoulé : semi-ouvert, le prochain résultat tranche
+                self._open_until = 0.0
+                self._half_open = True
+            if self._half_open:
+                if self._probe_in_flight and now - self._probe_started < self.probe_timeout:
+                    # Un seul test à la fois : attendre qu'il soit tranché ou libéré
+                    return self.PROBE_POLL_S, 0
+                # Aucun test en vol (libéré sans verdict, ou abandonné) : cet appelant l'est
+                self._probe_in_flight = True
+                self._probe_started = now
+                self._probe_id += 1
+                return 0.0, self._probe_id
+            return max(0.0, self._pause_until - now), 0
+
+    def _acquire(self) -> tuple:
+        waited = 0.0
+        while True:
+            wait, probe = self._wait_time()
+            if wait <= 0:
+                break
+            time.sleep(wait)
+            waited += wait
+        return waited + self.bucket.acquire(), probe
+
+    async def _acquire_async(self) -> tuple:
+        waited = 0.0
+        while True:
+            wait, probe = self._wait_time()
+            if wait <= 0:
+                break
+            await asyncio.sleep(wait)
+            waited += wait
+        return waited + await self.bucket.acquire_async(), probe
+
+    def acquire(self) -> float:
+        """
+        Attend la pause commune et un jeton. Retourne le temps attendu (s).
+        Ne libère pas la requête de test d'un circuit semi-ouvert : préférer
+        slot(), qui la libère quelle que soit l'issue de la requête.
+        """
+        return self._acquire()[0]
+
+    async def acquire_async(self) -> float:
+        """Comme acquire, sans bloquer la boucle d'événements (préférer slot_async)."""
+        return (await self._acquire_async())[0]
+
+    @contextmanager
+    def slot(self):
+        """
+        acquire() pour une requête et son traitement :
+            with throttle.slot() as slept:
+                response = session.get(...)
+                throttle.record_success() / record_throttled(...)
+        En sortie (verdict enregistré ou non : 4xx, exception, réponse
+        ignorée), la requête de test éventuelle est libérée ; sans verdict,
+        l'appelant suivant devient la requête de test.
+        """
+        waited, probe = self._acquire()
+        try:
+            yield waited
+        finally:
+            if probe:
+                self.release_probe(probe)
+
+    @asynccontextmanager
+    async def slot_async(self):
+        """Comme slot, sans bloquer la boucle d'événements."""
+        waited, probe = await self._acquire_async()
+        try:
+            yield waited
+        finally:
+            if probe:
+                self.release_probe(probe)
+
+    def release_probe(self, probe: int):
+        """Libère la requête de test `probe` si elle est toujours en vol (sans verdict)."""
+        with self._lock:
+            if self._probe_in_flight and self._probe_id == probe:
+                self._probe_in_flight = False
+
+    def set_rate(self, rate: float) -> float:
+        """
+        Change le débit cible du host (ex: filtres['requests_per_second']) en
+        gardant le ralentissement adaptatif en cours. Retourne le débit cible
+        précédent : le contrôleur est partagé par tout le process, un
+        surcoût propre à une recherche est restauré en fin de recherche.
+        """
+        with self._lock:
+            previous = self.target_rate
+            factor = self.bucket.rate / previous if previous > 0 else 1.0
+            self.target_rate = float(rate)
+            self.bucket.rate = float(rate) * factor
+            return previous
+
+    # ──────────────────────────────────────────
+    # Après la réponse
+    # ──────────────────────────────────────────
+
+    def record_success(self):
+        """Réponse exploitable : referme le circuit et remonte le débit."""
+        with self._lock:
+            self.stats['ok'] += 1
+            self._failures = 0
+            self._half_open = False
+            self._probe_in_flight = False
+            if self.target_rate > 0 and self.bucket.rate < self.target_rate:
+                self.bucket.rate = min(self.target_rate,
+                                       self.bucket.rate + self.target_rate * 0.1)
+
+    def record_throttled(self, retry_after: Optional[float] = None,
+                         reason: str = '429') -> float:
+        """
+        Signal de blocage (429, 202, HTML, 5xx) : réduit le débit, pause tous
+        les appelants du host (Retry-After sinon backoff exponentiel) et ouvre
+        le circuit au-delà de failure_threshold. Retourne la pause appliquée (s).
+        """
+        with self._lock:
+            self.stats['throttled'] += 1
+            return self._fail(retry_after, reason)
+
+    def record_error(self, reason: str = 'réseau') -> float:
+        """Erreur réseau (timeout, connexion) : même traitement qu'un blocage."""
+        with self._lock:
+            self.stats['errors'] += 1
+            return self._fail(None, reason)
+
+    def _fail(self, retry_after: Optional[float], reason: str) -> float:
+        now = time.monotonic()
+        if now < self._pause_until and not self._half_open:
+            # Requête partie avant la pause en cours : même rafale, déjà comptée
+            if retry_after is not None:
+                self._pause_until = max(self._pause_until, now + retry_after)
+            return self._pause_until - now
+
+        self._failures += 1
+        if self.target_rate > 0:
+            self.bucket.rate = max(self.min_rate, self.bucket.rate / 2)
+        backoff = min(self.max_backoff, self.base_backoff * 2 ** (self._failures - 1))
+        pause = retry_after if retry_after is not None else backoff
+        self._pause_until = max(self._pause_until, now + pause)
+        self.stats['paused_s'] += pause
+
+        if self._half_open or self._failures >= self.failure_threshold:
+            open_for = max(self.open_seconds, retry_after or 0)
+            self._open_until = now + open_for
+            self._half_open = False
+            self._probe_in_flight = False
+            self.stats['opened'] += 1
+            print(f"  [Throttle] {self.host}: circuit ouvert {open_for:.0f}s "
+                  f"({self._failures} blocages consécutifs, dernier: {reason})")
+        return pause
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return bool(self._open_until) and time.monotonic() < self._open_until
+
+    def status(self) -> Dict:
+        return dict(self.stats, host=self.host, rate=self.bucket.rate, open=self.is_open)
+
+
+_throttles: Dict[str, HostThrottle] = {}
+_throttles_lock = threading.Lock()
+
+
+def get_host_throttle(url: str) -> HostThrottle:
+    """Contrôleur unique par host pour tout le process (config.THROTTLE_CONFIG)."""
+    host = urlsplit(url).netloc.lower() if '//' in url else url.lower()
+    with _throttles_lock:
+        throttle = _throttles.get(host)
+        if throttle is None:
+            settings = dict(config.THROTTLE_CONFIG.get('default', {}))
+            settings.update(config.THROTTLE_CONFIG.get(host, {}))
+            throttle = HostThrottle(host, **settings)
+            _throttles[host] = throttle
+        return throttle
+
+
+def throttle_status() -> Dict[str, Dict]:
+    """État de tous les hosts (diagnostics)."""
+    with _throttles_lock:
+        return {host: throttle.status() for host, throttle in _throttles.items()}
+
+
+def reset_host_throttles():
+    """Oublie tous les contrôleurs (benchmarks : chaque scénario repart de config)."""
+    with _throttles_lock:
+        _throttles.clear()